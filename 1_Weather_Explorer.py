@@ -5,28 +5,45 @@
 # Load libraries
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import calendar
+from datetime import timedelta
 
 # Import constants and helper functions from the app utilities folder
 from app_utils import (
     load_data,
-    filter_by_period,
     build_smoothed_var_names,
     make_label_map,
+    prepare_plot_data,
     VARS_MAP,
     SMOOTH_SUFFIX,
     TIME_RANGES,
     MONTHS,
     SEASONS,
 )
+from app_metrics import timed, start_page_timer, render_debug_panel
+from app_figures import corr_heatmap, line_chart, histogram_chart
+from explorer_sections import (
+    period_frame,
+    section_job,
+    submit_sections,
+    prefetch_neighbours,
+    value_range,
+    CUSTOM_RANGE,
+    EXPLORER_TIME_RANGES,
+    DEFAULT_PLOT_VARS,
+    DEFAULT_HIST_VAR,
+)
+from warm_cache import start_warm_up
+from climatology import load_climatology, observed, site_years, anomalies, extreme_flags, OBSERVED_SITE
 
 # Browser tab title + page title (on page itself)
 st.set_page_config(page_title= "Sion Weather Analysis", layout="wide")
+start_page_timer("explorer") # per-section timings of this rerun (see app_metrics)
 st.title("Weather Variable Trends for Sion, Switzerland")
 
 # Load our data
 weather_df = load_data()
+start_warm_up(weather_df) # the most common sections, computed or restored in the background once per server process (see warm_cache.py)
 
 # Contextual information to better understand the following analysis.
 st.markdown("---")
@@ -71,17 +88,45 @@ st.markdown("""
 
 
 # ────────────────────────────────
-# Summary Statistics Table
+# Sidebar Controls
 # ────────────────────────────────
+# All settings are read first, so that the four sections below can be computed at the same time (see "Concurrent Computation").
+
+# A) Custom date range, used by the sections whose time range is "Custom Range"
+st.sidebar.header("Custom Date Range")
+
+# 1) Brushing: a box drawn over the time series chart sets the custom range and switches the summary table, correlation and histogram to it.
+#    Runs before the script (on_select callback of the chart), so the widgets below are created with the new values.
+first_day, last_day = weather_df.index[0].date(), weather_df.index[-1].date()
+
+def brush_to_range():
+    boxes = st.session_state["ts_chart"]["selection"]["box"]
+    if not boxes:
+        return
+    start, end = sorted(pd.to_datetime(boxes[0]["x"]).date)
+    st.session_state["custom_range"] = (min(max(start, first_day), last_day), max(min(end, last_day), first_day))
+    for key in ("stats_duration", "corr_duration", "hist_duration"):
+        st.session_state[key] = CUSTOM_RANGE
+
+# 2) Date range picker (the full data period by default). While the second date is being picked, the range is the first day alone.
+st.session_state.setdefault("custom_range", (first_day, last_day))
+custom_dates = st.sidebar.date_input(
+    "Custom date range:", min_value=first_day, max_value=last_day,
+    key="custom_range"
+)
+custom_start, custom_end = custom_dates[0], custom_dates[-1]
+custom_period = f"{custom_start:%d %b %Y} – {custom_end:%d %b %Y}"
+custom_choice = (CUSTOM_RANGE, custom_start.isoformat(), (custom_end + timedelta(days=1)).isoformat()) # last day included
 
-st.markdown("---")
-st.sidebar.header("Summary Table Settings")
 
 
+# B) Summary table settings
+st.sidebar.markdown("---")
+st.sidebar.header("Summary Table Settings")
 
 # 1) Time-range selector, filtering and period labels for dynamic header
 stats_duration = st.sidebar.selectbox(
-    "Summary stats time range:", TIME_RANGES,
+    "Summary stats time range:", EXPLORER_TIME_RANGES,
     key="stats_duration"
 )
 month = season = None
@@ -100,12 +145,13 @@ elif stats_duration == "One Season":
     )
     stats_period = season
 
+elif stats_duration == CUSTOM_RANGE:
+    stats_period = custom_period
+
 else:
     stats_period = "Full Year"
 
-df_stats = filter_by_period(weather_df, stats_duration, month, season)
-
-
+stats_choice = custom_choice if stats_duration == CUSTOM_RANGE else (stats_duration, month, season) # arguments of filter_by_period
 
 # 2) Smoothing selector
 stats_smooth = st.sidebar.selectbox(
@@ -115,49 +161,14 @@ stats_smooth = st.sidebar.selectbox(
 
 
 
-# 3) Append the relevant suffixes based on selected smoothing
-summary_cols = build_smoothed_var_names(list(VARS_MAP.keys()),stats_smooth)
-
-
-
-# 4) Compute statistics
-summary_stats = df_stats[summary_cols].agg(["min", "max", "mean", "median", "std"]).T
-summary_stats.columns = ["Min", "Max", "Mean", "Median", "Standard Deviation"]
-
-
-
-# 5) Replace each row index (table's row names) with its more user-friendly version (e.g. Temperature instead of temperature_2m)
-summary_stats.index = list(VARS_MAP.keys())
-
-
-
-# 6) Display
-st.subheader(f"{stats_smooth} Summary Statistics ({stats_period})")
-st.dataframe(summary_stats.style.format("{:.2f}"))
-
-
-
-
-
-
-
-
-
-
-# ────────────────────────────────
-# Correlation Matrix 
-# ────────────────────────────────
-
-st.markdown("---")
+# C) Correlation settings
 st.sidebar.markdown("---")  
 st.sidebar.header("Correlation Settings")
 
-
-
 # 1) Time-range selector and filtering options based on time range
 # selectbox to choose the desired time range
 corr_duration = st.sidebar.selectbox(
-    "Time range:", TIME_RANGES, key="corr_duration"
+    "Time range:", EXPLORER_TIME_RANGES, key="corr_duration"
 )
 month = season = None
 if corr_duration == "One Month":
@@ -175,13 +186,13 @@ elif corr_duration == "One Season":
     )
     corr_period = season
 
+elif corr_duration == CUSTOM_RANGE:
+    corr_period = custom_period
+
 else:
     corr_period = "Full Year"
 
-# Apply the same filtering helper as in Time Series Analysis section
-df_corr = filter_by_period(weather_df, corr_duration, month, season)
-
-
+corr_choice = custom_choice if corr_duration == CUSTOM_RANGE else (corr_duration, month, season)
 
 # 2) Correlation smoothing selector
 corr_smooth = st.sidebar.selectbox(
@@ -190,59 +201,18 @@ corr_smooth = st.sidebar.selectbox(
 
 
 
-# 3) Append the right suffix to each "raw" column name based on selected smoothing level
-cols_corr = build_smoothed_var_names(list(VARS_MAP.keys()), corr_smooth)
-
-
-
-# 4) Compute correlation matrix
-corr_df = df_corr[cols_corr].corr()
-
-
-
-# 5) Display with dynamic header
-st.subheader(f"{corr_smooth} Correlation Matrix ({corr_period})")
-fig_corr = px.imshow(
-    corr_df,
-    text_auto=".2f",
-    aspect="auto",
-    color_continuous_scale="RdBu_r",
-    origin="lower",
-)
-fig_corr.update_layout(margin=dict(t=30, b=0, l=0, r=0))
-st.plotly_chart(fig_corr, use_container_width=True)
-
-
-
-
-
-
-
-
-
-
-
-# ────────────────────────────────
-# Time Series Analysis
-# ────────────────────────────────
-
-# Sidebar controls
-st.markdown("---")  
+# D) Time series settings
 st.sidebar.markdown("---")  
 st.sidebar.header("Time Series Settings")
 
-
-
 # 1) Select which variables to plot
 
 # Button to select the variables in the side bar, with temperature and humidity as the two default vars to be plotted.
 sel_vars = st.sidebar.multiselect(
-    "Time Series Variables:", list(VARS_MAP.keys()), default=["Temperature", "Humidity"], key="ts_vars"
+    "Time Series Variables:", list(VARS_MAP.keys()), default=DEFAULT_PLOT_VARS, key="ts_vars"
 )
 
-
-
-# 2) Time‐range selector + filtering
+# 2) Time‐range selector
 duration = st.sidebar.selectbox(
     "Time range:", TIME_RANGES, key="ts_duration"
 )
@@ -266,91 +236,35 @@ elif duration == "One Season":
 else:
     time_series_period = "Full Year"
 
-# Slice the df based on the time period that was just selected by the app user (specific month or season)
-df_ts = filter_by_period(weather_df, duration, month, season) 
-# In the “Full Year” case, the month and season remain None, so you automatically get an unfiltered copy of the full dataset without needing a separate condition for “Full Year.”. 
-# aka no need for: else:
-    # df_ts = weather_df.copy()
-
-
+# In the “Full Year” case, the month and season remain None, so filter_by_period gives an unfiltered copy of the full dataset without needing a separate condition for “Full Year.”. 
+ts_choice = (duration, month, season)
 
 # 3) Buttons to let the web app user select the data's smoothing level, as well as which variables they want to plot
 smooth = st.sidebar.selectbox("Time Series Smoothing:", list(SMOOTH_SUFFIX.keys()),key="ts_smooth")
+# (the suffix matching the smoothing choice is appended to each "raw" column name by the plot section, see explorer_sections.py)
 
-# Depending on the smoothing choice, append the right suffix to each "raw" column name
-cols = build_smoothed_var_names(sel_vars, smooth)
-
-
-# 4) Prepare data for plotting
-df_plot = (
-    df_ts[cols] # keep only the user-selected variables, at the right smoothing level (to avoid modifying the initial variables, which I might need later on)
-    .rename_axis("time") # Assign DatetimeIndex a column name so reset_index doesn't create an index column
-    .reset_index() # convert index to df column, as need time to be a column to use melt and reshape the df
-    .melt(id_vars="time", value_vars=cols, var_name="col", value_name="val") # transform from wide to long format, as required by plotly.
-)
-# Map back to friendlier variable names so that chart labels don't have complicated names but the simplified variables names
-df_plot["Variable"] = df_plot["col"].map(make_label_map(sel_vars, smooth))
-
-
-
-# 5) Optional min-max normalisation for better comparison of variables along time series : a value of 0.6 means that it is 60% of the range between the var's min and max values
+# 4) Optional min-max normalisation for better comparison of variables along time series : a value of 0.6 means that it is 60% of the range between the var's min and max values
 # Min-max is good because it keeps that shape of the original time-series intact, so good to identify when a variable peaks etc. We're not interested in z-score standardisation because we're not that interested in how far values deviate from their mean and anomaly detection. 
-if st.sidebar.radio("Normalise?", ["No", "Yes"]) == "Yes":
-    df_plot["val"] = (
-        df_plot
-        .groupby("Variable")["val"] # We want each variable to be normalised against itself, not all others.
-        .transform(lambda x: (x - x.min()) / (x.max() - x.min())) # min-max normalisation formula
-    )
-    y_label = "Normalised"
-else:
-    y_label = "Value"
-
-
-
-# 6) Section header and line chart plotting
-st.subheader(f"{smooth}{' Normalised' if y_label=='Normalised' else ''} Weather Trends ({time_series_period})")
-
-# Plotting
-fig = px.line(
-    df_plot,
-    x="time",
-    y="val",
-    color="Variable",
-    labels={"time": "Time", "val": y_label},
-)
-fig.update_layout(legend=dict(y=0.5, x=1.02))
-st.plotly_chart(fig, use_container_width=True)
-
-
-
+normalise = st.sidebar.radio("Normalise?", ["No", "Yes"]) == "Yes"
+y_label = "Normalised" if normalise else "Value"
 
 
 
-
-
-
-
-# ────────────────────────────────
-# Weather Variable Distribution Plot
-# ────────────────────────────────
+# E) Histogram settings
 st.sidebar.markdown("---")  
 st.sidebar.header("Histogram Settings")
 
-
-
 # 1) Selecting the variable to plot on the histogram (so the user knows straight up what it is they are filtering afterwards)
 hist_var = st.sidebar.selectbox(
     "Histogram variable:",
     list(VARS_MAP.keys()),
-    index=list(VARS_MAP.keys()).index("Temperature"), # Make temperature the default variable to plot
+    index=list(VARS_MAP.keys()).index(DEFAULT_HIST_VAR), # Make temperature the default variable to plot
     key="hist_var"
 )
 
-
-
-# 2) Histogram time‑range selector, filtering of the data frame by time periods, and period labelling for dynamic section header
+# 2) Histogram time‑range selector and period labelling for dynamic section header
 hist_duration = st.sidebar.selectbox(
-    "Histogram time range:", TIME_RANGES,
+    "Histogram time range:", EXPLORER_TIME_RANGES,
     key="hist_duration"
 )
 
@@ -370,13 +284,13 @@ elif hist_duration == "One Season":
     )
     hist_period = season
 
+elif hist_duration == CUSTOM_RANGE:
+    hist_period = custom_period
+
 else:
     hist_period = "Full Year"
 
-# Apply the same filtering helper as before
-df_hist = filter_by_period(weather_df, hist_duration, month, season)
-
-
+hist_choice = custom_choice if hist_duration == CUSTOM_RANGE else (hist_duration, month, season)
 
 # 3) Histogram smoothing-level selector
 hist_smooth = st.sidebar.selectbox(
@@ -384,13 +298,9 @@ hist_smooth = st.sidebar.selectbox(
     key="hist_smooth"
 )
 
-
-
 # 4) Append the appropriate suffix (if any) to build the column names corresponding to the smoothing option selected by the wep app user. 
 hist_col = build_smoothed_var_names([hist_var], hist_smooth)[0] # select first (and only) element from the list created by fn.
 
-
-
 # 5) Filter the histogram by another variable, if requested 
 
 # Toggle on/off
@@ -398,6 +308,7 @@ filter_on = st.sidebar.checkbox(
     "Filter histogram by another variable?",
     key="hist_filter_on"
 )
+value_filter = None
 if filter_on:
     # Choose what variable we are filtering by
     filt_var = st.sidebar.selectbox(
@@ -411,42 +322,56 @@ if filter_on:
         list(SMOOTH_SUFFIX.keys()),
         key="hist_filter_smooth"
     )
-    # Build the variable's raw column name (adding suffix) and find its data range
+    # Build the variable's raw column name (adding suffix) and find its data range in the period (shared result cache)
     filt_col = VARS_MAP[filt_var] + SMOOTH_SUFFIX[filt_smooth]
-    raw_min, raw_max = float(df_hist[filt_col].min()), float(df_hist[filt_col].max())
-    sel_min, sel_max = st.sidebar.slider( # Let the user pick a range *in the variable's units* to filter on 
-        f"{filt_var} range ({filt_smooth}):",
-        min_value=raw_min,
-        max_value=raw_max,
-        value=(raw_min, raw_max), # make full span of the filter variable the default position for slider 
-        step=(raw_max - raw_min) / 100, # increments of the slider filter
-        key="hist_filter_range"
-    )
-    # Apply the filter
-    df_hist = df_hist[(df_hist[filt_col] >= sel_min) & (df_hist[filt_col] <= sel_max)]
+    raw_range = value_range(weather_df, hist_choice, filt_var, filt_smooth)
+    if raw_range is None:
+        st.sidebar.info(f"No {filt_var.lower()} data in the selected period: nothing to filter on.")
+    else:
+        raw_min, raw_max = raw_range
+        sel_min, sel_max = st.sidebar.slider( # Let the user pick a range *in the variable's units* to filter on 
+            f"{filt_var} range ({filt_smooth}):",
+            min_value=raw_min,
+            max_value=raw_max,
+            value=(raw_min, raw_max), # make full span of the filter variable the default position for slider 
+            step=(raw_max - raw_min) / 100, # increments of the slider filter
+            key="hist_filter_range"
+        )
+        # The filter is applied with the binning of the histogram section
+        value_filter = (filt_col, sel_min, sel_max)
 
 
 
-# 6) Plot the histogram and create dashboard section (NB: vars cannot be normalised as not relevant when plotting single var)
-st.markdown("---") # add a seperator between this section and the previous one
-st.subheader(f"{hist_smooth} Distribution of {hist_var} ({hist_period})") # dynamic dashboard title
 
-# Adapt bin count to filtered size
-n = len(df_hist)
-nbins = max(5, min(50, n // 10))
 
-fig_hist = px.histogram(
-    df_hist,
-    x=hist_col,
-    nbins=nbins,
-    title= None # Not including any plot title directly for now, as I find the subsection title informative enough
-)
-fig_hist.update_layout(
-    xaxis_title=hist_var,
-    yaxis_title="Frequency",
-    bargap=0.1
-)
-st.plotly_chart(fig_hist, use_container_width=True)
+
+
+
+
+
+# ────────────────────────────────
+# Concurrent Computation
+# ────────────────────────────────
+# The four sections are independent: they are all submitted to a thread pool now (explorer_sections.submit_sections, WEATHER_SECTION_WORKERS threads)
+# and each section below waits only for its own result, so the rerun takes about as long as the slowest section. Results come from the shared result cache when possible.
+with timed("explorer.sections.submit"):
+    section_jobs = { # a custom date range uses the O(1) range variant of the section (section_job)
+        "stats": section_job("stats", stats_choice, stats_smooth),
+        "corr": section_job("corr", corr_choice, corr_smooth),
+        "plot": ("plot", *ts_choice, smooth, tuple(sel_vars), normalise),
+        "hist": section_job("hist", hist_choice, hist_col, value_filter),
+    }
+    section_futures = submit_sections(weather_df, section_jobs)
+
+# Once a section has been served, the same section for the neighbouring months is computed in the background (see explorer_sections.py)
+def section_output(name):
+    with timed(f"explorer.{name}.compute"): # time spent waiting for the result
+        result = section_futures[name].result()
+    prefetch_neighbours(weather_df, *section_jobs[name])
+    return result
+
+
+
 
 
 
@@ -454,8 +379,123 @@ st.plotly_chart(fig_hist, use_container_width=True)
 
 
 
+# ────────────────────────────────
+# Summary Statistics Table
+# ────────────────────────────────
 
+st.markdown("---")
+
+# Statistics (min, max, mean, median and standard deviation of each variable), rows named with the user-friendly names (e.g. Temperature instead of temperature_2m)
+summary_stats = section_output("stats")
 
+st.subheader(f"{stats_smooth} Summary Statistics ({stats_period})")
+with timed("explorer.stats.render"):
+    st.dataframe(summary_stats.style.format("{:.2f}"))
 
 
 
+
+
+
+
+
+
+
+# ────────────────────────────────
+# Correlation Matrix 
+# ────────────────────────────────
+
+st.markdown("---")
+
+# Correlation matrix of the selected period and smoothing level
+corr_df = section_output("corr")
+
+# Display with dynamic header
+st.subheader(f"{corr_smooth} Correlation Matrix ({corr_period})")
+with timed("explorer.corr.figure"):
+    fig_corr = corr_heatmap(corr_df, aspect="auto")
+with timed("explorer.corr.render"): # serialisation of the figure and sending it to the browser
+    st.plotly_chart(fig_corr, use_container_width=True)
+
+
+
+
+
+
+
+
+
+
+
+# ────────────────────────────────
+# Time Series Analysis
+# ────────────────────────────────
+
+st.markdown("---")  
+
+# 1) Plot data: the user-selected variables at the right smoothing level, each normalised against itself if requested, reshaped to the long format required by plotly.
+# Variables are mapped back to friendlier names so that chart labels don't have complicated names but the simplified variables names
+df_plot = section_output("plot")
+
+# 2) Section header and line chart plotting
+st.subheader(f"{smooth}{' Normalised' if y_label=='Normalised' else ''} Weather Trends ({time_series_period})")
+
+# Plotting; a box drawn over the chart becomes the custom date range of the other sections (brush_to_range, in the sidebar controls)
+st.caption("Draw a box over the chart to analyse its dates in the summary table, correlation matrix and histogram.")
+with timed("explorer.timeseries.figure"):
+    fig = line_chart(df_plot, y_label)
+with timed("explorer.timeseries.render"):
+    st.plotly_chart(fig, use_container_width=True, key="ts_chart", on_select=brush_to_range, selection_mode="box")
+
+
+
+# 3) Anomalies of the same variables and period, relative to the climatology of the app's data file (only shown once it has been built from that file,
+#    see climatology.py: the other sites of the index may be synthetic)
+clim = load_climatology()
+if observed(clim) and sel_vars:
+    first_year, last_year = site_years(clim, OBSERVED_SITE)
+    st.subheader(f"Hourly Anomalies Relative to Climatology ({time_series_period})")
+    st.markdown(f"Difference between each hourly value and the {first_year}–{last_year} mean for the same hour of the year. "
+                "Extreme hours fall below the 1st or above the 99th percentile of that hour of the year.")
+    raw_cols = build_smoothed_var_names(sel_vars, "Hourly")
+    with timed("explorer.anomalies.compute"):
+        df_ts = period_frame(weather_df, *ts_choice) # rows of the selected period
+        df_anom = anomalies(clim, OBSERVED_SITE, df_ts, raw_cols)
+        flags = extreme_flags(clim, OBSERVED_SITE, df_ts, raw_cols)
+        anom_table = pd.DataFrame({
+            "Mean anomaly": df_anom.mean().to_numpy(),
+            "Extremely low hours": (flags < 0).mean().to_numpy(),
+            "Extremely high hours": (flags > 0).mean().to_numpy(),
+        }, index=sel_vars)
+    with timed("explorer.anomalies.figure"):
+        fig_anom = line_chart(prepare_plot_data(df_anom, raw_cols, make_label_map(sel_vars, "Hourly")), "Anomaly")
+    with timed("explorer.anomalies.render"):
+        st.plotly_chart(fig_anom, use_container_width=True)
+        st.dataframe(anom_table.style.format({"Mean anomaly": "{:+.2f}", "Extremely low hours": "{:.1%}", "Extremely high hours": "{:.1%}"}), use_container_width=True)
+
+
+
+
+
+
+
+
+
+
+# ────────────────────────────────
+# Weather Variable Distribution Plot
+# ────────────────────────────────
+
+# Plot the histogram and create dashboard section (NB: vars cannot be normalised as not relevant when plotting single var)
+st.markdown("---") # add a seperator between this section and the previous one
+st.subheader(f"{hist_smooth} Distribution of {hist_var} ({hist_period})") # dynamic dashboard title
+
+# Histogram with a bin count adapted to the filtered size (bins counted with the other sections)
+counts, edges = section_output("hist")
+with timed("explorer.histogram.figure"):
+    fig_hist = histogram_chart(counts, edges, hist_var)
+with timed("explorer.histogram.render"):
+    st.plotly_chart(fig_hist, use_container_width=True)
+
+# Optional debug panel with the timings of this rerun (?debug=1)
+render_debug_panel()
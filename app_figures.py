@@ -0,0 +1,91 @@
+# Plotly figures of the two pages, built in one place so that the pages and the batch report renderer (render_reports.py) draw exactly the same charts.
+
+# Load libraries
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+# Correlation heatmap (weather variables or renewable potentials)
+def corr_heatmap(corr_df, aspect=None):
+    fig = px.imshow(
+        corr_df,
+        text_auto=".2f",
+        aspect=aspect,
+        color_continuous_scale="RdBu_r",
+        origin="lower",
+    )
+    fig.update_layout(margin=dict(t=30, b=0, l=0, r=0))
+    return fig
+
+# Line chart of the long-format data returned by app_utils.prepare_plot_data
+def line_chart(df_plot, y_label="Value"):
+    fig = px.line(
+        df_plot,
+        x="time",
+        y="val",
+        color="Variable",
+        labels={"time": "Time", "val": y_label},
+    )
+    fig.update_layout(legend=dict(y=0.5, x=1.02))
+    return fig
+
+# Distribution of one variable, with a bin count adapted to the number of (filtered) observations.
+# Bins are counted here (histogram_bins) rather than in the browser, so only the bar heights are sent, and the counts can be computed ahead of time (see explorer_sections.py).
+def histogram_bins(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    nbins = max(5, min(50, len(values) // 10))
+    return np.histogram(values, bins=nbins) if len(values) else (np.zeros(0, dtype=int), np.zeros(1))
+
+def histogram_chart(counts, edges, var_label):
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges) * 0.9)) # 10% gap between bars
+    fig.update_layout(
+        xaxis_title=var_label,
+        yaxis_title="Frequency",
+        title=None, # Not including any plot title directly for now, as I find the subsection title informative enough
+    )
+    return fig
+
+def histogram(df, col, var_label):
+    return histogram_chart(*histogram_bins(df[col]), var_label)
+
+# Grouped bar chart of the seasonal shares (one column per source, friendly names)
+def seasonal_share_bar(seasonal_share):
+    fig = px.bar(
+        seasonal_share,
+        x=seasonal_share.index,
+        y=list(seasonal_share.columns),
+        labels={"value":"Share of Annual Potential","season":"Season"},
+        barmode="group",
+    )
+    fig.update_layout(
+        yaxis_tickformat=".0%",
+        xaxis_title="Season",
+        legend_title_text="Source",
+    )
+    return fig
+
+# Mean capacity factor of each panel orientation (rows: tilt, columns: azimuth), as computed by pv_model.sweep
+def orientation_heatmap(yield_df):
+    fig = px.imshow(
+        yield_df,
+        labels={"x": "Azimuth (°, 180 = south)", "y": "Tilt (°)", "color": "Capacity factor"},
+        color_continuous_scale="YlOrRd",
+        origin="lower",
+        aspect="auto",
+    )
+    fig.update_layout(margin=dict(t=30, b=0, l=0, r=0), coloraxis_colorbar_tickformat=".0%")
+    return fig
+
+# Combined generation of the capacity what-if (already downsampled): a single trace, cheap to rebuild on every slider move
+def generation_chart(time, generation):
+    fig = go.Figure(go.Scatter(x=time, y=generation, mode="lines", line=dict(width=1)))
+    fig.update_layout(xaxis_title="Time", yaxis_title="Generation (MW)", margin=dict(t=30, b=0, l=0, r=0))
+    return fig
+
+# Duration curve: generation sorted from the highest to the lowest hour
+def duration_curve_chart(share_of_hours, generation):
+    fig = go.Figure(go.Scatter(x=share_of_hours, y=generation, mode="lines", fill="tozeroy"))
+    fig.update_layout(xaxis_title="Share of hours", yaxis_title="Generation (MW)", xaxis_tickformat=".0%", margin=dict(t=30, b=0, l=0, r=0))
+    return fig
@@ -0,0 +1,198 @@
+# Lightweight timing hooks, to find out where the time goes when a page feels slow (data loading, filtering, aggregation, figure building, or sending figures to the browser).
+#
+# - timed("section") / @timed_function(): measure a block or a helper; a few microseconds of overhead, always on.
+# - @tracked_cache(st.cache_data): same as the Streamlit cache decorator, but also counts calls and misses (i.e. cache hit rates).
+# - start_page_timer() / render_debug_panel(): per-rerun timings, shown in an optional sidebar panel (?debug=1 in the URL, or WEATHER_DEBUG_PANEL=1).
+# - Latency histograms and cache counters are served in the Prometheus/OpenMetrics text format on http://<host>:<WEATHER_METRICS_PORT>/metrics when that variable is set,
+#   and every measurement is also logged (DEBUG level) on the "weather_app.metrics" logger. With several server processes per host, give each its own port,
+#   or 0 for any free port (logged at startup); a port already in use only disables the endpoint of that process, with a warning.
+
+# Load libraries
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Deployment settings
+METRICS_PORT  = os.environ.get("WEATHER_METRICS_PORT")
+DEBUG_PANEL   = os.environ.get("WEATHER_DEBUG_PANEL") == "1"
+# Upper bounds (in seconds) of the latency histogram buckets, from 1 ms to 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger("weather_app.metrics")
+
+
+
+
+
+# 1) Process-wide registry of measurements (shared by every session served by this server process)
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {} # section -> [bucket counts..., +Inf count], total seconds, number of measurements
+        self.caches = {}     # cache name -> [calls, misses]
+
+    def observe(self, section, seconds):
+        with self.lock:
+            buckets, total, count = self.histograms.get(section) or ([0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0)
+            buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.histograms[section] = (buckets, total + seconds, count + 1)
+
+    def count_cache(self, name, miss):
+        with self.lock:
+            counts = self.caches.setdefault(name, [0, 0])
+            counts[miss] += 1
+
+    # Copy of the cache counters as a table: calls, misses and hit rate per cache
+    def cache_table(self):
+        with self.lock:
+            rows = {name: (calls, misses) for name, (calls, misses) in self.caches.items()}
+        table = pd.DataFrame.from_dict(rows, orient="index", columns=["Calls", "Misses"])
+        table["Hit Rate"] = 1 - table["Misses"] / table["Calls"]
+        return table
+
+    # Prometheus / OpenMetrics text exposition format
+    def to_openmetrics(self):
+        lines = [
+            "# HELP weather_app_section_seconds Time spent in each section of the app.",
+            "# TYPE weather_app_section_seconds histogram",
+        ]
+        with self.lock:
+            histograms = {k: (list(b), t, c) for k, (b, t, c) in self.histograms.items()}
+            caches = {k: list(v) for k, v in self.caches.items()}
+        for section, (buckets, total, count) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+                cumulative += n
+                lines.append(f'weather_app_section_seconds_bucket{{section="{section}",le="{bound}"}} {cumulative}')
+            lines.append(f'weather_app_section_seconds_sum{{section="{section}"}} {total}')
+            lines.append(f'weather_app_section_seconds_count{{section="{section}"}} {count}')
+        lines += ["# HELP weather_app_cache_calls Calls of each cached function.", "# TYPE weather_app_cache_calls counter"]
+        lines += [f'weather_app_cache_calls_total{{cache="{name}"}} {calls}' for name, (calls, _) in sorted(caches.items())]
+        lines += ["# HELP weather_app_cache_misses Calls of each cached function that had to be computed.", "# TYPE weather_app_cache_misses counter"]
+        lines += [f'weather_app_cache_misses_total{{cache="{name}"}} {misses}' for name, (_, misses) in sorted(caches.items())]
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+registry = _Registry()
+
+
+
+
+
+# 2) Timing hooks
+
+# Record one measurement: histogram of the server process, log sink, and list of timings of the current rerun (only when called from a page script)
+def record(section, seconds):
+    registry.observe(section, seconds)
+    logger.debug("section=%s seconds=%.6f", section, seconds)
+    if get_script_run_ctx() is not None:
+        st.session_state.setdefault("_rerun_timings", []).append((section, seconds))
+
+@contextmanager
+def timed(section):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(section, time.perf_counter() - start)
+
+# Decorator version of timed(), named after the function by default
+def timed_function(section=None):
+    def decorate(func):
+        name = section or func.__name__
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Wrap a Streamlit cache decorator (st.cache_data, st.cache_resource(...)) so that calls and misses are counted, and calls are timed.
+# Misses are counted inside the cached function, which only runs when the cache has no entry for the arguments.
+# NB: functools.wraps keeps the name and source of the original function, which is what Streamlit uses to tell cached functions apart.
+def tracked_cache(cache_decorator, name=None):
+    def decorate(func):
+        cache_name = name or func.__name__
+        @wraps(func)
+        def compute(*args, **kwargs):
+            registry.count_cache(cache_name, miss=True)
+            return func(*args, **kwargs)
+        cached = cache_decorator(compute)
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            registry.count_cache(cache_name, miss=False)
+            with timed(cache_name):
+                return cached(*args, **kwargs)
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorate
+
+
+
+
+
+# 3) Per-rerun timings and debug panel
+
+# Called at the top of each page: starts a fresh list of timings for this rerun (and the metrics endpoint on the first page run of the process)
+def start_page_timer(page):
+    if METRICS_PORT:
+        start_metrics_server(int(METRICS_PORT))
+    st.session_state["_rerun_timings"] = []
+    st.session_state["_rerun_page"] = (page, time.perf_counter())
+
+# Called at the bottom of each page: records the whole rerun and, if enabled, shows this rerun's timings and the cache hit rates in the sidebar
+def render_debug_panel():
+    page, start = st.session_state.get("_rerun_page", ("page", time.perf_counter()))
+    record(f"{page}.rerun", time.perf_counter() - start)
+    if not (DEBUG_PANEL or st.query_params.get("debug") == "1"):
+        return
+    timings = pd.DataFrame(st.session_state.get("_rerun_timings", []), columns=["Section", "ms"])
+    timings["ms"] *= 1000
+    with st.sidebar.expander("Performance (debug)", expanded=True):
+        st.markdown("**Timings of this rerun**")
+        st.dataframe(timings.style.format({"ms": "{:.1f}"}), hide_index=True)
+        st.markdown("**Cache hit rates (this server process)**")
+        st.dataframe(registry.cache_table().style.format({"Hit Rate": "{:.0%}"}))
+
+
+
+
+
+# 4) Metrics endpoint
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.to_openmetrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): # keep scrapes out of the server logs
+        pass
+
+# One endpoint per server process, started once in a background thread. None if the port cannot be bound (e.g. taken by another replica): cached
+# like a running server, so the page runs without the endpoint instead of failing on every rerun.
+@st.cache_resource
+def start_metrics_server(port):
+    try:
+        server = ThreadingHTTPServer(("", port), _MetricsHandler)
+    except OSError as exc:
+        logger.warning("metrics endpoint disabled, port %s unavailable: %s", port, exc)
+        return None
+    logger.info("metrics endpoint on port %d", server.server_address[1])
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
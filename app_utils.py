@@ -1,10 +1,26 @@
 # This is a small collectoin of app utilities to speed up the development, detect dirty data, and improve the clarity of my web app code across pages.
 
 # Load libraries
+import os
+import json
+import hashlib
+import mmap
+from pathlib import Path
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 import calendar
 import streamlit as st
 
+from app_metrics import timed_function, tracked_cache
+from enrichment import enrich
+from period_aggregation import aggregate, aggregate_arrays, add_period_codes, period_code
+from query_engines import make_engine, QUERY_ENGINES
+from seasons import season_codes, season_year_codes, season_year_names, SEASON_SCHEMES, DEFAULT_SCHEME
+from hydro_model import add_hydro_runoff
+from wind_model import add_wind_cf
+from pv_model import add_pv_cf, LATITUDE, LONGITUDE, UTC_OFFSET, DATA_FILE_UTC_OFFSET
+
 
 
 
@@ -21,6 +37,7 @@ BOUNDS = {
     "shortwave_radiation": (  0,1100),
 }
 
+@timed_function()
 def validate(df: pd.DataFrame) -> pd.DataFrame:
     """Ensure no values violate our physical bounds. Halt app if any do."""
     errors = []
@@ -64,6 +81,7 @@ SMOOTH_SUFFIX = {
 TIME_RANGES = ["One Month", "One Season", "Full Year"]
 MONTHS      = list(range(1, 13))
 SEASONS     = ["Winter", "Spring", "Summer", "Autumn"]
+SEASON_DEFINITIONS = list(SEASON_SCHEMES) # seasons.py; the first one is the notebook's, stored in the season column
 
 # Build constants for renewables, following similar pattern as above. Used in renewable energy potential file. 
 RENEW_MAP = {
@@ -71,6 +89,22 @@ RENEW_MAP = {
     "Wind Potential":  "wind_potential",
     "Hydro Potential": "hydro_potential",
 }
+# Alternative models of a source's potential, selectable in the renewable page: friendly model name -> column family (smoothing suffixes as above).
+# The first model of each source is its RENEW_MAP column, i.e. the notebook's proxy.
+RENEW_MODELS = {
+    "Solar Potential": {
+        "Horizontal irradiance":        "solar_potential",
+        "Tilted PV capacity factor":    "pv_cf",          # pv_model.py
+    },
+    "Wind Potential": {
+        "Cubed wind speed":             "wind_potential",
+        "Turbine capacity factor":      "wind_cf",        # wind_model.py
+    },
+    "Hydro Potential": {
+        "Precipitation proxy":          "hydro_potential",
+        "Snowmelt + reservoir runoff":  "hydro_runoff",   # hydro_model.py
+    },
+}
 
 
 
@@ -79,11 +113,15 @@ RENEW_MAP = {
 # 3) Create helper functions to make code in *later* sections more concise
 
 # Enable users to select the specific time period they want to get data for, given their previously selected time range (if haven't selected full year). 
-def filter_by_period(df, duration, month=None, season=None):
+# The season column follows the notebook's definition; another definition (see SEASON_DEFINITIONS) relabels the hours from their dates.
+@timed_function()
+def filter_by_period(df, duration, month=None, season=None, scheme=DEFAULT_SCHEME):
     if duration == "One Month":
         return df[df.index.month == month]
     elif duration == "One Season":
-        return df[df["season"] == season]
+        if scheme == DEFAULT_SCHEME:
+            return df[df["season"] == season]
+        return df[season_codes(df.index, scheme)[0] == SEASONS.index(season)]
     else:
         return df.copy()
 
@@ -92,8 +130,9 @@ def build_smoothed_var_names(selected_vars, smooth):
     return [VARS_MAP[v] + SMOOTH_SUFFIX[smooth] for v in selected_vars]
 
 # Equivalent function to build_smoothed_var_names, but for the renewable potential variables instead of broader weather ones. 
-def build_renewable_cols(selected_vars, smooth):
-    return [RENEW_MAP[v] + SMOOTH_SUFFIX[smooth] for v in selected_vars] 
+def build_renewable_cols(selected_vars, smooth, models=None):
+    models = models or {} # source -> model name (see RENEW_MODELS); the RENEW_MAP column for the others
+    return [(RENEW_MODELS[v][models[v]] if v in models else RENEW_MAP[v]) + SMOOTH_SUFFIX[smooth] for v in selected_vars]
 
 # Map variables' full name (including suffix) to more a user-friendly name, making chart labels more readable.
 def make_label_map(selected_vars, smooth):
@@ -102,12 +141,227 @@ def make_label_map(selected_vars, smooth):
         for v in selected_vars
     }
 
+# Summary statistics table of the weather explorer: one row per column, one column per statistic.
+@timed_function()
+def compute_summary_stats(df, cols):
+    stats = df[cols].agg(["min", "max", "mean", "median", "std"]).T
+    stats.columns = ["Min", "Max", "Mean", "Median", "Standard Deviation"]
+    return stats
+
+# Prepare the selected columns for a plotly line chart: optional min-max normalisation (each variable against itself), then wide to long format with friendly variable names.
+@timed_function()
+def prepare_plot_data(df, cols, label_map, normalise=False):
+    df_wide = df[cols]
+    if normalise:
+        df_wide = (df_wide - df_wide.min()) / (df_wide.max() - df_wide.min()) # min-max normalisation formula, applied column by column
+    df_plot = (
+        df_wide
+        .rename_axis("time") # Assign DatetimeIndex a column name so reset_index doesn't create an index column
+        .reset_index() # convert index to df column, as need time to be a column to use melt and reshape the df
+        .melt(id_vars="time", value_vars=cols, var_name="col", value_name="val") # transform from wide to long format, as required by plotly.
+    )
+    df_plot["Variable"] = df_plot["col"].map(label_map)
+    return df_plot
+
+# Share of each column's total that falls in each season (Winter -> Autumn). Used for the seasonal share of the renewable potentials.
+@timed_function()
+def compute_seasonal_share(df, cols, scheme=DEFAULT_SCHEME):
+    if scheme == DEFAULT_SCHEME:
+        seasonal_sum = aggregate(df, cols, "season", ("sum",))["sum"] # integer season codes, see period_aggregation.py
+    else:
+        codes, sums = aggregate_arrays(df[cols].to_numpy(), season_codes(df.index, scheme)[0], ("sum",))
+        seasonal_sum = pd.DataFrame(sums["sum"], index=pd.Index([SEASONS[c] for c in codes], name="season"), columns=cols)
+    seasonal_sum = seasonal_sum.reindex(pd.Index(SEASONS, name="season"), fill_value=0)
+    return seasonal_sum.div(seasonal_sum.sum(), axis=1)
+
+# Same per season of each year (winters spanning the new year), as share of each column's total over the whole data set, with the hours covered:
+# shows how the seasonal shares vary from one year to the next, and which seasons are only partly covered by the data.
+@timed_function()
+def compute_season_year_share(df, cols, scheme=DEFAULT_SCHEME):
+    year_codes = period_code(df, "season_year") if scheme == DEFAULT_SCHEME else season_year_codes(df.index, scheme) # the frame's season column by default
+    codes, sums = aggregate_arrays(df[cols].to_numpy(), year_codes, ("sum", "count"))
+    share = pd.DataFrame(sums["sum"], index=pd.Index(season_year_names(codes), name="season"), columns=cols)
+    share = share.div(share.sum(), axis=1)
+    share["Hours"] = sums["count"][:, 0].astype(int)
+    return share
+
+# Location of the enriched data set and of its memory-mappable copy (see load_data below). Paths are resolved next to this file so that the app, scripts and benchmarks all find the data regardless of the working directory.
+APP_DIR          = Path(__file__).resolve().parent
+DATA_PATH        = APP_DIR / "sion_weather_enriched.parquet"
+ARROW_CACHE_PATH = APP_DIR / "sion_weather_enriched.arrow"
+# Bump this whenever load_data starts producing a different frame (new derived columns, dtypes...), so that stale Arrow caches are rebuilt.
+CACHE_VERSION = 6
+
+# Identify a version of the data file cheaply (size + modification time), so that caches built from an older file are never reused.
+def dataset_fingerprint(path=DATA_PATH) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}-v{CACHE_VERSION}"
+
+# Fingerprint of the data a frame was actually loaded from, set in df.attrs by the loaders below: results computed from a frame are keyed by it, rather than
+# by the file on disk at the time of the lookup (which may already be newer than the frame being served). Frames built elsewhere (benchmarks, scripts)
+# get a hash of their content, computed once. Slices inherit the attrs of their frame: only call it on whole frames.
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    fingerprint = df.attrs.get("fingerprint")
+    if fingerprint is None:
+        digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        fingerprint = df.attrs["fingerprint"] = f"content-{digest.hexdigest()[:16]}"
+    return fingerprint
+
+# Columns of the alternative renewable models (RENEW_MODELS), which are not in the data files: added when the data is loaded (and then kept in the Arrow cache).
+# The PV model needs the site's coordinates and the time zone of its timestamps (Sion and the app's data file by default).
+def add_model_columns(df: pd.DataFrame, latitude=LATITUDE, longitude=LONGITUDE, utc_offset=DATA_FILE_UTC_OFFSET) -> pd.DataFrame:
+    if "pv_cf" not in df.columns:
+        df = add_pv_cf(df, latitude, longitude, utc_offset)
+    if "hydro_runoff" not in df.columns:
+        df = add_hydro_runoff(df)
+    if "wind_cf" not in df.columns:
+        df = add_wind_cf(df)
+    return df
+
+# Convert the validated frame to an Arrow table tagged with the fingerprint of the data it came from. Shared by the on-disk cache and the shared-memory publisher.
+def to_arrow_table(df: pd.DataFrame, fingerprint: str) -> pa.Table:
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    return table.replace_schema_metadata({**table.schema.metadata, b"fingerprint": fingerprint.encode()})
+
+# Turn an Arrow IPC file (memory-mapped file or shared-memory buffer) back into a data frame, or None if it was built from another version of the data.
+# split_blocks keeps one array per column, which is what allows pandas to use the underlying buffers without copying them.
+def _read_arrow_ipc(source, fingerprint: str):
+    reader = pa.ipc.open_file(source)
+    if (reader.schema.metadata or {}).get(b"fingerprint") != fingerprint.encode():
+        return None
+    return reader.read_all().to_pandas(split_blocks=True)
+
+# Save the validated frame as an *uncompressed* Arrow IPC (Feather v2) file. Written to a temporary file first and then renamed, so that other processes never see a half-written cache.
+def _write_arrow_cache(df: pd.DataFrame, path, fingerprint: str) -> None:
+    table = to_arrow_table(df, fingerprint)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except OSError:
+        # e.g. read-only deployment: simply keep running from the parquet file
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# Memory-map the Arrow cache instead of reading it: numeric columns become zero-copy views on the OS page cache, which is shared by every process reading the same file.
+# Returns None if there is no cache yet, or if it was built from another version of the data.
+def _read_arrow_cache(path, fingerprint: str):
+    try:
+        return _read_arrow_ipc(pa.memory_map(str(path)), fingerprint)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+# Shared-memory mode, for several server processes on one host: publish_shared_dataset.py loads the data once and publishes it in a named shared-memory segment, described by a small JSON manifest.
+# When the manifest exists, every replica attaches to that segment instead of holding its own copy. Location can be overridden per deployment.
+SHM_MANIFEST_PATH = Path(os.environ.get("WEATHER_SHM_MANIFEST", APP_DIR / "weather_shm_manifest.json"))
+_attached_segments = {} # keep the mapped segments open for as long as the frames built on top of them are in use
+
+def read_shm_manifest(path=SHM_MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# Map a published segment read-only, so that a replica can never write into the data every other replica reads. POSIX shared memory segments are
+# files of /dev/shm on Linux; a missing segment raises FileNotFoundError.
+SHM_DIR = Path("/dev/shm")
+
+def map_shared_memory(name: str) -> mmap.mmap:
+    fd = os.open(SHM_DIR / name.lstrip("/"), os.O_RDONLY)
+    try:
+        return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+def _close_segment(segment_map) -> None:
+    try:
+        segment_map.close()
+    except BufferError: # frames built on the segment are still referenced (a running session); unmapped once they are released
+        pass
+
+# One entry only: when the publisher swaps the data, the manifest points at a new segment and replicas move over on their next rerun.
+@tracked_cache(st.cache_resource(max_entries=1, show_spinner=False))
+def _load_shared_data(segment: str, size: int, fingerprint: str):
+    segment_map = map_shared_memory(segment)
+    try:
+        df = _read_arrow_ipc(pa.py_buffer(segment_map).slice(0, size), fingerprint)
+    except Exception: # not a valid IPC file (e.g. a half-written segment): do not keep the mapping open
+        _close_segment(segment_map)
+        raise
+    if df is None: # published from another version of the data
+        _close_segment(segment_map)
+        return None
+    df.attrs["fingerprint"] = fingerprint
+    for old_name in [n for n in _attached_segments if n != segment]:
+        _close_segment(_attached_segments.pop(old_name))
+    _attached_segments[segment] = segment_map
+    return df
+
 # Load the Data (essentially, you apply the fn. which reads the parquet file, transforms it into a pd data frame, and then caches the result so don't need to re-read the parquet file every time I run the script)
-@st.cache_data
+# The first cold start decodes the parquet file and stores the validated result in the Arrow cache; every later start (restart, new worker process) only memory-maps that cache.
+# NB: cache_resource rather than cache_data, as cache_data would hand each session its own pickled copy of the frame and defeat the memory mapping. Pages only read from weather_df, never modify it in place.
+# Keyed by the file's fingerprint, with one entry: a changed data file is really reloaded on the next call (the fingerprint is also kept in df.attrs).
+# Importing app_utils loads nothing: each page calls load_data() after its set_page_config, and scripts and worker processes only when they need the data.
+def load_local_data(fingerprint=None) -> pd.DataFrame:
+    return _load_local_data(fingerprint or dataset_fingerprint(DATA_PATH))
+
+@tracked_cache(st.cache_resource(max_entries=1, show_spinner=False))
+def _load_local_data(fingerprint: str) -> pd.DataFrame:
+    df = _read_arrow_cache(ARROW_CACHE_PATH, fingerprint)
+    if df is None:
+        df = pd.read_parquet(DATA_PATH)
+        df.index = pd.to_datetime(df.index) # convert time stamp index into datetime object to enable future time-based slicing in figures
+        df = add_period_codes(add_model_columns(validate(df)))
+        _write_arrow_cache(df, ARROW_CACHE_PATH, fingerprint)
+    df.attrs["fingerprint"] = fingerprint
+    return df
+
+# Entry point used by the pages: the published shared-memory segment if there is one (it was validated by the publisher), the local file otherwise.
+@timed_function()
 def load_data() -> pd.DataFrame:
-    df = pd.read_parquet("sion_weather_enriched.parquet")
-    df.index = pd.to_datetime(df.index) # convert time stamp index into datetime object to enable future time-based slicing in figures
-    return validate(df)
-weather_df = load_data()
+    manifest = read_shm_manifest()
+    if manifest is not None:
+        try:
+            df = _load_shared_data(manifest["segment"], manifest["size"], manifest["fingerprint"])
+            if df is not None:
+                return df
+        except (FileNotFoundError, KeyError, pa.ArrowInvalid): # stale manifest, e.g. the segment did not survive a reboot
+            pass
+    return load_local_data()
+
+# Query engine of the headless query API (query_api.py; see query_engines.py): pandas on the loaded frame by default, or DuckDB / Polars querying the
+# parquet file directly with projection and filter pushdown (optional packages, columns of the file only). Chosen per deployment with WEATHER_QUERY_ENGINE;
+# WEATHER_QUERY_THREADS caps DuckDB's threads. The pages do not use it: they compute on the frame they have loaded.
+QUERY_ENGINE = os.environ.get("WEATHER_QUERY_ENGINE", "pandas")
+
+# The pandas engine runs the pages' own helpers, so the query API and the pages cannot drift apart
+ENGINE_HELPERS = {"filter_by_period": filter_by_period, "compute_summary_stats": compute_summary_stats, "compute_seasonal_share": compute_seasonal_share}
+
+@tracked_cache(st.cache_resource(show_spinner=False))
+def get_query_engine(name=QUERY_ENGINE):
+    return make_engine(name, DATA_PATH, load_data, ENGINE_HELPERS, os.environ.get("WEATHER_QUERY_THREADS"))
+
+
+
+
+
+# 4) Multi-site data sets, as written by synthetic_weather.py (or any data set with the same layout): site=<id>/year=<yyyy>/*.parquet, plus a _sites.json table of the sites' coordinates.
+# Raw data sets (the notebook's schema) are enriched when loaded, enriched ones are used as such. The location can be overridden per deployment.
+SITES_DIR = Path(os.environ.get("WEATHER_SITES_DIR", APP_DIR / "weather_sites"))
 
+def read_sites(dataset_dir=SITES_DIR) -> pd.DataFrame:
+    with open(Path(dataset_dir) / "_sites.json") as f:
+        return pd.DataFrame(json.load(f))
 
+# Hourly data of one site; only that site's files are read (partition filter)
+@tracked_cache(st.cache_resource)
+def load_site_data(site: str, dataset_dir=SITES_DIR) -> pd.DataFrame:
+    table = ds.dataset(dataset_dir, format="parquet", partitioning="hive").to_table(filter=ds.field("site") == site)
+    df = table.to_pandas().drop(columns="site").sort_index()
+    if "season" not in df.columns:
+        df = enrich(df)
+    coords = read_sites(dataset_dir).set_index("site").loc[site]
+    return add_period_codes(add_model_columns(validate(df), coords["latitude"], coords["longitude"], UTC_OFFSET))
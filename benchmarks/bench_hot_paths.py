@@ -0,0 +1,106 @@
+# Benchmarks of the app's hot paths (pytest-benchmark), each measured on the three data sets defined in conftest.py.
+#
+# Run from the repository root:
+#   python -m pytest benchmarks/bench_hot_paths.py
+# Results are saved under .benchmarks/ for every run (see benchmarks/pytest.ini). To see regressions against the previous run:
+#   python -m pytest benchmarks/bench_hot_paths.py --benchmark-compare --benchmark-compare-fail=mean:15%
+
+from itertools import combinations
+
+import pandas as pd
+import pytest
+
+from app_utils import (
+    validate,
+    filter_by_period,
+    build_smoothed_var_names,
+    build_renewable_cols,
+    make_label_map,
+    compute_summary_stats,
+    prepare_plot_data,
+    compute_seasonal_share,
+    _read_arrow_cache,
+    VARS_MAP,
+    RENEW_MAP,
+)
+from app_figures import line_chart
+from prefix_stats import rolling_corr
+from period_aggregation import aggregate
+
+ALL_VARS = list(VARS_MAP.keys())
+PERIODS = [("One Month", 1, None), ("One Season", None, "Winter"), ("Full Year", None, None)]
+
+
+# 1) Loading: cold start (decode the parquet file) vs. later starts (memory-map the Arrow cache)
+def test_load_parquet(benchmark, dataset_files):
+    parquet_path, _ = dataset_files
+
+    def load():
+        df = pd.read_parquet(parquet_path)
+        df.index = pd.to_datetime(df.index)
+        return validate(df)
+
+    benchmark(load)
+
+
+def test_load_arrow_cache(benchmark, dataset_files):
+    _, arrow_path = dataset_files
+    assert benchmark(_read_arrow_cache, arrow_path, "benchmark") is not None
+
+
+def test_validate(benchmark, dataset):
+    benchmark(validate, dataset)
+
+
+# 2) Period filtering, for each kind of time range
+@pytest.mark.parametrize("duration, month, season", PERIODS, ids=[p[0] for p in PERIODS])
+def test_filter_by_period(benchmark, dataset, duration, month, season):
+    benchmark(filter_by_period, dataset, duration, month, season)
+
+
+# 3) Section computations of the weather explorer (on the full period, their most expensive case)
+def test_summary_stats(benchmark, dataset):
+    benchmark(compute_summary_stats, dataset, build_smoothed_var_names(ALL_VARS, "Hourly"))
+
+
+def test_corr(benchmark, dataset):
+    cols = build_smoothed_var_names(ALL_VARS, "Hourly")
+    benchmark(lambda: dataset[cols].corr())
+
+
+def test_prepare_plot_data(benchmark, dataset):
+    sel_vars = ["Temperature", "Humidity"]
+    cols = build_smoothed_var_names(sel_vars, "Hourly")
+    benchmark(prepare_plot_data, dataset, cols, make_label_map(sel_vars, "Hourly"), True)
+
+
+def test_line_figure(benchmark, dataset):
+    sel_vars = ["Temperature", "Humidity"]
+    cols = build_smoothed_var_names(sel_vars, "Hourly")
+    df_plot = prepare_plot_data(dataset, cols, make_label_map(sel_vars, "Hourly"), True)
+    benchmark.pedantic(
+        line_chart, args=(df_plot, "Normalised"),
+        rounds=3, iterations=1,  # seconds per call on the scaled data sets
+    )
+
+
+# 4) Seasonal share of the renewable potentials
+def test_seasonal_share(benchmark, dataset):
+    benchmark(compute_seasonal_share, dataset, build_renewable_cols(list(RENEW_MAP.keys()), "Hourly"))
+
+
+
+# Every statistic of every weather variable per month, in one pass over the integer period codes
+def test_monthly_aggregate(benchmark, dataset):
+    benchmark(aggregate, dataset, build_smoothed_var_names(ALL_VARS, "Hourly"), "month")
+
+
+# 5) Rolling correlations of the three potentials (weekly window): prefix sums vs. pandas, pair by pair
+def test_rolling_corr_prefix_sums(benchmark, dataset):
+    benchmark(rolling_corr, dataset[build_renewable_cols(list(RENEW_MAP), "Hourly")], 168)
+
+
+def test_rolling_corr_pandas(benchmark, dataset):
+    df = dataset[build_renewable_cols(list(RENEW_MAP), "Hourly")]
+    pairs = list(combinations(df.columns, 2))
+    benchmark(lambda: [df[a].rolling(168).corr(df[b]) for a, b in pairs])
@@ -0,0 +1,57 @@
+# Throughput of the headless query API (query_api.py) compared with the Streamlit rerun path that computes the same results for a browser session.
+#
+# Run from the repository root:
+#   python -m pytest benchmarks/bench_query_api.py
+
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import query_api
+
+STATS_QUERY = "/stats?period=month&month=1&smooth=weekly"
+MIXED_QUERIES = [f"/stats?period=month&month={m}&smooth={s}" for m in range(1, 13) for s in query_api.SMOOTHING] + \
+                [f"/corr?kind={k}&period=season&season={s}" for k in ("weather", "renewable") for s in ("Winter", "Spring", "Summer", "Autumn")]
+
+
+@pytest.fixture(scope="module")
+def api_url():
+    server = query_api.make_server(port=0) # any free port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _get(url):
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+# 1) One request, answered from the response cache or computed from scratch
+def test_api_cached(benchmark, api_url):
+    _get(api_url + STATS_QUERY)
+    benchmark(_get, api_url + STATS_QUERY)
+
+
+def test_api_uncached(benchmark, api_url):
+    benchmark.pedantic(_get, args=(api_url + STATS_QUERY,), setup=query_api.cached_response.cache_clear, rounds=50)
+
+
+# 2) Concurrent clients: 8 threads sending a mix of 60 different queries (one round = 240 requests)
+def test_api_concurrent(benchmark, api_url):
+    urls = [api_url + q for q in MIXED_QUERIES] * 4
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        benchmark(lambda: list(pool.map(_get, urls)))
+
+
+# 3) Streamlit rerun of the weather explorer with the same settings as STATS_QUERY (the whole page is recomputed on each widget change)
+def test_streamlit_rerun(benchmark):
+    at = AppTest.from_file("pages/1_Weather_Explorer.py", default_timeout=60)
+    at.run()
+    at.selectbox(key="stats_duration").set_value("One Month")
+    at.run()
+    at.selectbox(key="stats_smooth").set_value("Weekly MA")
+    benchmark.pedantic(at.run, rounds=10)
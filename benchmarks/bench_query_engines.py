@@ -0,0 +1,49 @@
+# Query engines (query_engines.py) compared on the three data sets of conftest.py, written as parquet files: pandas on the loaded frame,
+# DuckDB and Polars on the file itself. Engines whose package is not installed are skipped.
+# test_engine_parity checks that every engine gives the results of the app_utils helpers (those of the pages, run by the pandas engine); the other tests time the operations of the query API.
+#
+# Run from the repository root:
+#   python -m pytest benchmarks/bench_query_engines.py
+
+import pandas as pd
+import pytest
+
+from app_utils import build_smoothed_var_names, build_renewable_cols, filter_by_period, compute_summary_stats, compute_seasonal_share, VARS_MAP, RENEW_MAP, ENGINE_HELPERS
+from query_engines import make_engine, QUERY_ENGINES
+
+COLS = build_smoothed_var_names(list(VARS_MAP), "Weekly MA")
+RENEW_COLS = build_renewable_cols(list(RENEW_MAP), "Hourly")
+PERIODS = [("One Month", 1, None), ("One Season", None, "Winter"), ("Full Year", None, None)]
+MODULES = {"duckdb": "duckdb", "polars": "polars"}
+
+
+@pytest.fixture(params=QUERY_ENGINES)
+def engine(request, dataset, dataset_files):
+    if request.param in MODULES:
+        pytest.importorskip(MODULES[request.param])
+    parquet_path, _ = dataset_files
+    return make_engine(request.param, parquet_path, lambda: dataset, ENGINE_HELPERS)
+
+
+# 1) Same results as the pages' helpers, for every operation and kind of period
+@pytest.mark.parametrize("duration, month, season", PERIODS, ids=[p[0] for p in PERIODS])
+def test_engine_parity(engine, dataset, duration, month, season):
+    period = filter_by_period(dataset, duration, month, season)
+    pd.testing.assert_frame_equal(engine.summary_stats(COLS, duration, month, season), compute_summary_stats(period, COLS), check_dtype=False, rtol=1e-9)
+    pd.testing.assert_frame_equal(engine.correlation(COLS, duration, month, season), period[COLS].corr(), check_dtype=False, rtol=1e-9)
+    selected, expected = engine.select(COLS, duration, month, season), period[COLS]
+    assert len(selected) == len(expected) and (selected.sum() - expected.sum()).abs().max() <= 1e-6 * expected.abs().sum().max() # row order of several sites may differ
+    pd.testing.assert_frame_equal(engine.seasonal_share(RENEW_COLS), compute_seasonal_share(dataset, RENEW_COLS), check_dtype=False, check_names=False, rtol=1e-9)
+
+
+# 2) Timings
+def test_engine_summary_stats(benchmark, engine):
+    benchmark(engine.summary_stats, COLS, "One Month", 1)
+
+
+def test_engine_correlation(benchmark, engine):
+    benchmark(engine.correlation, COLS, "One Season", None, "Winter")
+
+
+def test_engine_seasonal_share(benchmark, engine):
+    benchmark(engine.seasonal_share, RENEW_COLS)
@@ -0,0 +1,49 @@
+# Shared fixtures for the benchmark suite: the data sets every hot path is measured on.
+#   - sion_1y:     the shipped one-year Sion file (8,784 rows)
+#   - sion_10y:    ten years of synthetic data at one site (~88k rows)
+#   - sites_100:   one year of synthetic data at 100 sites stacked in one frame (~880k rows)
+# The scaled data sets come from synthetic_weather.py, in the enriched schema of the app, so the suite runs offline.
+
+import logging
+
+import pandas as pd
+import pytest
+
+# Importing app_utils outside of `streamlit run` logs a "missing ScriptRunContext" warning for every cached call
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+from app_utils import load_local_data
+from synthetic_weather import generate_weather, make_sites
+
+DATASETS = ["sion_1y", "sion_10y", "sites_100"]
+
+
+# Stack the frames of several sites with a site identifier, as a multi-site data set would be stored
+def _stack_sites(frames: dict) -> pd.DataFrame:
+    return pd.concat(frames.values(), keys=frames.keys(), names=["site"]).reset_index("site")
+
+
+@pytest.fixture(scope="session")
+def sion_df():
+    return load_local_data()
+
+
+@pytest.fixture(scope="session", params=DATASETS)
+def dataset(request, sion_df):
+    if request.param == "sion_10y":
+        return generate_weather(make_sites(1), start="2015-01-01", n_years=10, enriched=True)["sion"]
+    if request.param == "sites_100":
+        return _stack_sites(generate_weather(make_sites(100), enriched=True))
+    return sion_df
+
+
+# Files on disk for the load benchmarks: the data set as (compressed) parquet, and as the uncompressed Arrow cache used by app_utils.load_data
+@pytest.fixture(scope="session")
+def dataset_files(dataset, tmp_path_factory):
+    from app_utils import _write_arrow_cache
+
+    folder = tmp_path_factory.mktemp("data")
+    parquet_path, arrow_path = folder / "weather.parquet", folder / "weather.arrow"
+    dataset.to_parquet(parquet_path)
+    _write_arrow_cache(dataset, arrow_path, "benchmark")
+    return parquet_path, arrow_path
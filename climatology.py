@@ -0,0 +1,177 @@
+# Climatology index: what is "normal" for every variable, site and time of year, computed once from a multi-year data set and stored compactly,
+# so that the pages can show anomalies and flag extreme hours for any period with a simple lookup (no climatology is recomputed on a rerun).
+#
+# For every site and raw weather variable (enrichment.HOURLY_VARS) the index holds, as float32:
+#   - hour of year (366 days x 24 hours): mean and PERCENTILES of the hourly values
+#   - day of year (366 days): mean and PERCENTILES of the daily means
+# Each day pools the values of the WINDOW_DAYS days on either side of it over all years, so that a decade of data gives enough values per slot.
+# Days are numbered on a leap-year calendar (29 February is day 59 in every year), so a date always falls in the same slot.
+#
+# Every site is stored with its source: "observed" for the app's own data file (site OBSERVED_SITE, built from that file), "dataset" for the sites of a
+# multi-site data set (possibly synthetic). The Weather Explorer only compares the app's data with an observed climatology.
+#
+# Usage:
+#   python climatology.py --observed                                     -> the app's data file (DATA_PATH), as site OBSERVED_SITE
+#   python climatology.py weather_sites climatology.npz                  -> every site of a multi-site data set (see synthetic_weather.py)
+#   python climatology.py weather_sites climatology.npz --sites sion --observed
+# The app reads CLIMATOLOGY_PATH (climatology.npz next to the app, or the WEATHER_CLIMATOLOGY environment variable); a rebuilt file is picked up by
+# the running server (the cache is keyed by the file's modification time).
+
+# Load libraries
+import argparse
+import os
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import streamlit as st
+
+from app_metrics import tracked_cache
+from app_utils import read_sites, APP_DIR, DATA_PATH
+from enrichment import HOURLY_VARS
+from seasons import leap_day_of_year
+
+CLIMATOLOGY_PATH = Path(os.environ.get("WEATHER_CLIMATOLOGY", APP_DIR / "climatology.npz"))
+OBSERVED_SITE = "observed" # climatology of the app's data file, built from that file
+PERCENTILES = np.array([1, 5, 50, 95, 99])
+WINDOW_DAYS = 7
+
+
+# 1) Calendar slots
+def day_slot(time: pd.DatetimeIndex) -> np.ndarray:
+    """Day of year on a leap-year calendar, 0 to 365."""
+    return leap_day_of_year(time)
+
+def hour_slot(time: pd.DatetimeIndex) -> np.ndarray:
+    """Hour of year on a leap-year calendar, 0 to 8783."""
+    return day_slot(time) * 24 + time.hour.to_numpy()
+
+
+# 2) Building the index
+def _nanpercentiles(a: np.ndarray, q) -> np.ndarray:
+    """Percentiles along the last axis ignoring NaN (linear interpolation, as np.nanpercentile), for all rows at once:
+    sorting puts the NaN last, so each row's percentiles are read at positions scaled by its own count of values."""
+    a = np.sort(a, axis=-1)
+    count = (~np.isnan(a)).sum(axis=-1, keepdims=True)
+    position = (np.asarray(q, dtype=np.float64) / 100) * np.maximum(count - 1, 0) # (..., n_percentiles)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(count - 1, 0))
+    weight = position - lower
+    out = np.take_along_axis(a, lower, -1) * (1 - weight) + np.take_along_axis(a, upper, -1) * weight
+    return np.where(count > 0, out, np.nan)
+
+def site_climatology(df: pd.DataFrame, variables=HOURLY_VARS, window_days=WINDOW_DAYS) -> dict:
+    """Hour-of-year and day-of-year mean and percentiles of one site's hourly data (DatetimeIndex, any number of years)."""
+    years = df.index.year.to_numpy()
+    year_idx = years - years.min()
+    cube = np.full((year_idx.max() + 1, 366, 24, len(variables)), np.nan, dtype=np.float32) # year x day x hour x variable
+    cube[year_idx, day_slot(df.index), df.index.hour.to_numpy()] = df[variables].to_numpy(dtype=np.float32)
+
+    # Days within window_days of each day (wrapping around the new year): (366 x window)
+    neighbours = (np.arange(366)[:, None] + np.arange(-window_days, window_days + 1)[None, :]) % 366
+
+    # Hour of year: pool years and neighbouring days -> (day x hour x variable x values)
+    pooled = cube[:, neighbours].transpose(1, 3, 4, 0, 2).reshape(366, 24, len(variables), -1)
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning) # slots without any value (e.g. partial years) are NaN
+        hoy_mean = np.nanmean(pooled, axis=-1)
+        hoy_pct = _nanpercentiles(pooled, PERCENTILES) # (day x hour x variable x percentile)
+
+        # Day of year: same on the daily means
+        daily = np.nanmean(cube, axis=2) # year x day x variable
+        pooled_daily = daily[:, neighbours].transpose(1, 3, 0, 2).reshape(366, len(variables), -1)
+        doy_mean = np.nanmean(pooled_daily, axis=-1)
+        doy_pct = _nanpercentiles(pooled_daily, PERCENTILES)
+
+    return {
+        "hoy_mean": hoy_mean.reshape(366 * 24, len(variables)).astype(np.float32),
+        "hoy_pct": hoy_pct.reshape(366 * 24, len(variables), len(PERCENTILES)).transpose(0, 2, 1).astype(np.float32),
+        "doy_mean": doy_mean.astype(np.float32),
+        "doy_pct": doy_pct.transpose(0, 2, 1).astype(np.float32),
+    }
+
+def build(dataset_dir=None, out_path=CLIMATOLOGY_PATH, sites=None, window_days=WINDOW_DAYS, data_file=None) -> Path:
+    """Climatology of the sites of a multi-site data set and/or of a single-site data file (the app's, as OBSERVED_SITE), written as one .npz file
+    with arrays indexed (site, slot, [percentile,] variable) and the source and years of each site."""
+    frames = {}
+    if data_file is not None:
+        frames[OBSERVED_SITE] = ("observed", lambda: pd.read_parquet(data_file, columns=HOURLY_VARS).sort_index())
+    if dataset_dir is not None:
+        dataset = ds.dataset(dataset_dir, format="parquet", partitioning="hive")
+        for site in list(read_sites(dataset_dir)["site"]) if sites is None else sites:
+            # the time index is restored from the pandas metadata
+            frames[site] = ("dataset", lambda site=site: dataset.to_table(columns=["time"] + HOURLY_VARS, filter=ds.field("site") == site).to_pandas().sort_index())
+    if not frames:
+        raise ValueError("nothing to build: give a data set and/or a data file")
+    per_site, years = [], []
+    for source, read in frames.values():
+        df = read()
+        per_site.append(site_climatology(df, HOURLY_VARS, window_days))
+        years.append([df.index.year.min(), df.index.year.max()])
+    out_path = Path(out_path)
+    np.savez(
+        out_path,
+        sites=np.array(list(frames)), sources=np.array([source for source, _ in frames.values()]), variables=np.array(HOURLY_VARS),
+        percentiles=PERCENTILES, window_days=window_days, years=np.array(years, dtype=int),
+        **{key: np.stack([s[key] for s in per_site]) for key in per_site[0]},
+    )
+    return out_path
+
+
+# 3) Using the index
+def load_climatology(path=CLIMATOLOGY_PATH):
+    """The whole index as a dict of arrays, or None if it has not been built (not cached, so an index built later is found on the next rerun)."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _read_climatology(str(path), mtime)
+
+# Keyed by the file's modification time; only the latest index is kept (2 entries: a rebuilt index while sessions may still hold the previous one)
+@tracked_cache(st.cache_resource(max_entries=2))
+def _read_climatology(path, mtime):
+    with np.load(path) as npz:
+        clim = {key: npz[key] for key in npz.files}
+    clim["sites"], clim["variables"] = clim["sites"].tolist(), clim["variables"].tolist()
+    clim["sources"] = clim["sources"].tolist() if "sources" in clim else ["unknown"] * len(clim["sites"]) # index built before sources were stored
+    return clim
+
+def observed(clim) -> bool:
+    """Whether the index holds the climatology of the app's data file (OBSERVED_SITE, built from observed data)."""
+    return clim is not None and OBSERVED_SITE in clim["sites"] and clim["sources"][clim["sites"].index(OBSERVED_SITE)] == "observed"
+
+def site_years(clim, site):
+    """First and last year of the site's data."""
+    years = clim["years"]
+    return tuple(int(y) for y in (years[clim["sites"].index(site)] if years.ndim == 2 else years))
+
+def anomalies(clim, site, df: pd.DataFrame, variables) -> pd.DataFrame:
+    """Hourly values minus the hour-of-year mean of the site, for the given raw variables."""
+    s, v = clim["sites"].index(site), [clim["variables"].index(var) for var in variables]
+    normal = clim["hoy_mean"][s][hour_slot(df.index)][:, v]
+    return df[variables] - normal
+
+def extreme_flags(clim, site, df: pd.DataFrame, variables, low=1, high=99) -> pd.DataFrame:
+    """-1 for hours below the low percentile of their hour of year, +1 above the high percentile, 0 otherwise."""
+    s, v = clim["sites"].index(site), [clim["variables"].index(var) for var in variables]
+    pct = list(clim["percentiles"])
+    bounds = clim["hoy_pct"][s][hour_slot(df.index)][:, [pct.index(low), pct.index(high)]][:, :, v] # hour x (low, high) x variable
+    values = df[variables].to_numpy()
+    return pd.DataFrame((values > bounds[:, 1]).astype(int) - (values < bounds[:, 0]).astype(int), index=df.index, columns=variables)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the climatology index (hour-of-year and day-of-year mean and percentiles) of a multi-site data set and/or of the app's data file.")
+    parser.add_argument("dataset_dir", nargs="?", help="multi-site data set (see synthetic_weather.py)")
+    parser.add_argument("out_path", nargs="?", default=CLIMATOLOGY_PATH)
+    parser.add_argument("--sites", nargs="+", help="only these sites (default: every site of the data set)")
+    parser.add_argument("--observed", action="store_true", help=f"also the app's data file ({DATA_PATH.name}), as site '{OBSERVED_SITE}'")
+    parser.add_argument("--window-days", type=int, default=WINDOW_DAYS, help="days pooled on either side of each day")
+    args = parser.parse_args()
+    if args.dataset_dir is None and not args.observed:
+        parser.error("give a data set and/or --observed")
+
+    path = build(args.dataset_dir, args.out_path, args.sites, args.window_days, DATA_PATH if args.observed else None)
+    print(f"Wrote the climatology of {len(np.load(path)['sites'])} site(s) to {path} ({path.stat().st_size / 1e6:.1f} MB)")
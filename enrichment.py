@@ -0,0 +1,214 @@
+# Enrichment steps of the data sourcing notebook, as reusable functions: they turn the raw hourly data fetched from Open-Meteo into the enriched schema read by the app (sion_weather_enriched.parquet).
+# Used for data that does not come out of the notebook, e.g. the synthetic data sets of synthetic_weather.py.
+# Archives too large for memory (decades x hundreds of sites) are enriched in streaming mode, batch by batch (see 4) at the end of the file):
+#   python enrichment.py weather_raw weather_enriched --batch-size 8760
+
+# Load libraries
+import argparse
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from period_aggregation import period_code, transform
+from seasons import season_labels
+
+# The eight hourly variables downloaded from the historical weather API (same order as in the notebook)
+HOURLY_VARS = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "rain",
+    "snowfall",
+    "precipitation",
+    "cloudcover",
+    "shortwave_radiation",
+    "windspeed_10m",
+]
+
+WEEKLY_MA_WINDOW = 168 # 168-hour (7-day) rolling window
+BATCH_SIZE = 8760      # hours per batch in streaming mode (one year of one site)
+
+
+# 1) Time-based features
+def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
+    df["year"] = df.index.year # to know the year in which an observation is
+    df["month"] = df.index.month # idem for month
+    df["day"] = df.index.day # idem for nth day of the month
+    df["hour"] = df.index.hour # idem for nth hour of the day
+    df["weekday"] = df.index.day_name() # day of the week of the observation
+
+    # Season, using the same cut points as the notebook (20th of March, June, September and December) but repeated every year
+    # (the notebook's cut points only cover the 2024-25 year); see seasons.py for the other definitions
+    df["season"] = season_labels(df.index)
+    return df
+
+
+# 2) Weekly moving averages and calendar-month averages of every weather variable
+
+# Rolling mean (or sum) over the last WEEKLY_MA_WINDOW hours. `history` holds the hours just before `values` (streaming mode), so that the first hours
+# of a batch get the same window as in one pass over the whole series.
+def weekly_rolling(values, history=None, how="mean"):
+    n = len(values)
+    if history is not None and len(history):
+        values = pd.concat([history, values])
+    rolled = getattr(values.rolling(window=WEEKLY_MA_WINDOW, min_periods=1), how)()
+    return rolled.iloc[len(rolled) - n:]
+
+def add_smoothed_vars(df: pd.DataFrame, history=None) -> pd.DataFrame:
+    weekly = weekly_rolling(df[HOURLY_VARS], None if history is None else history[HOURLY_VARS])
+    monthly = transform(df, HOURLY_VARS, "month", "mean") # real months, rather than simply grouping by 30 days
+    for col in HOURLY_VARS:
+        df[f"{col}_weekly_avg"] = weekly[col]
+    for col in HOURLY_VARS:
+        df[f"{col}_month_avg"] = monthly[col]
+    return df
+
+
+# 3) Renewable energy potentials (same proxies as in the notebook)
+def wind_potential(df: pd.DataFrame) -> pd.Series:
+    return df["windspeed_10m"] ** 3 # cubed wind speed
+
+def hydro_potential(df: pd.DataFrame) -> pd.Series:
+    return df["precipitation"].where(df["precipitation"] >= 1, 0) # meaningful precipitation only
+
+def add_potentials(df: pd.DataFrame, history=None) -> pd.DataFrame:
+    # Only count meaningful precipitation (>= 1 mm)
+    df["binary_hourly_precipitation"] = (df["precipitation"] >= 1).astype(int)
+
+    # Solar potential: global horizontal irradiance as such
+    df["solar_potential"] = df["shortwave_radiation"]
+    df["solar_potential_weekly_avg"] = df["shortwave_radiation_weekly_avg"]
+    df["solar_potential_month_avg"] = df["shortwave_radiation_month_avg"]
+
+    # Wind potential: cubed wind speed
+    df["wind_potential"] = wind_potential(df)
+    df["wind_potential_weekly_avg"] = weekly_rolling(df["wind_potential"], None if history is None else wind_potential(history))
+    df["wind_potential_month_avg"] = transform(df, ["wind_potential"], "month", "mean")["wind_potential"]
+
+    # Hydro potential: meaningful precipitation, summed over the week and over the month
+    df["hydro_potential"] = hydro_potential(df)
+    df["hydro_potential_weekly_avg"] = weekly_rolling(df["hydro_potential"], None if history is None else hydro_potential(history), "sum")
+    df["hydro_potential_month_avg"] = transform(df, ["hydro_potential"], "month", "sum")["hydro_potential"]
+    return df
+
+
+def enrich(raw: pd.DataFrame, history=None) -> pd.DataFrame:
+    """Raw hourly data of one site (DatetimeIndex, HOURLY_VARS columns) -> enriched frame, in the column order of sion_weather_enriched.parquet.
+    history: raw hours just before `raw` (the last WEEKLY_MA_WINDOW - 1 are enough), for the weekly windows of its first hours; the monthly averages
+    only cover `raw`, which must therefore hold whole months (see StreamingEnricher)."""
+    df = raw[HOURLY_VARS].copy()
+    df = add_time_features(df)
+    df = add_smoothed_vars(df, history)
+    return add_potentials(df, history)
+
+
+
+
+
+# 4) Streaming mode, for archives that do not fit in memory: each site's hours are read in time order, a batch at a time, and written out as soon as
+#    their month is complete. Peak memory is bounded by the batch size (plus one month of hours), whatever the length of the archive.
+
+class StreamingEnricher:
+    """Enrichment of one site's raw hourly data received in time-ordered batches, identical to enrich() on the whole series.
+    Carried from one batch to the next: the last WEEKLY_MA_WINDOW - 1 hours (rolling windows) and the hours of the month in progress, kept raw until
+    the month is complete, since each of them needs the whole month's average. push() returns the enriched hours of the months completed so far
+    (possibly none), flush() those of the last month, once the input is exhausted."""
+
+    def __init__(self):
+        self.history = None # raw hours already enriched, the last WEEKLY_MA_WINDOW - 1 only
+        self.pending = None # raw hours of the month in progress
+
+    def push(self, raw: pd.DataFrame) -> pd.DataFrame:
+        raw = raw[HOURLY_VARS]
+        last = self.pending if self.pending is not None and len(self.pending) else self.history
+        if not raw.index.is_monotonic_increasing or (last is not None and len(raw) and raw.index[0] <= last.index[-1]):
+            raise ValueError("streaming enrichment needs the hours of a site in increasing time order")
+        data = raw if self.pending is None else pd.concat([self.pending, raw])
+        months = period_code(data, "month")
+        done = int(np.searchsorted(months, months[-1])) if len(data) else 0 # first hour of the last month seen
+        self.pending = data.iloc[done:]
+        return self._enrich(data.iloc[:done])
+
+    def flush(self) -> pd.DataFrame:
+        out = self._enrich(self.pending if self.pending is not None else pd.DataFrame(columns=HOURLY_VARS, index=pd.DatetimeIndex([], name="time")))
+        self.pending = None
+        return out
+
+    def _enrich(self, raw):
+        out = enrich(raw, self.history)
+        if len(raw):
+            self.history = (raw if self.history is None else pd.concat([self.history, raw])).iloc[-(WEEKLY_MA_WINDOW - 1):]
+        return out
+
+
+# Hours of one site in time order, batch by batch: the site's files sorted by path (year=<yyyy> partitions), each read batch_size rows at a time
+def site_batches(dataset: ds.Dataset, site: str, batch_size=BATCH_SIZE):
+    fragments = sorted(dataset.get_fragments(filter=ds.field("site") == site), key=lambda fragment: fragment.path)
+    for fragment in fragments:
+        for batch in fragment.to_batches(columns=["time", *HOURLY_VARS], batch_size=batch_size):
+            df = batch.to_pandas() # files written by pandas: "time" comes back as the index
+            yield df.set_index("time") if "time" in df.columns else df
+
+# Enriched hours of one site, written to site=<id>/year=<yyyy>/part-0.parquet; one file open at a time, one row group per write
+class _PartitionWriter:
+    def __init__(self, output_dir, site):
+        self.folder = Path(output_dir) / f"site={site}"
+        self.year = self.writer = None
+
+    def write(self, df: pd.DataFrame):
+        years = df.index.year.to_numpy()
+        for year in np.unique(years):
+            table = pa.Table.from_pandas(df[years == year], preserve_index=True)
+            if year != self.year:
+                self.close()
+                (self.folder / f"year={year}").mkdir(parents=True, exist_ok=True)
+                self.year, self.writer = year, pq.ParquetWriter(self.folder / f"year={year}" / "part-0.parquet", table.schema)
+            self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.year = self.writer = None
+
+def enrich_archive(source_dir, output_dir, batch_size=BATCH_SIZE, sites=None) -> int:
+    """Raw partitioned archive (site=<id>/year=<yyyy>/*.parquet, as written by synthetic_weather.py) -> enriched archive with the same layout,
+    one site after the other and batch_size hours at a time. The _sites.json table is copied along. Returns the number of hours written."""
+    dataset = ds.dataset(source_dir, format="parquet", partitioning="hive")
+    if sites is None:
+        sites = sorted({ds.get_partition_keys(fragment.partition_expression)["site"] for fragment in dataset.get_fragments()})
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    if (Path(source_dir) / "_sites.json").exists():
+        shutil.copy(Path(source_dir) / "_sites.json", Path(output_dir) / "_sites.json")
+
+    hours = 0
+    for site in sites:
+        enricher, writer = StreamingEnricher(), _PartitionWriter(output_dir, site)
+        try:
+            for raw in site_batches(dataset, site, batch_size):
+                out = enricher.push(raw)
+                if len(out):
+                    writer.write(out)
+                    hours += len(out)
+            out = enricher.flush()
+            if len(out):
+                writer.write(out)
+                hours += len(out)
+        finally:
+            writer.close()
+    return hours
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrich a partitioned raw hourly archive (site=<id>/year=<yyyy>) batch by batch, in bounded memory.")
+    parser.add_argument("source_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="hours read at a time")
+    parser.add_argument("--sites", nargs="+", help="only these sites (default: every site of the archive)")
+    args = parser.parse_args()
+
+    hours = enrich_archive(args.source_dir, args.output_dir, args.batch_size, args.sites)
+    print(f"Wrote {hours} enriched hours to {args.output_dir}")
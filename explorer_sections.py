@@ -0,0 +1,311 @@
+# Section computations of the Weather Explorer (summary statistics, correlation matrix, time series plot frame, histogram bins) as functions of the
+# selected parameters only, with a result cache shared by every session of the server process, and a background prefetch:
+# after a month has been served, the neighbouring months and the month's season are computed in a thread pool, so that stepping through the year
+# with the month selectors finds its results already in the cache.
+#
+# Results are keyed by section, parameters and the fingerprint of the frame they are computed from (app_utils.frame_fingerprint: a new data file never
+# reuses old results, even while the file on disk is newer than the frame still being served). Calls and misses are counted in
+# app_metrics under "section.<name>", so the hit rates show up in the debug panel and on /metrics; prefetches are timed under "prefetch.<name>".
+# The sections of one rerun are themselves computed concurrently, in a second thread pool (submit_sections).
+# Besides months, seasons and the full year, the statistics, correlation and histogram sections accept any date range (CUSTOM_RANGE): mean, standard
+# deviation, correlation, minimum and maximum then come from prefix sums and sparse tables built once per smoothing level (prefix_stats.IntervalStats),
+# so a new range costs O(1) per statistic instead of a filter and a pass over its rows.
+# Deployment settings: WEATHER_PREFETCH_WORKERS threads (0 disables the prefetch), WEATHER_SECTION_WORKERS threads per server process for the sections
+# of a rerun (1 computes them one after the other), WEATHER_RESULT_CACHE_SIZE results kept for live traffic, plus the states prepared by warm_cache.py (least recently used are dropped).
+
+# Load libraries
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app_metrics import registry, timed
+from app_utils import (
+    frame_fingerprint,
+    filter_by_period,
+    build_smoothed_var_names,
+    make_label_map,
+    compute_summary_stats,
+    prepare_plot_data,
+    VARS_MAP,
+    SMOOTH_SUFFIX,
+    TIME_RANGES,
+    MONTHS,
+)
+from app_figures import histogram_bins
+from prefix_stats import IntervalStats
+from seasons import season_labels
+
+PREFETCH_WORKERS  = int(os.environ.get("WEATHER_PREFETCH_WORKERS", 2))
+RESULT_CACHE_SIZE = int(os.environ.get("WEATHER_RESULT_CACHE_SIZE", 256))
+SECTION_WORKERS   = int(os.environ.get("WEATHER_SECTION_WORKERS", 4)) # sections of one rerun computed concurrently (1 = one after the other)
+
+# Season matching each month: the one its 15th day falls in (the season column's definition)
+MONTH_SEASONS = dict(zip(MONTHS, season_labels(pd.DatetimeIndex([f"2024-{m:02d}-15" for m in MONTHS])).astype(str)))
+
+# Default widget values of the Weather Explorer (also the states prepared by warm_cache.py)
+DEFAULT_PLOT_VARS = ["Temperature", "Humidity"]
+DEFAULT_HIST_VAR  = "Temperature"
+
+# Free date range of the Weather Explorer: period choice (CUSTOM_RANGE, start, end), ISO dates, end excluded
+CUSTOM_RANGE = "Custom Range"
+EXPLORER_TIME_RANGES = TIME_RANGES + [CUSTOM_RANGE]
+
+logger = logging.getLogger("weather_app.prefetch")
+
+
+
+
+
+# 1) Section computations: (frame, duration, month, season, *section parameters) -> result shown by the page
+
+# Rows of the period, sliced again by each section rather than cached: the cache keeps the small results shown by the page, not copies of the data.
+# The full year is the frame itself (results are never modified in place).
+def period_frame(df, duration, month, season):
+    return df if duration == "Full Year" else filter_by_period(df, duration, month, season)
+
+def summary_table(df, duration, month, season, smooth):
+    stats = compute_summary_stats(period_frame(df, duration, month, season), build_smoothed_var_names(list(VARS_MAP), smooth))
+    stats.index = list(VARS_MAP) # friendly row names
+    return stats
+
+def correlation_matrix(df, duration, month, season, smooth):
+    return period_frame(df, duration, month, season)[build_smoothed_var_names(list(VARS_MAP), smooth)].corr()
+
+def plot_frame(df, duration, month, season, smooth, sel_vars: tuple, normalise):
+    cols = build_smoothed_var_names(list(sel_vars), smooth)
+    return prepare_plot_data(period_frame(df, duration, month, season), cols, make_label_map(list(sel_vars), smooth), normalise)
+
+def histogram_values(df, duration, month, season, col, value_filter=None):
+    """Histogram bins of one column, optionally on the hours where another column lies in a range: value_filter = (column, low, high)."""
+    return _histogram(period_frame(df, duration, month, season), col, value_filter)
+
+def _histogram(df_hist, col, value_filter):
+    if value_filter is not None:
+        filt_col, low, high = value_filter
+        df_hist = df_hist[(df_hist[filt_col] >= low) & (df_hist[filt_col] <= high)]
+    return histogram_bins(df_hist[col])
+
+# Same sections on a custom date range: (frame, start, end, *section parameters)
+
+def interval_stats(df, smooth):
+    return IntervalStats(df, build_smoothed_var_names(list(VARS_MAP), smooth))
+
+def range_frame(df, start, end):
+    """Rows start <= time < end, as a positional slice of the time-sorted frame (no boolean mask)."""
+    return df.iloc[df.index.searchsorted(pd.Timestamp(start)):df.index.searchsorted(pd.Timestamp(end))]
+
+def range_summary_table(df, start, end, smooth):
+    """Summary table of the range; a range without any hour of data gives a table of NaN."""
+    stats = section_result(df, "intervals", smooth)
+    a, b = stats.rows(start, end)
+    table = stats.summary(a, max(a, b))
+    table.index = list(VARS_MAP)
+    return table
+
+def range_correlation_matrix(df, start, end, smooth):
+    stats = section_result(df, "intervals", smooth)
+    return pd.DataFrame(stats.corr(*stats.rows(start, end)), index=stats.cols, columns=stats.cols)
+
+def range_histogram_values(df, start, end, col, value_filter=None):
+    return _histogram(range_frame(df, start, end), col, value_filter)
+
+SECTIONS = {
+    "stats": summary_table,
+    "corr": correlation_matrix,
+    "plot": plot_frame,
+    "hist": histogram_values,
+    "intervals": interval_stats,
+    "range_stats": range_summary_table,
+    "range_corr": range_correlation_matrix,
+    "range_hist": range_histogram_values,
+}
+RANGE_SECTIONS = {"stats": "range_stats", "corr": "range_corr", "hist": "range_hist"}
+
+def section_job(section, choice, *params):
+    """(section, *args) for a period choice: (duration, month, season), or (CUSTOM_RANGE, start, end) for the custom range variant of the section."""
+    if choice[0] == CUSTOM_RANGE:
+        return (RANGE_SECTIONS[section], *choice[1:], *params)
+    return (section, *choice, *params)
+
+def value_range(df, choice, var, smooth):
+    """Minimum and maximum of a variable at a smoothing level over a period choice (O(1) for a custom range), or None if the period has no value."""
+    col = VARS_MAP[var] + SMOOTH_SUFFIX[smooth]
+    if choice[0] == CUSTOM_RANGE:
+        stats = section_result(df, "intervals", smooth)
+        a, b = stats.rows(*choice[1:])
+        if b <= a:
+            return None
+        i = stats.cols.index(col)
+        low, high = float(stats.min(a, b)[i]), float(stats.max(a, b)[i])
+    else:
+        df_period = period_frame(df, *choice)
+        low, high = float(df_period[col].min()), float(df_period[col].max())
+    return None if np.isnan(low) else (low, high)
+
+
+
+
+
+# 2) Result cache shared by all sessions and by the worker threads
+class _ResultCache:
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.size = size
+        self.results = OrderedDict() # key -> result, least recently used first
+        self.pending = {}            # key -> future of a computation that has not finished yet (prefetch, or another session or section)
+        self.queued = {}             # key -> pool task of a prefetch that has not started yet
+
+    def put(self, key, result):
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.size:
+                self.results.popitem(last=False)
+
+    # Cached result, or (None, future): the future of the computation already running for this key, or a new one that the caller must fulfil (owner)
+    def lookup(self, key):
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                return True, self.results[key], False
+            if key in self.pending:
+                return False, self.pending[key], False
+            future = self.pending[key] = Future()
+            return False, future, True
+
+    # A prefetch still queued behind others is cancelled, and its key handed over to the caller, who computes it at once (True); False if it has started
+    def take_queued(self, key) -> bool:
+        with self.lock:
+            task = self.queued.pop(key, None)
+        return task is not None and task.cancel()
+
+results = _ResultCache(RESULT_CACHE_SIZE)
+
+# Room for n results prepared ahead (warm_cache.py) on top of the RESULT_CACHE_SIZE results of live traffic, so that the warm-up does not take the
+# slots of the sessions' own results (and is not evicted by the first few of them)
+def reserve_results(n: int):
+    with results.lock:
+        results.size = max(results.size, RESULT_CACHE_SIZE + n)
+
+def _key(df, section, args):
+    return (frame_fingerprint(df), section) + tuple(args)
+
+# Compute one result and hand it to whoever waits for it; the result is cached before the key leaves `pending`, so it is never computed twice
+def _run(key, future, section, df, args):
+    try:
+        result = SECTIONS[section](df, *args)
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        results.put(key, result)
+        future.set_result(result)
+        return result
+    finally:
+        with results.lock:
+            results.pending.pop(key, None)
+
+# Result of a section for the given parameters: from the cache, from a computation already running (waited for), or computed now.
+# A prefetch of the same key that is still waiting for a pool thread is not waited for (it may be queued behind unrelated prefetches): it is computed now.
+# Results are shared between sessions: never modify them in place.
+def section_result(df, section, *args):
+    key = _key(df, section, args)
+    registry.count_cache(f"section.{section}", miss=False)
+    found, result, owner = results.lookup(key)
+    if found:
+        return result
+    if not owner and results.take_queued(key):
+        owner = True # the pending future is now ours to fulfil
+    if not owner and result.exception() is None: # a failed computation is tried again below
+        return result.result()
+    registry.count_cache(f"section.{section}", miss=True)
+    with timed(f"section.{section}"):
+        return _run(key, result if owner else Future(), section, df, args)
+
+
+
+
+
+# Results computed elsewhere (persisted by warm_cache.py) from the frame df, put in the cache as if they had just been computed: {(section, *args): result}
+def restore_results(df, entries: dict):
+    for (section, *args), result in entries.items():
+        results.put(_key(df, section, args), result)
+
+
+
+
+
+# 3) Background prefetch
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        return _executor
+
+def _prefetched(key, future, section, df, args):
+    with results.lock:
+        results.queued.pop(key, None) # started: no longer handed over to a foreground request
+    try:
+        with timed(f"prefetch.{section}"):
+            _run(key, future, section, df, args)
+    except Exception as exc:
+        logger.warning("prefetch of %s%s failed: %r", section, args, exc)
+
+def _prefetch(df, section, args):
+    key = _key(df, section, args)
+    found, future, owner = results.lookup(key)
+    if owner:
+        with results.lock: # registered before the task can start and unregister itself
+            results.queued[key] = _pool().submit(_prefetched, key, future, section, df, args)
+
+# Periods the user is likely to pick next after a month: the previous and next months (wrapping around the year) and the month's season
+def neighbour_periods(month):
+    return [
+        ("One Month", (month - 2) % 12 + 1, None),
+        ("One Month", month % 12 + 1, None),
+        ("One Season", None, MONTH_SEASONS[month]),
+    ]
+
+# Called by the page after serving a section for one month: queues the same section, with the same parameters, for the neighbouring periods
+def prefetch_neighbours(df, section, duration, month, season, *params):
+    if duration != "One Month" or PREFETCH_WORKERS <= 0:
+        return
+    for period in neighbour_periods(month):
+        _prefetch(df, section, period + tuple(params))
+
+
+
+
+
+# 4) Concurrent sections within one rerun: the page submits every section at once and renders them in order as their results arrive,
+#    so a rerun takes about as long as its slowest section rather than the sum (pandas and NumPy release the GIL in most of this work).
+
+_section_executor = None
+
+def _section_pool():
+    global _section_executor
+    with _executor_lock:
+        if _section_executor is None:
+            _section_executor = ThreadPoolExecutor(max_workers=SECTION_WORKERS, thread_name_prefix="section")
+        return _section_executor
+
+def submit_sections(df, jobs: dict) -> dict:
+    """jobs: name -> (section, *args). Returns name -> future of section_result; with SECTION_WORKERS <= 1 the sections are computed in turn, here."""
+    futures = {}
+    for name, (section, *args) in jobs.items():
+        if SECTION_WORKERS > 1:
+            futures[name] = _section_pool().submit(section_result, df, section, *args)
+        else:
+            futures[name] = Future()
+            futures[name].set_result(section_result(df, section, *args))
+    return futures
@@ -0,0 +1,55 @@
+# Hydro potential from a simple runoff model, as an alternative to the precipitation proxy of the notebook (hydro_potential), which ignores snow:
+#   - degree-day snow store: snowfall accumulates as snow water equivalent and melts at DEGREE_DAY_FACTOR mm per °C above T_MELT and per hour
+#   - linear reservoir: rain + snowmelt fill a catchment store that releases a fixed fraction of its content every hour (residence time RESERVOIR_HOURS)
+# Both steps are whole-array operations (a clipped cumulative sum and an IIR filter), with time on the last axis by default, so that one call covers
+# any number of sites (site x hour arrays) and years without a Python loop over the hours.
+# Runoff is expressed in mm/h of water over the catchment; like the other proxies it is only shown normalised, so the parameters mostly set its timing.
+
+# Load libraries
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+from enrichment import WEEKLY_MA_WINDOW
+from period_aggregation import transform
+
+DEGREE_DAY_FACTOR = 0.15 # mm of melt per °C per hour (3.6 mm/°C/day, a usual value for snow)
+T_MELT = 0.0             # °C
+RESERVOIR_HOURS = 240    # residence time of the linear reservoir (10 days)
+SNOW_CM_PER_MM = 0.7     # Open-Meteo snowfall is in cm: 0.7 cm of snow = 1 mm of water
+
+
+# 1) Degree-day snowmelt
+def snowmelt(temperature, snowfall, ddf=DEGREE_DAY_FACTOR, t_melt=T_MELT, axis=-1):
+    """Hourly melt (mm) and snow store (mm of water) from temperature (°C) and snowfall (cm); the store starts empty.
+    The store follows S[t] = max(S[t-1] + snow[t] - potential_melt[t], 0), whose closed form is the cumulative sum of the increments
+    minus its running minimum (when below 0), so no loop over the hours is needed."""
+    snow = np.asarray(snowfall, dtype=np.float64) / SNOW_CM_PER_MM
+    potential_melt = ddf * np.clip(np.asarray(temperature, dtype=np.float64) - t_melt, 0, None)
+    cumulative = np.cumsum(snow - potential_melt, axis=axis)
+    store = cumulative - np.minimum(np.minimum.accumulate(cumulative, axis=axis), 0)
+    melt = np.clip(snow - np.diff(store, axis=axis, prepend=0), 0, None) # what left the store, S[t-1] + snow[t] - S[t] (clipped: rounding noise)
+    return melt, store
+
+# 2) Linear reservoir routing
+def linear_reservoir(inflow, residence_hours=RESERVOIR_HOURS, axis=-1):
+    """Outflow of a linear reservoir, Q[t] = c * Q[t-1] + (1 - c) * inflow[t] with c = exp(-1 / residence_hours), as a first-order IIR filter.
+    The reservoir starts at the steady state of the mean inflow, so the first weeks are not biased towards zero."""
+    inflow = np.asarray(inflow, dtype=np.float64)
+    c = np.exp(-1 / residence_hours)
+    initial = c * np.expand_dims(inflow.mean(axis=axis), axis) # filter state giving Q[-1] = mean inflow
+    runoff, _ = lfilter([1 - c], [1, -c], inflow, axis=axis, zi=initial)
+    return runoff
+
+def runoff(temperature, rain, snowfall, axis=-1):
+    """Runoff (mm/h) of rain and snowmelt through the linear reservoir."""
+    melt, _ = snowmelt(temperature, snowfall, axis=axis)
+    return linear_reservoir(np.asarray(rain, dtype=np.float64) + melt, axis=axis)
+
+
+# 3) Column family of the app: hydro_runoff, with the same smoothing levels as the other potentials (runoff is a flow, so both are means)
+def add_hydro_runoff(df: pd.DataFrame) -> pd.DataFrame:
+    df["hydro_runoff"] = runoff(df["temperature_2m"].to_numpy(), df["rain"].to_numpy(), df["snowfall"].to_numpy())
+    df["hydro_runoff_weekly_avg"] = df["hydro_runoff"].rolling(window=WEEKLY_MA_WINDOW, min_periods=1).mean()
+    df["hydro_runoff_month_avg"] = transform(df, ["hydro_runoff"], "month", "mean")["hydro_runoff"]
+    return df
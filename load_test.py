@@ -0,0 +1,282 @@
+# Load-test harness for the Streamlit pages: how many concurrent sessions can one server process serve before rerun latency degrades?
+# The tool starts the app with `streamlit run` (or targets a running server with --url) and drives N simulated browser sessions over Streamlit's websocket
+# protocol: each session opens a page, then keeps changing one of its widgets at random (selectboxes, multiselects, radios, checkboxes, sliders) and
+# waits for the rerun to finish, as a browser would. Widgets inside a fragment trigger a fragment rerun only, as in the browser.
+# For every concurrency level it reports the p50 / p95 / p99 rerun latency per page, the server's memory growth, and the hit rates of the app's caches
+# over that level (read from the app's /metrics endpoint, see app_metrics.py). Everything runs locally.
+#
+# Usage:
+#   python load_test.py                                                  -> 1, 2, 4 and 8 sessions, 20 reruns each, all three pages
+#   python load_test.py --sessions 1 4 16 --reruns 50 --pages Weather_Explorer --csv load_test.csv
+#   python load_test.py --url http://127.0.0.1:8501 --metrics-url http://127.0.0.1:9100/metrics   -> server started separately
+# NB: Streamlit's AppTest cannot be used for this: it swaps a process-wide runtime on every run, so several AppTest sessions cannot run at the same time,
+# and each of its runs starts with empty st.cache_data caches. Latency is measured by the client, from sending the rerun to the end of the script run,
+# including the time to receive the page's elements.
+
+# Load libraries
+import argparse
+import asyncio
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from tornado.httpclient import HTTPRequest
+from tornado.websocket import websocket_connect
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP_DIR = Path(__file__).resolve().parent
+PAGES = ["", "Weather_Explorer", "Renewable_Energy_Insights"] # URL paths of the pages ("" = Home.py)
+SESSIONS = [1, 2, 4, 8]
+RERUNS = 20           # widget changes (reruns) per session, after the first run
+TIMEOUT = 300         # seconds allowed for one rerun
+PERCENTILES = [50, 95, 99]
+WIDGETS = ("selectbox", "radio", "multiselect", "checkbox", "slider", "date_input")
+
+
+# 1) The app server, and what it exposes: process memory and cache counters
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port, metrics_port):
+    """`streamlit run Home.py` in a subprocess, with the metrics endpoint enabled; returns once the server answers its health check."""
+    env = dict(os.environ, WEATHER_METRICS_PORT=str(metrics_port))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(APP_DIR / "Home.py"), "--server.headless", "true", "--server.port", str(port),
+         "--server.enableXsrfProtection", "false", "--browser.gatherUsageStats", "false"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.read() == b"ok":
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("the Streamlit server did not start")
+
+def rss_mb(pid):
+    """Resident memory of a process in MB (Linux), None elsewhere."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, TypeError):
+        return None
+
+def cache_counts(metrics_url):
+    """Calls and misses of every cached function, from the OpenMetrics text of app_metrics (empty if the endpoint is not reachable)."""
+    try:
+        with urllib.request.urlopen(metrics_url, timeout=5) as response:
+            text = response.read().decode()
+    except OSError:
+        return pd.DataFrame(columns=["Calls", "Misses"])
+    counts = {}
+    for kind, cache, value in re.findall(r'^weather_app_cache_(calls|misses)_total\{cache="([^"]+)"\} (\d+)', text, re.M):
+        counts.setdefault(cache, {"Calls": 0, "Misses": 0})["Calls" if kind == "calls" else "Misses"] = int(value)
+    return pd.DataFrame.from_dict(counts, orient="index", columns=["Calls", "Misses"])
+
+
+# 2) One simulated browser session
+
+class Session:
+    def __init__(self, url, page, rng):
+        self.url, self.page, self.rng = url, page, rng
+        self.widgets = {}   # widget id -> (kind, element proto, fragment id) of the last run
+        self.states = {}    # widget id -> WidgetState, as a browser keeps them
+        self.ws = None
+
+    async def connect(self):
+        ws_url = re.sub(r"^http", "ws", self.url.rstrip("/")) + "/_stcore/stream"
+        self.ws = await websocket_connect(HTTPRequest(ws_url, headers={"Sec-WebSocket-Protocol": "streamlit"}))
+
+    def _remember(self, kind, element, fragment_id):
+        """Current value of a widget drawn by the script (its default, or the value set by the script), unless the session already holds one."""
+        self.widgets[element.id] = (kind, element, fragment_id)
+        if element.id in self.states and not element.set_value:
+            return
+        state = WidgetState(id=element.id)
+        if kind in ("selectbox", "radio"):
+            if element.HasField("value") or element.HasField("default"):
+                state.int_value = element.value if element.set_value else element.default
+        elif kind == "multiselect":
+            state.int_array_value.data.extend(element.value if element.set_value else element.default)
+        elif kind == "checkbox":
+            state.bool_value = element.value if element.set_value else element.default
+        elif kind == "slider":
+            state.double_array_value.data.extend(element.value if element.set_value else element.default)
+        elif kind == "date_input":
+            state.string_array_value.data.extend(element.value if element.set_value else element.default)
+        self.states[element.id] = state
+
+    async def rerun(self, fragment_id=""):
+        """Send a rerun with the session's widget states and read messages until the run finishes: (seconds, error message or None)."""
+        msg = BackMsg()
+        msg.rerun_script.page_name = self.page
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        if not fragment_id:
+            self.widgets = {}
+        error = None
+        start = time.perf_counter()
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+        while True:
+            payload = await asyncio.wait_for(self.ws.read_message(), TIMEOUT)
+            if payload is None:
+                return time.perf_counter() - start, "connection closed"
+            fmsg = ForwardMsg.FromString(payload)
+            if fmsg.HasField("delta") and fmsg.delta.HasField("new_element"):
+                element = fmsg.delta.new_element
+                kind = element.WhichOneof("type")
+                if kind in WIDGETS:
+                    self._remember(kind, getattr(element, kind), fmsg.delta.fragment_id)
+                elif kind == "exception" and not element.exception.is_warning:
+                    error = f"{element.exception.type}: {element.exception.message}"[:200]
+            elif fmsg.HasField("script_finished") and fmsg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return time.perf_counter() - start, error
+
+    def change_random_widget(self):
+        """Give one widget of the last run a random value; returns (description, fragment id to rerun), or None if the page has no widgets."""
+        candidates = [(i, w) for i, w in self.widgets.items() if not w[1].disabled]
+        if not candidates:
+            return None
+        widget_id, (kind, element, fragment_id) = self.rng.choice(candidates)
+        state = WidgetState(id=widget_id)
+        if kind in ("selectbox", "radio"):
+            state.int_value = self.rng.randrange(len(element.options))
+        elif kind == "multiselect":
+            state.int_array_value.data.extend(sorted(self.rng.sample(range(len(element.options)), self.rng.randint(1, min(3, len(element.options))))))
+        elif kind == "checkbox":
+            state.bool_value = not self.states[widget_id].bool_value
+        elif kind == "slider":
+            draw = lambda: round(self.rng.uniform(element.min, element.max) / element.step) * element.step
+            state.double_array_value.data.extend(sorted(draw() for _ in element.default))
+        elif kind == "date_input": # dates as "YYYY/MM/DD", between the widget's bounds
+            first, last = (datetime.strptime(d, "%Y/%m/%d").toordinal() for d in (element.min, element.max))
+            state.string_array_value.data.extend(sorted(date.fromordinal(self.rng.randint(first, last)).strftime("%Y/%m/%d") for _ in element.default))
+        self.states[widget_id] = state
+        return f"{kind}:{element.label}", fragment_id
+
+
+async def run_session(url, page, reruns, seed, think_time=0.0):
+    """First run of the page, then `reruns` random widget changes: one record per run."""
+    session = Session(url, page, random.Random(seed))
+    await session.connect()
+    records = []
+    try:
+        for i in range(reruns + 1):
+            change, fragment_id = ("first run", "") if i == 0 else (session.change_random_widget() or ("rerun", ""))
+            seconds, error = await session.rerun(fragment_id)
+            records.append({"page": page or "Home", "run": i, "change": change, "fragment": bool(fragment_id), "seconds": seconds, "error": error})
+            if think_time:
+                await asyncio.sleep(session.rng.uniform(0, 2 * think_time))
+    except (asyncio.TimeoutError, OSError) as exc:
+        records.append({"page": page or "Home", "run": len(records), "change": "", "fragment": False, "seconds": np.nan, "error": repr(exc)})
+    finally:
+        session.ws.close()
+    return records
+
+
+# 3) One concurrency level: n sessions at once, spread over the pages
+
+async def _run_sessions(url, n_sessions, pages, reruns, seed, think_time):
+    results = await asyncio.gather(*(run_session(url, pages[i % len(pages)], reruns, seed * 1000 + i, think_time) for i in range(n_sessions)))
+    return [r for records in results for r in records]
+
+def run_level(url, n_sessions, pages, reruns, seed=0, think_time=0.0, server_pid=None, metrics_url=None):
+    before_caches, before_rss = cache_counts(metrics_url), rss_mb(server_pid)
+    start = time.perf_counter()
+    runs = pd.DataFrame(asyncio.run(_run_sessions(url, n_sessions, pages, reruns, seed, think_time)))
+    wall = time.perf_counter() - start
+    after_rss = rss_mb(server_pid)
+
+    reruns_only = runs[runs["run"] > 0] # first runs (page compilation, cold caches) are reported separately
+    rows = []
+    for page, group in [("all pages", reruns_only)] + list(reruns_only.groupby("page")):
+        ms = group["seconds"].dropna().to_numpy() * 1000
+        first = runs.loc[(runs["run"] == 0) & ((runs["page"] == page) | (page == "all pages")), "seconds"]
+        rows.append({
+            "sessions": n_sessions, "page": page, "reruns": len(group),
+            **{f"p{p} ms": np.percentile(ms, p) if len(ms) else np.nan for p in PERCENTILES},
+            "first run p50 ms": first.median() * 1000,
+            "errors": int(group["error"].notna().sum()),
+        })
+    summary = pd.DataFrame(rows)
+    summary["reruns/s"] = len(reruns_only) / wall
+    summary["memory growth MB"] = after_rss - before_rss if before_rss is not None and after_rss is not None else np.nan
+
+    # Hit rates of the app's caches over this level only
+    caches = cache_counts(metrics_url).sub(before_caches, fill_value=0).astype(int)
+    caches = caches[caches["Calls"] > 0]
+    caches["Hit Rate"] = 1 - caches["Misses"] / caches["Calls"]
+    caches.insert(0, "sessions", n_sessions)
+    return summary, caches, runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive N concurrent simulated browser sessions of the app and report rerun latency, memory growth and cache hit rates.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=SESSIONS, help="concurrency levels, run one after the other")
+    parser.add_argument("--reruns", type=int, default=RERUNS, help="random widget changes per session")
+    parser.add_argument("--pages", nargs="+", default=PAGES, help='URL paths of the pages to load, e.g. Weather_Explorer ("" for the home page)')
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between two widget changes of a session, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="app already running at this address (default: start one with `streamlit run`)")
+    parser.add_argument("--metrics-url", help="its /metrics endpoint (WEATHER_METRICS_PORT), for the cache hit rates")
+    parser.add_argument("--server-pid", type=int, help="its process id, for the memory growth")
+    parser.add_argument("--csv", type=Path, help="also write the summary to this CSV file (and every run to <name>_runs.csv)")
+    args = parser.parse_args(argv)
+
+    server = None
+    url, metrics_url, server_pid = args.url, args.metrics_url, args.server_pid
+    if url is None:
+        port, metrics_port = _free_port(), _free_port()
+        server = start_server(port, metrics_port)
+        url, metrics_url, server_pid = f"http://127.0.0.1:{port}", f"http://127.0.0.1:{metrics_port}/metrics", server.pid
+
+    try:
+        summaries, cache_tables, all_runs = [], [], []
+        for n in args.sessions:
+            summary, caches, runs = run_level(url, n, args.pages, args.reruns, args.seed, args.think_time, server_pid, metrics_url)
+            summaries.append(summary)
+            cache_tables.append(caches)
+            all_runs.append(runs.assign(sessions=n))
+            overall = summary.iloc[0]
+            print(f"{n} session(s): p95 {overall['p95 ms']:.0f} ms over {overall['reruns']} reruns, {overall['errors']} error(s), "
+                  f"server memory {overall['memory growth MB']:+.0f} MB", flush=True)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    summary = pd.concat(summaries, ignore_index=True)
+    with pd.option_context("display.width", 200, "display.max_columns", 20, "display.float_format", "{:.1f}".format):
+        print("\nRerun latency per concurrency level\n" + summary.to_string(index=False))
+        caches = pd.concat(cache_tables)
+        if len(caches):
+            print("\nCache hit rates per concurrency level\n" + caches.to_string(formatters={"Hit Rate": "{:.0%}".format}))
+    errors = pd.concat(all_runs).dropna(subset=["error"])
+    if len(errors):
+        print(f"\n{len(errors)} run(s) raised an error, e.g. {errors.iloc[0]['page']} after {errors.iloc[0]['change']}: {errors.iloc[0]['error']}")
+    if args.csv:
+        summary.to_csv(args.csv, index=False)
+        pd.concat(all_runs).to_csv(args.csv.with_name(args.csv.stem + "_runs.csv"), index=False)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -5,21 +5,56 @@
 # Import libraries
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import calendar
 
 # Import constants and helper functions from the app utilities file
 from app_utils import (
     load_data,
+    frame_fingerprint,
     build_renewable_cols,
+    build_smoothed_var_names,
     filter_by_period,
+    prepare_plot_data,
+    compute_seasonal_share,
+    compute_season_year_share,
     RENEW_MAP,
+    RENEW_MODELS,
+    VARS_MAP,
     SMOOTH_SUFFIX,
-    TIME_RANGES, MONTHS, SEASONS,
+    TIME_RANGES, MONTHS, SEASONS, SEASON_DEFINITIONS,
 )
+from app_metrics import timed, start_page_timer, render_debug_panel
+from app_figures import corr_heatmap, line_chart, seasonal_share_bar, orientation_heatmap, generation_chart, duration_curve_chart
+from pv_model import sweep, DATA_FILE_UTC_OFFSET
+from portfolio import cached_optimise, DEMAND_PROFILES, OBJECTIVES
+from prefix_stats import rolling_corr, ROLLING_WINDOWS
+from renewable_engine import (
+    available_sites,
+    load_potential_cube,
+    period_positions,
+    calendar_seasons,
+    normalise,
+    correlations,
+    seasonal_shares,
+    regional_aggregate,
+    load_site_index,
+    load_regions,
+    load_region_weights,
+    regions_version,
+    pairwise_table,
+    share_table,
+    normalised_basis,
+    combined_generation,
+    downsample,
+    duration_curve,
+    OBSERVED_SITE,
+    EQUAL_WEIGHTS,
+)
+from spatial_index import regional_series
 
 # Page configuration
 st.set_page_config(page_title="Renewable Potential", layout="wide")
+start_page_timer("renewables") # per-section timings of this rerun (see app_metrics)
 st.title("Renewable Energy Potential in Sion, Switzerland")
 
 # Load our data
@@ -31,10 +66,16 @@ st.subheader("Renewable Energy Insights – Variable Definitions")
 st.markdown("""
 - **Solar Power Potential:** Shortwave radiation (W/m²) is used as a proxy for solar energy. This variable reflects the global horizontal irradiance (GHI), which is a key determinant of photovoltaic output, especially for rooftop solar panels installed at a fixed horizontal angle.
 
+  *Tilted PV capacity factor* (Solar model selector): share of the rated power of panels facing south with a 35° tilt. The sun's position is computed for every hour, the horizontal irradiance is split into direct and diffuse light (Erbs model) and projected onto the tilted panels, and the output is reduced as the cells heat up (-0.4% per °C above 25 °C).
+
 - **Wind Power Potential:** We approximate wind energy potential using the cube of wind speed at 10 meters above ground. This follows the standard wind power formula: power = 1/2*(rhoAV^3), where rho is air density, A the area sweapt by the air turbine, and V^3 is the cubed wind velocity.
 
+  *Turbine capacity factor* (Wind model selector): share of the rated power a 2.3 MW low-wind turbine (98 m hub) would produce. The 10 m wind speed is extrapolated to hub height (power law, exponent 0.2) and mapped through the turbine's power curve, which is zero below the cut-in speed (2 m/s) and above the cut-out speed (25 m/s), and flat above the rated speed (12 m/s). Sion lies on the valley floor, where winds are light, so the capacity factor stays very low.
+
 - **Hyro Power Potential:** Measuring true hydropower potential would require detailed models of snowmelt, runoff, and water storage, which are beyond the scope of this project. Instead, we focus on run-of-river hydropower, which is more directly influenced by recent precipitation. Given that snow in Sion is expected to melt within 24 hours, and that runoff takes time to reach river systems, we use the sum of meaningful precipitation (≥1mm) in the preceding 24 hours as a proxy. While a simplification, it reflects short-term water availability that could influence electricity generation in run-of-river plants.
 
+  *Snowmelt + reservoir runoff* (Hydro model selector): a step closer to a real model. Snowfall is stored as snow and melts with temperature (degree-day method, 3.6 mm per °C above 0 °C and per day), then rain and snowmelt fill a catchment that releases its water slowly (linear reservoir, 10-day residence time). Unlike the proxy, it shifts winter snowfall to the spring melt.
+
 
 > **Note 1:** Since raw proxies – like cubed wind speed – don’t translate directly to absolute power potential without unavailable, energy specific factors, only normalised values are presentend. Thus, all series are min-max scaled to [0, 1] for comparison of relative temporal patterns.
 
@@ -75,15 +116,75 @@ elif duration == "One Season":
 else:
     period_label = "Full Year"
 
-df_period = filter_by_period(weather_df, duration, month, season)
+# Season definition, used by the season filter and the seasonal share (the notebook's cut points by default, see seasons.py)
+scheme = st.sidebar.selectbox("Season definition:", SEASON_DEFINITIONS, key="ren_season_scheme")
+
+df_period = filter_by_period(weather_df, duration, month, season, scheme)
 
 # 2) Smoothing selector
 smooth = st.sidebar.selectbox(
     "Smoothing level:", list(SMOOTH_SUFFIX.keys()), key="ren_smooth"
 )
 
+# 3) Model selector, for the sources that have more than one model of their potential (e.g. hydro: precipitation proxy or runoff model)
+models = {
+    source: st.sidebar.selectbox(f"{source.split()[0]} model:", list(choices), key=f"ren_model_{source.split()[0].lower()}")
+    for source, choices in RENEW_MODELS.items()
+}
+
 # Build columns for all three potentials (which will always all be shown in the correlation matrix and in the time series plot)
-cols = build_renewable_cols(list(RENEW_MAP.keys()), smooth)
+cols = build_renewable_cols(list(RENEW_MAP.keys()), smooth, models)
+
+# 4) Sites: observed Sion alone (default), or several sites of the multi-site data set combined into a canton-level aggregate
+site_options = available_sites()
+sites = st.sidebar.multiselect("Sites:", site_options, default=[OBSERVED_SITE], key="ren_sites") or [OBSERVED_SITE]
+multi_site = sites != [OBSERVED_SITE]
+
+# 5) Nearest site to any coordinates (KD-tree of the sites, see spatial_index.py), which can be added to the selection
+def add_site(site):
+    if site not in st.session_state["ren_sites"]:
+        st.session_state["ren_sites"] = st.session_state["ren_sites"] + [site]
+
+if len(site_options) > 1:
+    with st.sidebar.expander("Find the nearest site"):
+        near_lat = st.number_input("Latitude:", min_value=-90.0, max_value=90.0, value=46.2331, format="%.4f", key="ren_near_lat")
+        near_lon = st.number_input("Longitude:", min_value=-180.0, max_value=180.0, value=7.3606, format="%.4f", key="ren_near_lon")
+        nearest = load_site_index(tuple(site_options)).nearest(near_lat, near_lon).iloc[0]
+        st.markdown(f"Nearest site: **{nearest['site']}**, {nearest['distance_km']:.1f} km away")
+        st.button("Add to the sites", on_click=add_site, args=(nearest["site"],), key="ren_near_add")
+
+# 6) Weights of the sites in the canton aggregate: equal, or the area of a region (regions file) closest to each selected site
+version = regions_version()
+region = EQUAL_WEIGHTS
+if multi_site and version is not None:
+    region = st.sidebar.selectbox("Aggregate weights:", [EQUAL_WEIGHTS] + list(load_regions(version)), key="ren_region")
+
+if multi_site:
+    # The (site x hour x source) array of every available site is built once per smoothing level; a selection only indexes into it
+    with timed("renewables.sites.compute"):
+        all_values, calendar_df = load_potential_cube(smooth, tuple(site_options), tuple(models.items()), weather_df)
+        site_values = all_values[[site_options.index(s) for s in sites]]
+        pos = period_positions(calendar_df, duration, month, season, scheme)
+        weights = None
+        if version is not None: # every region at once: one sparse product of the (region x site) weights with the (site x hour x source) array
+            region_weights, region_names = load_region_weights(tuple(sites), version)
+            region_means = pd.DataFrame(regional_series(region_weights, site_values[:, pos, :]).mean(axis=1), index=pd.Index(region_names, name="Region"), columns=list(RENEW_MAP))
+            if region != EQUAL_WEIGHTS:
+                weights = region_weights.getrow(region_names.index(region)).toarray().ravel()
+        canton = regional_aggregate(site_values, weights)
+        # Sites are compared on the hours they have in common, so the canton aggregate replaces the Sion frame in the sections below
+        df_period = pd.DataFrame(canton[pos], index=calendar_df.index[pos], columns=cols)
+    if df_period.empty:
+        st.warning("The selected sites have no hours in common with this time range.")
+        st.stop()
+    weighting = "mean" if region == EQUAL_WEIGHTS else f"weighted by the area of {region} closest to each site"
+    st.markdown(f"Showing the canton-level aggregate ({weighting}) of **{len(sites)} sites**: {', '.join(sites[:10])}{' …' if len(sites) > 10 else ''}")
+    if version is not None:
+        with st.expander("Mean potentials per region (area-weighted)"):
+            st.dataframe(region_means.style.format("{:.2f}"), use_container_width=True)
+
+# Identity of the period frame (sites, weights, settings, time range and version of the data), so the caches below do not hash the frame on every rerun
+period_key = (tuple(sites), region, version, smooth, tuple(models.items()), duration, month, season, scheme, frame_fingerprint(weather_df))
 
 
 
@@ -95,15 +196,46 @@ cols = build_renewable_cols(list(RENEW_MAP.keys()), smooth)
 st.markdown("---")
 st.subheader(f"{smooth} Correlation of Renewable Potentials ({period_label})")
 
-corr_df = df_period[cols].corr()
-fig_corr = px.imshow(
-    corr_df,
-    text_auto=".2f",
-    color_continuous_scale="RdBu_r",
-    origin="lower",
-)
-fig_corr.update_layout(margin=dict(t=30, b=0, l=0, r=0))
-st.plotly_chart(fig_corr, use_container_width=True)
+with timed("renewables.corr.compute"):
+    corr_df = df_period[cols].corr()
+with timed("renewables.corr.figure"):
+    fig_corr = corr_heatmap(corr_df)
+with timed("renewables.corr.render"):
+    st.plotly_chart(fig_corr, use_container_width=True)
+
+# Per-site correlations, computed for all selected sites in one batched operation
+if multi_site:
+    with timed("renewables.corr.sites"):
+        site_corr = pairwise_table(correlations(site_values[:, pos, :]), sites)
+    st.markdown("Correlation between each pair of sources, per site:")
+    st.dataframe(site_corr.style.format("{:.2f}"), use_container_width=True)
+
+
+
+
+
+# ────────────────────────────────
+# Rolling Correlation
+# ────────────────────────────────
+st.markdown("---")
+st.subheader(f"{smooth} Rolling Correlation of Renewable Potentials ({period_label})")
+st.markdown("Correlation over a moving window ending at each hour: how the complementarity of the sources changes through the period.")
+
+# 1) Window length, and weather variables to pair with the potentials (observed Sion only: the canton aggregate only holds the potentials)
+col_window, col_vars = st.columns(2)
+window_label = col_window.selectbox("Window:", list(ROLLING_WINDOWS), index=1, key="ren_roll_window")
+roll_vars = [] if multi_site else col_vars.multiselect("Add weather variables:", list(VARS_MAP), key="ren_roll_vars")
+
+# 2) Every pair of the selected series, all computed at once from cumulative sums
+roll_cols = cols + build_smoothed_var_names(roll_vars, smooth)
+roll_labels = [source.split()[0] for source in RENEW_MAP] + roll_vars
+with timed("renewables.rolling.compute"):
+    df_roll = rolling_corr(df_period[roll_cols].set_axis(roll_labels, axis=1), ROLLING_WINDOWS[window_label])
+    df_roll_plot = prepare_plot_data(df_roll, list(df_roll.columns), {c: c for c in df_roll.columns})
+with timed("renewables.rolling.figure"):
+    fig_roll = line_chart(df_roll_plot, "Correlation")
+with timed("renewables.rolling.render"):
+    st.plotly_chart(fig_roll, use_container_width=True)
 
 
 
@@ -115,86 +247,169 @@ st.plotly_chart(fig_corr, use_container_width=True)
 st.markdown("---")
 st.subheader(f"{smooth} Normalised Renewable Potentials ({period_label})")
 
-# 1) Build the column names for the three renewable energy potentials
-cols = [
-    RENEW_MAP[friendly] + SMOOTH_SUFFIX[smooth]
-    for friendly in RENEW_MAP
-]
-
-# 2) Take just those columns for the selected period and min-max normalise to facilitate comparison in evolution of potentials
-df_ts = df_period[cols].copy()
-for col in cols:
-    df_ts[col] = (df_ts[col] - df_ts[col].min()) / (df_ts[col].max() - df_ts[col].min())
-
-# 3) Melt into long form for Plotly
-df_plot = (
-    df_ts
-    .rename_axis("time")
-    .reset_index()
-    .melt(id_vars="time", value_vars=cols, var_name="col", value_name="val")
-)
+# 1) The column names for the three renewable energy potentials (with the selected models) are those of the sidebar: cols
+
+# 2) Map each full column name back to its friendly label (rather the extensive but complicated varibale name)
+label_map = dict(zip(cols, RENEW_MAP))
+
+# 3) Take just those columns for the selected period, min-max normalise them to facilitate comparison in evolution of potentials, and melt into long form for Plotly
+#    With several sites, each site's series is normalised first (all at once) and the canton line is the mean of the normalised series, so every site weighs the same
+if multi_site:
+    with timed("renewables.timeseries.compute"):
+        canton_norm = pd.DataFrame(normalise(site_values[:, pos, :]).mean(axis=0), index=df_period.index, columns=cols)
+    df_plot = prepare_plot_data(canton_norm, cols, label_map)
+else:
+    df_plot = prepare_plot_data(df_period, cols, label_map, normalise=True)
+
+# 4) Render the time series line chart
+with timed("renewables.timeseries.figure"):
+    fig_ts = line_chart(df_plot, "Normalised")
+with timed("renewables.timeseries.render"):
+    st.plotly_chart(fig_ts, use_container_width=True)
 
-# 4) Map each full column name back to its friendly label (rather the extensive but complicated varibale name)
-label_map = {
-    RENEW_MAP[friendly] + SMOOTH_SUFFIX[smooth]: friendly
-    for friendly in RENEW_MAP
-}
-df_plot["Variable"] = df_plot["col"].map(label_map)
-
-# 5) Render the time series line chart
-fig_ts = px.line(
-    df_plot,
-    x="time",
-    y="val",
-    color="Variable",
-    labels={"time": "Time", "val": "Normalised"},
-)
-fig_ts.update_layout(legend=dict(y=0.5, x=1.02))
-st.plotly_chart(fig_ts, use_container_width=True)
 
 
 
 
 # ────────────────────────────────
-# Seasonal Share of Total Annual Renewable Potential
+# Capacity What-If
 # ────────────────────────────────
 st.markdown("---")
-st.subheader("Seasonal Share of Total Annual Renewable Potential")
+st.subheader(f"{smooth} Capacity What-If ({period_label})")
+st.markdown("Installed capacity of each source, in MW. Each source is assumed to produce its full capacity at the highest (normalised) potential of the period, and proportionally less otherwise.")
+
+# 1) Normalised potentials of the period as an (hour x source) matrix, built once per period and settings (not on every slider move)
+with timed("renewables.whatif.basis"):
+    basis, basis_time = normalised_basis(
+        canton_norm if multi_site else df_period[cols],
+        period_key,
+        weather_df,
+    )
+
+# 2) Sliders, generation time series and duration curve. As a fragment, a slider move only reruns this function: one matrix-vector product plus downsampling
+@st.fragment
+def capacity_what_if():
+    slider_cols = st.columns(len(RENEW_MAP))
+    capacities = [
+        slider_col.slider(f"{source.split()[0]} capacity (MW):", 0, 1000, 100, step=10, key=f"ren_capacity_{source.split()[0].lower()}")
+        for slider_col, source in zip(slider_cols, RENEW_MAP)
+    ]
+    with timed("renewables.whatif.compute"):
+        generation = combined_generation(basis, capacities)
+        time_ds, generation_ds = downsample(basis_time, generation)
+        share_of_hours, curve = duration_curve(generation)
+    total = sum(capacities)
+    if total:
+        st.markdown(f"Mean generation: **{generation.mean():.0f} MW** ({generation.mean() / total:.0%} of the installed {total} MW); "
+                    f"below 10% of the installed capacity during **{(generation < 0.1 * total).mean():.0%}** of the hours.")
+    col_ts, col_dc = st.columns(2)
+    with timed("renewables.whatif.figure"):
+        fig_generation, fig_duration = generation_chart(time_ds, generation_ds), duration_curve_chart(share_of_hours, curve)
+    with timed("renewables.whatif.render"):
+        col_ts.plotly_chart(fig_generation, use_container_width=True)
+        col_dc.plotly_chart(fig_duration, use_container_width=True)
+
+capacity_what_if()
 
-# 1) Build the three hourly column names
-hourly_cols = [RENEW_MAP[k] + SMOOTH_SUFFIX[smooth] for k in RENEW_MAP]
 
-# 2) Sum them over each season (re‐ordering to Winter→Spring→Summer→Autumn)
-seasonal_sum = (
-    weather_df[hourly_cols]
-    .groupby(weather_df["season"])
-    .sum()
-    .reindex(SEASONS)
-)
 
-# 3) Convert to share of the full‐year total for each source
-seasonal_share = seasonal_sum.div(seasonal_sum.sum(), axis=1)
+
+# ────────────────────────────────
+# Seasonal Share of Total Annual Renewable Potential
+# ────────────────────────────────
+st.markdown("---")
+st.subheader("Seasonal Share of Total Annual Renewable Potential")
+
+# 1) Build the three column names (selected smoothing level and models)
+hourly_cols = cols
+
+# 2) Sum them over each season (re‐ordering to Winter→Spring→Summer→Autumn) and convert to share of the full‐year total for each source
+if multi_site:
+    # Full year of the canton aggregate; per-site shares are computed for all selected sites at once
+    with timed("renewables.seasonal.compute"):
+        hour_seasons = calendar_seasons(calendar_df, scheme)
+        seasonal_share = pd.DataFrame(seasonal_shares(canton[None], hour_seasons)[0], index=pd.Index(SEASONS, name="season"), columns=hourly_cols)
+        site_shares = seasonal_shares(site_values, hour_seasons)
+        season_year_share = compute_season_year_share(pd.DataFrame(canton, index=calendar_df.index, columns=hourly_cols), hourly_cols, scheme)
+else:
+    with timed("renewables.seasonal.compute"):
+        seasonal_share = compute_seasonal_share(weather_df, hourly_cols, scheme)
+        season_year_share = compute_season_year_share(weather_df, hourly_cols, scheme)
 
 # Create a constant to go from the "raw" variable name to their user-friendly versions, used a figure legend (basically opposite as build_renewable_cols)
-friendlier_vars_map = {
-    RENEW_MAP[k] + SMOOTH_SUFFIX[smooth]: k
-    for k in RENEW_MAP
-}
+friendlier_vars_map = dict(zip(hourly_cols, RENEW_MAP))
 seasonal_share = seasonal_share.rename(columns=friendlier_vars_map)
+season_year_share = season_year_share.rename(columns=friendlier_vars_map)
 
-# 4) Plot grouped bar chart
-fig_season = px.bar(
-    seasonal_share,
-    x=seasonal_share.index,
-    y=list(friendlier_vars_map.values()),
-    labels={"value":"Share of Annual Potential","season":"Season"},
-    barmode="group",
-)
-fig_season.update_layout(
-    yaxis_tickformat=".0%",
-    xaxis_title="Season",
-    legend_title_text="Source",
-)
-st.plotly_chart(fig_season, use_container_width=True)
+# 3) Plot grouped bar chart
+with timed("renewables.seasonal.figure"):
+    fig_season = seasonal_share_bar(seasonal_share)
+with timed("renewables.seasonal.render"):
+    st.plotly_chart(fig_season, use_container_width=True)
+
+if multi_site:
+    share_season = st.selectbox("Per-site share of the annual potential in:", SEASONS, key="ren_site_share_season")
+    st.dataframe(share_table(site_shares, sites, share_season).style.format("{:.1%}"), use_container_width=True)
+
+# 4) The same season by season across the years of the data (winters spanning the new year); seasons with fewer hours are only partly covered
+with st.expander("Share of the total potential in each season of each year"):
+    st.dataframe(season_year_share.style.format("{:.1%}", subset=list(RENEW_MAP)), use_container_width=True)
+
+
+
+
+
+
+# ────────────────────────────────
+# Capacity Mix Balancing Energy Gaps
+# ────────────────────────────────
+st.markdown("---")
+st.subheader(f"{smooth} Capacity Mix Balancing Energy Gaps ({period_label})")
+st.markdown("Each source's potential is scaled so that one unit of capacity produces the mean demand on average; the optimiser then looks for the shares of solar, wind and hydro capacity whose combined production follows the demand profile best.")
+
+# 1) Demand profile and objective
+col_demand, col_objective = st.columns(2)
+demand_kind = col_demand.selectbox("Demand profile:", DEMAND_PROFILES, key="ren_demand")
+objective = col_objective.selectbox("Minimise:", OBJECTIVES, key="ren_objective")
+
+# 2) Optimal mix, compared with single sources and equal shares
+with timed("renewables.portfolio.compute"):
+    mix_table = cached_optimise(df_period, period_key, cols, label_map, demand_kind, objective)
+if mix_table is None:
+    st.info("None of the sources produces anything over this period, so there is no mix to optimise.")
+else:
+    # Sources without any production over the period are left out of the mix
+    optimal = mix_table.loc["Optimal mix", list(mix_table.columns[:-3])]
+    st.markdown("Optimal mix: " + ", ".join(f"**{share:.0%}** {source.split()[0].lower()}" for source, share in optimal.items()))
+    st.dataframe(
+        mix_table.style.format("{:.0%}", subset=list(mix_table.columns[:-3]) + ["Share of unmet hours", "Share of unmet energy"]).format("{:.2f}", subset=["Residual std"]),
+        use_container_width=True,
+    )
+
+
+
+
+# ────────────────────────────────
+# Solar Panel Orientation (tilted PV model, observed Sion only)
+# ────────────────────────────────
+if models["Solar Potential"] == "Tilted PV capacity factor" and not multi_site:
+    st.markdown("---")
+    st.subheader(f"Mean PV Capacity Factor by Panel Orientation ({period_label})")
+
+    # Every tilt x azimuth combination over the selected period: one matrix operation on the cached solar geometry
+    tilts, azimuths = list(range(0, 91, 5)), list(range(90, 271, 10))
+    with timed("renewables.orientation.compute"):
+        configs = [(tilt, azimuth) for tilt in tilts for azimuth in azimuths]
+        mean_cf = sweep(df_period, configs, utc_offset=DATA_FILE_UTC_OFFSET).mean(axis=1)
+        yield_df = pd.DataFrame(mean_cf.reshape(len(tilts), len(azimuths)), index=tilts, columns=azimuths)
+    best_tilt, best_azimuth = configs[mean_cf.argmax()]
+    st.markdown(f"Best orientation for this period: **{best_tilt}° tilt, {best_azimuth}° azimuth** (mean capacity factor {mean_cf.max():.1%}).")
+    with timed("renewables.orientation.figure"):
+        fig_orientation = orientation_heatmap(yield_df)
+    with timed("renewables.orientation.render"):
+        st.plotly_chart(fig_orientation, use_container_width=True)
+
+# Optional debug panel with the timings of this rerun (?debug=1)
+render_debug_panel()
 
 
@@ -0,0 +1,111 @@
+# Aggregation engine on integer period codes: every row gets an integer code per resolution (day, week, month, season, season-year, year), and sums, means,
+# minima, maxima and counts per period are computed for several columns at once with np.add.reduceat / np.minimum.reduceat / np.maximum.reduceat
+# over one contiguous (row x column) array, instead of pandas groupby on the season categorical or on (year, month) keys.
+# Codes are added to the data frames when they are loaded (add_period_codes) and computed on the fly for frames that do not have them.
+
+# Load libraries
+import numpy as np
+import pandas as pd
+
+from seasons import season_year_codes, season_year_names
+
+RESOLUTIONS = ["day", "week", "month", "season", "season_year", "year"]
+STATS = ("sum", "mean", "min", "max", "count")
+SEASON_CODES = ["Winter", "Spring", "Summer", "Autumn"] # code 0 to 3, same order as app_utils.SEASONS
+
+
+# 1) Period codes
+def period_code(df: pd.DataFrame, resolution: str) -> np.ndarray:
+    """Integer code of each row's period: days or Monday-starting weeks since 1970-01-01, year * 12 + month - 1, season (SEASON_CODES),
+    season-year (seasons.season_year_codes: one code per season of each year, winters spanning the new year) or year.
+    Uses the precomputed period_<resolution> column when the frame has one."""
+    if f"period_{resolution}" in df.columns:
+        return df[f"period_{resolution}"].to_numpy()
+    if resolution == "season":
+        return pd.Categorical(df["season"], categories=SEASON_CODES).codes.astype(np.int32)
+    index = df.index
+    if resolution == "season_year":
+        if "season" not in df.columns:
+            return season_year_codes(index)
+        # Seasons as labelled in the frame: the part of a winter that falls in January to June belongs to the previous year
+        chronological = (pd.Categorical(df["season"], categories=SEASON_CODES).codes + 3) % 4 # Spring 0 -> Winter 3
+        year = index.year.to_numpy() - ((chronological == 3) & (index.month.to_numpy() <= 6))
+        return (year * 4 + chronological).astype(np.int32)
+    if resolution == "day":
+        return (index.to_numpy().astype("datetime64[D]").astype(np.int64)).astype(np.int32)
+    if resolution == "week":
+        return ((index.to_numpy().astype("datetime64[D]").astype(np.int64) + 3) // 7).astype(np.int32) # 1970-01-01 was a Thursday
+    if resolution == "month":
+        return (index.year.to_numpy() * 12 + index.month.to_numpy() - 1).astype(np.int32)
+    if resolution == "year":
+        return index.year.to_numpy().astype(np.int32)
+    raise ValueError(f"unknown resolution: {resolution}")
+
+def add_period_codes(df: pd.DataFrame) -> pd.DataFrame:
+    for resolution in RESOLUTIONS:
+        df[f"period_{resolution}"] = period_code(df, resolution)
+    return df
+
+def period_labels(codes: np.ndarray, resolution: str) -> pd.Index:
+    """Readable labels of period codes: start date of the day, week or month, season name, season and year (e.g. "Winter 2024/25"), or year."""
+    if resolution == "day":
+        return pd.DatetimeIndex(codes.astype("datetime64[D]"), name="day")
+    if resolution == "week":
+        return pd.DatetimeIndex((codes.astype(np.int64) * 7 - 3).astype("datetime64[D]"), name="week")
+    if resolution == "month":
+        return pd.DatetimeIndex(pd.to_datetime({"year": codes // 12, "month": codes % 12 + 1, "day": 1}), name="month")
+    if resolution == "season":
+        return pd.Index(np.array(SEASON_CODES)[codes], name="season")
+    if resolution == "season_year":
+        return pd.Index(season_year_names(codes), name="season_year")
+    return pd.Index(codes, name="year")
+
+
+# 2) Aggregation
+def _groups(codes: np.ndarray):
+    """Row order putting each period's rows next to each other (None if they already are, as for time-sorted data),
+    start of each group in that order, and the groups' codes."""
+    order = None
+    if len(codes) > 1 and (np.diff(codes) < 0).any():
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+    starts = np.flatnonzero(np.diff(codes, prepend=codes[:1] - 1)) if len(codes) else np.array([], dtype=np.intp)
+    return order, starts, codes[starts]
+
+def aggregate_arrays(values: np.ndarray, codes: np.ndarray, stats=STATS):
+    """Statistics of a (row x column) array per code: sorted group codes and {stat: array (group x column)}."""
+    order, starts, group_codes = _groups(codes)
+    values = np.ascontiguousarray(values if order is None else values[order], dtype=np.float64)
+    counts = np.diff(np.append(starts, len(values)))
+    if not len(values):
+        return group_codes, {stat: np.empty((0,) + values.shape[1:]) for stat in stats}
+
+    out = {}
+    if "sum" in stats or "mean" in stats:
+        sums = np.add.reduceat(values, starts, axis=0)
+    for stat in stats:
+        if stat == "sum":
+            out[stat] = sums
+        elif stat == "mean":
+            out[stat] = sums / counts.reshape((-1,) + (1,) * (values.ndim - 1))
+        elif stat == "min":
+            out[stat] = np.minimum.reduceat(values, starts, axis=0)
+        elif stat == "max":
+            out[stat] = np.maximum.reduceat(values, starts, axis=0)
+        elif stat == "count":
+            out[stat] = np.broadcast_to(counts.reshape((-1,) + (1,) * (values.ndim - 1)), (len(counts),) + values.shape[1:]).astype(np.float64)
+        else:
+            raise ValueError(f"unknown statistic: {stat}")
+    return group_codes, out
+
+def aggregate(df: pd.DataFrame, cols, resolution: str, stats=STATS) -> dict:
+    """Statistics of the given columns per period, in one pass: {stat: frame (period x column)}, periods labelled with period_labels."""
+    group_codes, out = aggregate_arrays(df[cols].to_numpy(dtype=np.float64), period_code(df, resolution), stats)
+    index = period_labels(group_codes, resolution)
+    return {stat: pd.DataFrame(result, index=index, columns=list(cols)) for stat, result in out.items()}
+
+def transform(df: pd.DataFrame, cols, resolution: str, stat="mean") -> pd.DataFrame:
+    """Each row's period statistic (like groupby(...).transform(stat)), for several columns at once."""
+    codes = period_code(df, resolution)
+    group_codes, out = aggregate_arrays(df[cols].to_numpy(dtype=np.float64), codes, (stat,))
+    return pd.DataFrame(out[stat][np.searchsorted(group_codes, codes)], index=df.index, columns=list(cols))
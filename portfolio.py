@@ -0,0 +1,111 @@
+# Capacity mix optimiser: which shares of solar, wind and hydro capacity best follow a demand profile, i.e. leave the smallest energy gaps.
+# Each source's hourly potential is scaled to a mean of 1, so a mix w (shares summing to 1) produces on average exactly the mean demand (also scaled to 1);
+# what differs between mixes is how well production follows demand hour by hour.
+#
+# Objectives:
+#   - residual variance: variance of demand - production. It is quadratic in w, so it only needs the Gram matrices of the (hour x source) matrix,
+#     computed once; every candidate mix is then evaluated in O(sources²), whatever the number of hours
+#   - unmet hours: hours in which production falls short of demand, evaluated for every candidate mix with one (hour x source) @ (source x mix) product
+#   - unmet energy: total shortfall, minimised exactly as a linear programme (scipy's HiGHS solver)
+
+# Load libraries
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.optimize import linprog
+from scipy.sparse import csr_matrix, hstack, identity
+
+from app_metrics import tracked_cache
+
+DEMAND_PROFILES = ["Swiss-like (winter and daytime peaks)", "Flat"]
+OBJECTIVES = ["Residual variance", "Unmet hours", "Unmet energy (LP)"]
+GRID_STEP = 0.05 # share resolution of the grid search
+
+
+# 1) Inputs
+def demand_profile(time: pd.DatetimeIndex, kind=DEMAND_PROFILES[0]) -> np.ndarray:
+    """Hourly demand with a mean of 1. The Swiss-like profile peaks in winter (heating) and on weekday daytime hours."""
+    if kind == "Flat":
+        return np.ones(len(time))
+    doy, hour = time.dayofyear.to_numpy(), time.hour.to_numpy()
+    seasonal = 0.15 * np.cos(2 * np.pi * (doy - 15) / 365.25)                  # +15% mid-January, -15% mid-July
+    daily = 0.15 * np.clip(np.sin(np.pi * (hour - 6) / 15), -0.5, None)       # high from 7 to 20h, low at night
+    weekend = np.where(time.dayofweek.to_numpy() >= 5, -0.1, 0.0)
+    demand = 1 + seasonal + daily + weekend
+    return demand / demand.mean()
+
+def scaled_potentials(df: pd.DataFrame, cols) -> pd.DataFrame:
+    """Potentials scaled to a mean of 1 over the given hours; sources that never produce in these hours are dropped."""
+    means = df[cols].mean()
+    kept = means[means > 0].index
+    return df[kept] / means[kept]
+
+
+# 2) Candidate mixes and Gram matrices
+def simplex_grid(n_sources: int, step=GRID_STEP) -> np.ndarray:
+    """Every mix (n_mixes x n_sources) with shares that are multiples of step and sum to 1 ("stars and bars")."""
+    if n_sources == 1:
+        return np.ones((1, 1)) # the only mix: no bars to place
+    n = round(1 / step)
+    bars = np.array(list(combinations(range(n + n_sources - 1), n_sources - 1))).reshape(-1, n_sources - 1)
+    edges = np.hstack([np.full((len(bars), 1), -1), bars, np.full((len(bars), 1), n + n_sources - 1)])
+    return (np.diff(edges, axis=1) - 1) / n
+
+def gram_matrices(X: np.ndarray, demand: np.ndarray):
+    """Covariances of the sources with each other (source x source), with demand (source) and variance of demand."""
+    Xc, dc = X - X.mean(axis=0), demand - demand.mean()
+    return Xc.T @ Xc / len(X), Xc.T @ dc / len(X), dc @ dc / len(X)
+
+
+# 3) Objectives, for every mix of W (mix x source) at once
+def residual_variance(W, gram):
+    cov, cross, demand_var = gram
+    return np.einsum("mk,kl,ml->m", W, cov, W) - 2 * W @ cross + demand_var
+
+def unmet_hours(W, X, demand):
+    return ((X @ W.T) < demand[:, None]).sum(axis=0)
+
+def min_unmet_energy(X, demand):
+    """Mix minimising the total shortfall sum(max(demand - X w, 0)): variables w (sources) and shortfall s (hours),
+    s >= demand - X w, s >= 0, w >= 0, sum(w) = 1."""
+    n_hours, n_sources = X.shape
+    cost = np.concatenate([np.zeros(n_sources), np.ones(n_hours)])
+    A_ub = hstack([csr_matrix(-X), -identity(n_hours)]) # -X w - s <= -demand
+    A_eq = np.concatenate([np.ones(n_sources), np.zeros(n_hours)])[None, :]
+    result = linprog(cost, A_ub=A_ub, b_ub=-demand, A_eq=A_eq, b_eq=[1], bounds=(0, None), method="highs")
+    return result.x[:n_sources], result.fun
+
+
+# 4) One call for the page: best mix and the scores of a few mixes under every objective
+def optimise(df: pd.DataFrame, cols, labels, demand_kind=DEMAND_PROFILES[0], objective=OBJECTIVES[0], step=GRID_STEP):
+    """Best mix for the objective, plus the single-source and equal mixes for comparison: one row per mix, shares and scores as columns.
+    None if no source produces anything over these hours (nothing to mix)."""
+    potentials = scaled_potentials(df, cols)
+    if potentials.shape[1] == 0:
+        return None
+    X, names = potentials.to_numpy(), [labels[c] for c in potentials.columns]
+    demand = demand_profile(df.index, demand_kind)
+    gram = gram_matrices(X, demand)
+
+    if objective == "Unmet energy (LP)":
+        best, _ = min_unmet_energy(X, demand)
+    else:
+        W = simplex_grid(len(names), step)
+        scores = residual_variance(W, gram) if objective == "Residual variance" else unmet_hours(W, X, demand)
+        best = W[np.argmin(scores)]
+
+    mixes = np.vstack([best, np.eye(len(names)), np.full(len(names), 1 / len(names))])
+    table = pd.DataFrame(mixes, columns=names, index=["Optimal mix"] + [f"{n} only" for n in names] + ["Equal shares"])
+    table["Residual std"] = np.sqrt(np.clip(residual_variance(mixes, gram), 0, None))
+    table["Share of unmet hours"] = unmet_hours(mixes, X, demand) / len(X)
+    table["Share of unmet energy"] = np.clip(demand[:, None] - X @ mixes.T, 0, None).sum(axis=0) / demand.sum()
+    return table
+
+# Cached for the page: the LP takes about a second on a year of hours (the grid searches a few milliseconds).
+# `key` identifies the period frame (sites and their weights, smoothing, models, time range, season definition and fingerprint of the data, see
+# app_utils.frame_fingerprint), so the period frame itself is not hashed on every rerun, as renewable_engine._normalised_basis.
+@tracked_cache(st.cache_data(max_entries=64))
+def cached_optimise(_df_period: pd.DataFrame, key, cols, labels, demand_kind, objective):
+    return optimise(_df_period, cols, labels, demand_kind, objective)
@@ -0,0 +1,164 @@
+# Rolling (moving-window) statistics from prefix sums: the sum over any window is the difference of two cumulative sums,
+# so every window of a series is obtained in O(n) whatever the window length, and all columns / pairs of columns at once.
+# Used for the rolling correlations of the renewable page (instead of pandas' rolling().corr(), which works pair by pair).
+
+# Load libraries
+import warnings
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+# Window lengths offered by the renewable page, in hours
+ROLLING_WINDOWS = {
+    "24 hours": 24,
+    "1 week": 168,
+    "30 days": 720,
+}
+
+
+# 1) Moving windows
+def prefix_sums(values: np.ndarray) -> np.ndarray:
+    """Cumulative sums along the first axis with a leading row of zeros, so that sum(values[a:b]) = P[b] - P[a]."""
+    out = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+def window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sums over every window of `window` consecutive rows ending at each row; rows without a full window are NaN."""
+    P = prefix_sums(values)
+    sums = np.full(values.shape, np.nan)
+    sums[window - 1:] = P[window:] - P[:-window]
+    return sums
+
+def rolling_corr(df: pd.DataFrame, window: int, pairs=None) -> pd.DataFrame:
+    """Pearson correlation over a moving window of `window` hours for each pair of columns (all pairs by default): one column per pair, named "a / b".
+    Built from window sums of x, y, x², y² and xy; windows in which a series is constant are NaN."""
+    pairs = list(combinations(df.columns, 2)) if pairs is None else pairs
+    X = df.to_numpy(dtype=np.float64)
+    X = X - X.mean(axis=0) # centring keeps the differences of large cumulative sums accurate
+    i = np.array([df.columns.get_loc(a) for a, _ in pairs])
+    j = np.array([df.columns.get_loc(b) for _, b in pairs])
+
+    s = window_sums(X, window) / window                # means, per column
+    ss = window_sums(X * X, window) / window           # means of squares, per column
+    sxy = window_sums(X[:, i] * X[:, j], window) / window # means of products, per pair
+    cov = sxy - s[:, i] * s[:, j]
+    var = ss - s * s
+    var[var <= 1e-8 * (X * X).mean(axis=0)] = np.nan # constant over the window: what remains is the rounding error of the cumulative sums
+    with np.errstate(invalid="ignore"):
+        corr = np.clip(cov / np.sqrt(var[:, i] * var[:, j]), -1, 1)
+    return pd.DataFrame(corr, index=df.index, columns=[f"{a} / {b}" for a, b in pairs])
+
+
+# 2) Statistics over any interval of rows [a, b), whatever its length: from prefix sums of x and of the products x_i x_j (mean, standard deviation,
+#    correlation) and from sparse tables of running minima and maxima (each level holds the minimum of 2^j consecutive rows, so any interval is covered
+#    by two overlapping blocks). Used for the free date ranges of the Weather Explorer.
+
+def sparse_table(values: np.ndarray, op) -> list:
+    """levels[j][i] = op over rows i to i + 2^j - 1 (op: np.minimum, np.maximum, or np.fmin, np.fmax to skip NaN)."""
+    levels = [values]
+    while 1 << len(levels) <= len(values):
+        half = 1 << (len(levels) - 1)
+        levels.append(op(levels[-1][:-half], levels[-1][half:]))
+    return levels
+
+def range_query(levels: list, op, a: int, b: int) -> np.ndarray:
+    """op over rows a to b - 1 (b > a), from two blocks of the sparse table."""
+    if b <= a:
+        raise ValueError(f"empty interval [{a}, {b})")
+    j = int(b - a).bit_length() - 1
+    return op(levels[j][a], levels[j][b - (1 << j)])
+
+class IntervalStats:
+    """Prefix sums and sparse tables of the given columns of a time-indexed frame: count, mean, standard deviation (ddof=1, as pandas),
+    correlation, minimum and maximum over any interval of rows in O(1) per statistic. Build once per frame and set of columns.
+    Missing values are skipped as pandas does (counts of valid values per column, and per pair of columns for the correlations), so a gap only
+    affects the intervals that contain it."""
+
+    def __init__(self, df: pd.DataFrame, cols):
+        self.index, self.cols = df.index, list(cols)
+        self.values = df[self.cols].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(self.values)
+        counts = valid.sum(axis=0)
+        # centring keeps the differences of large cumulative sums accurate; missing values count as 0 in every sum
+        self.offset = np.where(counts > 0, np.where(valid, self.values, 0).sum(axis=0) / np.maximum(counts, 1), 0)
+        X = np.where(valid, self.values - self.offset, 0)
+        V = valid.astype(np.float64)
+        self.complete = bool(valid.all())
+        self.counts = prefix_sums(V)                                # (row + 1) x column
+        self.sums = prefix_sums(X)                                  # (row + 1) x column
+        self.products = prefix_sums(np.einsum("ni,nj->nij", X, X))  # (row + 1) x column x column
+        if not self.complete:
+            # Pairwise complete rows of each pair of columns (i, j): their number, and the sums of x_i and x_i² over them
+            self.pair_counts = prefix_sums(np.einsum("ni,nj->nij", V, V))
+            self.pair_sums = prefix_sums(np.einsum("ni,nj->nij", X, V))
+            self.pair_squares = prefix_sums(np.einsum("ni,nj->nij", X * X, V))
+        self.scale = (X * X).sum(axis=0) / np.maximum(counts, 1)    # below 1e-8 of it, a variance is rounding error (constant series)
+        self.minima = sparse_table(self.values, np.fmin)            # fmin / fmax skip missing values
+        self.maxima = sparse_table(self.values, np.fmax)
+
+    def rows(self, start, end):
+        """Row interval [a, b) of the timestamps start <= t < end."""
+        return int(self.index.searchsorted(pd.Timestamp(start))), int(self.index.searchsorted(pd.Timestamp(end)))
+
+    def count(self, a, b):
+        """Valid values of each column."""
+        return self.counts[b] - self.counts[a]
+
+    def mean(self, a, b):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (self.sums[b] - self.sums[a]) / self.count(a, b) + self.offset # NaN for a column without values
+
+    def _variance(self, n, s, q, scale):
+        """Sample variance from the count, sum and sum of squares of centred values: 0 below rounding error, NaN with fewer than 2 values."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = (q - s * s / n) / (n - 1)
+        return np.where(n < 2, np.nan, np.where(var <= 1e-8 * scale, 0, var))
+
+    def _pairs(self, a, b):
+        """Per pair of columns (i, j): number of rows where both are valid, sum of x_i and sum of x_i² over those rows."""
+        if self.complete:
+            c, n = len(self.cols), float(b - a)
+            s = self.sums[b] - self.sums[a]
+            return np.full((c, c), n), np.repeat(s[:, None], c, axis=1), np.repeat(np.diagonal(self.products[b] - self.products[a])[:, None], c, axis=1)
+        return self.pair_counts[b] - self.pair_counts[a], self.pair_sums[b] - self.pair_sums[a], self.pair_squares[b] - self.pair_squares[a]
+
+    def cov(self, a, b):
+        """Covariance matrix over the pairwise complete rows (as DataFrame.cov)."""
+        n, s, _ = self._pairs(a, b)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = (self.products[b] - self.products[a] - s * s.T / n) / (n - 1)
+        return np.where(n < 2, np.nan, cov)
+
+    def std(self, a, b):
+        products = np.diagonal(self.products[b] - self.products[a])
+        return np.sqrt(self._variance(self.count(a, b), self.sums[b] - self.sums[a], products, self.scale))
+
+    def corr(self, a, b):
+        """Correlation over the pairwise complete rows, each standard deviation taken on the same rows (as DataFrame.corr)."""
+        n, s, q = self._pairs(a, b)
+        var = self._variance(n, s, q, self.scale[:, None]) # var[i, j]: variance of column i on the rows where i and j are valid
+        scale = np.sqrt(var * var.T)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(scale > 0, np.clip(self.cov(a, b) / scale, -1, 1), np.nan) # NaN for constant series, as pandas
+
+    # Every statistic of an empty interval (a >= b, e.g. a range between two timestamps of the same hour, or outside the data) is NaN
+    def _empty(self):
+        return np.full(len(self.cols), np.nan)
+
+    def min(self, a, b):
+        return range_query(self.minima, np.fmin, a, b) if b > a else self._empty()
+
+    def max(self, a, b):
+        return range_query(self.maxima, np.fmax, a, b) if b > a else self._empty()
+
+    def summary(self, a, b) -> pd.DataFrame:
+        """Summary statistics table of the interval, as app_utils.compute_summary_stats (the median needs the interval's values: O(b - a))."""
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning) # median of a column without values: NaN
+            median = np.nanmedian(self.values[a:b], axis=0) if b > a else self._empty()
+        return pd.DataFrame({
+            "Min": self.min(a, b), "Max": self.max(a, b), "Mean": self.mean(a, b),
+            "Median": median, "Standard Deviation": self.std(a, b),
+        }, index=self.cols)
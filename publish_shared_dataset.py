@@ -0,0 +1,111 @@
+# Loader process for multi-replica deployments: several Streamlit servers running on the same host can share one copy of the weather data.
+# This script loads and validates the data once, publishes it as an Arrow IPC file inside a named shared-memory segment, and describes that segment in a small JSON manifest.
+# app_utils.load_data attaches to the published segment whenever the manifest exists, instead of loading its own copy of the file.
+#
+# Usage (run before / next to the Streamlit servers):
+#   python publish_shared_dataset.py            -> publish once and exit (the segment stays available until it is unpublished)
+#   python publish_shared_dataset.py --watch 60 -> keep running, and re-publish whenever the data file changes
+#   python publish_shared_dataset.py --unpublish
+
+# Load libraries
+import argparse
+import json
+import os
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import pyarrow as pa
+
+from app_utils import (
+    DATA_PATH,
+    SHM_DIR,
+    SHM_MANIFEST_PATH,
+    dataset_fingerprint,
+    load_local_data,
+    read_shm_manifest,
+    to_arrow_table,
+)
+
+SEGMENT_PREFIX = "weather_app"
+
+
+# Copy the table into a brand new segment. The exact size is computed first, so the IPC file is written once, straight into shared memory.
+def _write_segment(table: pa.Table):
+    sizer = pa.MockOutputStream()
+    with pa.ipc.new_file(sizer, table.schema) as writer:
+        writer.write_table(table)
+    size = sizer.size()
+
+    name = f"{SEGMENT_PREFIX}_{os.getpid()}_{time.time_ns()}" # new name for every publication, so replicas still reading the previous data are never affected
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    resource_tracker.unregister(shm._name, "shared_memory") # the segment must outlive this process; --unpublish removes it
+    with pa.ipc.new_file(pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf)), table.schema) as writer:
+        writer.write_table(table)
+    return shm, size
+
+
+# Remove a segment from the system (its file in /dev/shm, see app_utils.map_shared_memory). Replicas that are still attached keep their mapping until
+# they move to the new data.
+def _unlink_segment(name: str) -> None:
+    try:
+        os.unlink(SHM_DIR / name.lstrip("/"))
+    except FileNotFoundError:
+        pass
+
+
+# Write the manifest atomically (temporary file + rename), so that replicas never read a half-written manifest.
+def _write_manifest(manifest: dict) -> None:
+    tmp_path = f"{SHM_MANIFEST_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, SHM_MANIFEST_PATH)
+
+
+def publish() -> dict:
+    """Publish the current data file in a new segment, point the manifest to it, and retire the previous segment."""
+    previous = read_shm_manifest()
+    fingerprint = dataset_fingerprint(DATA_PATH)
+    df = load_local_data(fingerprint) # in --watch mode the file has changed since the previous publication: reloaded, as keyed by the fingerprint
+    shm, size = _write_segment(to_arrow_table(df, fingerprint))
+    shm.close()
+
+    manifest = {
+        "segment": shm.name,
+        "size": size,
+        "fingerprint": fingerprint,
+        "rows": len(df),
+        "columns": len(df.columns),
+        "published_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    _write_manifest(manifest)
+    if previous is not None and previous.get("segment") != shm.name:
+        _unlink_segment(previous["segment"])
+    return manifest
+
+
+def unpublish() -> None:
+    """Remove the manifest first (replicas fall back to the local file), then the segment."""
+    previous = read_shm_manifest()
+    if os.path.exists(SHM_MANIFEST_PATH):
+        os.remove(SHM_MANIFEST_PATH)
+    if previous is not None:
+        _unlink_segment(previous["segment"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the weather data in shared memory for all Streamlit replicas on this host.")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="keep running and re-publish when the data file changes")
+    parser.add_argument("--unpublish", action="store_true", help="remove the published segment and its manifest")
+    args = parser.parse_args()
+
+    if args.unpublish:
+        unpublish()
+        print("Shared dataset unpublished.")
+    else:
+        manifest = publish()
+        print(f"Published {manifest['rows']} rows in segment '{manifest['segment']}' ({manifest['size'] / 1e6:.1f} MB).")
+        while args.watch:
+            time.sleep(args.watch)
+            if dataset_fingerprint(DATA_PATH) != (read_shm_manifest() or {}).get("fingerprint"):
+                manifest = publish()
+                print(f"Data file changed: re-published in segment '{manifest['segment']}'.")
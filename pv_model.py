@@ -0,0 +1,125 @@
+# Photovoltaic yield on tilted panels, as an alternative to the horizontal irradiance of the notebook (solar_potential):
+#   - solar position for every hour (declination and equation of time from Spencer's series), as a unit vector pointing to the sun
+#   - split of the horizontal irradiance (GHI) into direct and diffuse parts with the Erbs correlation
+#   - transposition to the plane of the panels (isotropic sky, ground reflection) and derating of the cells with temperature
+# The solar geometry is the expensive part and only depends on the site and the year, so it is computed once per (latitude, longitude, year) and cached.
+# Panels enter through their normal vectors: the incidence angle of every (panel configuration x hour) is one matrix product with the sun vectors,
+# so sweeping many tilt/azimuth options over a year is a handful of array operations.
+
+# Load libraries
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from enrichment import WEEKLY_MA_WINDOW
+from period_aggregation import transform
+
+LATITUDE, LONGITUDE = 46.2331, 7.3606 # Sion, as in the notebook
+UTC_OFFSET = 1                        # hours; timestamps in Europe/Zurich standard time, as in synthetic_weather.py
+# The irradiance of the app's data file peaks about one hour after solar noon in Europe/Zurich standard time, all year round (best fit of the
+# sun's elevation to the data: UTC+2); its geometry is computed with this offset so that tilted panels face the sun at the right hours
+DATA_FILE_UTC_OFFSET = 2
+SOLAR_CONSTANT = 1361.0               # W/m²
+MIN_COS_ZENITH = 0.065                # sun below ~3.7°: irradiance treated as diffuse only
+
+ALBEDO = 0.2                 # ground reflectance (grass); snow would be ~0.6
+NOCT = 45.0                  # °C, nominal operating cell temperature (800 W/m², 20 °C air)
+TEMPERATURE_COEFFICIENT = -0.004 # relative power change per °C of cell temperature above 25 °C (crystalline silicon)
+STC_IRRADIANCE = 1000.0      # W/m², irradiance at which the panels deliver their rated power
+
+# Panel configurations offered by the app: (tilt, azimuth) in degrees, azimuth clockwise from north (180 = facing south)
+PANELS = {
+    "South, 35° tilt": (35.0, 180.0),
+    "South, 60° tilt (winter)": (60.0, 180.0),
+    "South facade (90°)": (90.0, 180.0),
+    "East, 20° tilt": (20.0, 90.0),
+    "West, 20° tilt": (20.0, 270.0),
+    "Flat (0°)": (0.0, 180.0),
+}
+DEFAULT_PANEL = "South, 35° tilt" # the one behind the pv_cf column
+
+
+# 1) Solar geometry, cached per (site, year)
+@lru_cache(maxsize=128)
+def solar_geometry(latitude: float, longitude: float, year: int, utc_offset: float = UTC_OFFSET) -> dict:
+    """Sun unit vectors (hour x [east, north, up]) and extraterrestrial irradiance on a normal plane, for every hour of the year.
+    Hours are labelled as in the data (the irradiance of the preceding hour), so the geometry is taken at the middle of that hour."""
+    time = pd.date_range(f"{year}-01-01", f"{year + 1}-01-01", freq="h", inclusive="left")
+    b = 2 * np.pi * (time.dayofyear.to_numpy() - 1) / 365
+    declination = (0.006918 - 0.399912 * np.cos(b) + 0.070257 * np.sin(b) - 0.006758 * np.cos(2 * b)
+                   + 0.000907 * np.sin(2 * b) - 0.002697 * np.cos(3 * b) + 0.00148 * np.sin(3 * b))
+    equation_of_time = 229.18 * (0.000075 + 0.001868 * np.cos(b) - 0.032077 * np.sin(b) - 0.014615 * np.cos(2 * b) - 0.040849 * np.sin(2 * b)) # minutes
+    solar_hour = time.hour.to_numpy() - 0.5 - utc_offset + longitude / 15 + equation_of_time / 60
+    hour_angle = np.radians(15 * (solar_hour - 12))
+
+    lat = np.radians(latitude)
+    sun = np.column_stack([
+        -np.cos(declination) * np.sin(hour_angle),                                                      # east
+        np.cos(lat) * np.sin(declination) - np.sin(lat) * np.cos(declination) * np.cos(hour_angle),    # north
+        np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle),    # up (cosine of the zenith angle)
+    ])
+    extraterrestrial = SOLAR_CONSTANT * (1.00011 + 0.034221 * np.cos(b) + 0.00128 * np.sin(b) + 0.000719 * np.cos(2 * b) + 0.000077 * np.sin(2 * b))
+    sun.setflags(write=False), extraterrestrial.setflags(write=False) # shared by every caller
+    return {"start": time[0], "sun": sun, "extraterrestrial": extraterrestrial}
+
+def geometry_for(time: pd.DatetimeIndex, latitude: float, longitude: float, utc_offset: float = UTC_OFFSET):
+    """Sun vectors and extraterrestrial irradiance for the given hourly timestamps, assembled from the cached yearly tables."""
+    sun = np.empty((len(time), 3))
+    extraterrestrial = np.empty(len(time))
+    years = time.year.to_numpy()
+    for year in np.unique(years):
+        table = solar_geometry(float(latitude), float(longitude), int(year), float(utc_offset))
+        rows = np.flatnonzero(years == year)
+        hours = ((time[rows] - table["start"]) // pd.Timedelta(hours=1)).to_numpy()
+        sun[rows], extraterrestrial[rows] = table["sun"][hours], table["extraterrestrial"][hours]
+    return sun, extraterrestrial
+
+
+# 2) Direct / diffuse split (Erbs et al., 1982)
+def decompose(ghi, cos_zenith, extraterrestrial):
+    """Direct normal (DNI) and diffuse horizontal (DHI) irradiance from the global horizontal irradiance."""
+    ghi = np.asarray(ghi, dtype=np.float64)
+    sun_up = cos_zenith > MIN_COS_ZENITH
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kt = np.where(sun_up, np.clip(ghi / (extraterrestrial * cos_zenith), 0, 1), 0) # clearness index
+        kd = np.where(kt <= 0.22, 1 - 0.09 * kt,
+             np.where(kt <= 0.8, 0.9511 - 0.1604 * kt + 4.388 * kt**2 - 16.638 * kt**3 + 12.336 * kt**4, 0.165))
+        dhi = np.where(sun_up, kd * ghi, ghi)
+        dni = np.where(sun_up, (ghi - dhi) / cos_zenith, 0)
+    return dni, dhi
+
+
+# 3) Plane-of-array irradiance and PV output for several panel configurations at once
+def panel_normals(configs):
+    """Unit normal vectors (config x [east, north, up]) of panels given as (tilt, azimuth) pairs in degrees."""
+    tilt, azimuth = np.radians(np.asarray(configs, dtype=np.float64)).T
+    return np.column_stack([np.sin(tilt) * np.sin(azimuth), np.sin(tilt) * np.cos(azimuth), np.cos(tilt)])
+
+def poa_irradiance(ghi, sun, extraterrestrial, configs):
+    """Irradiance (W/m²) on the plane of each panel configuration: (config x hour)."""
+    ghi = np.asarray(ghi, dtype=np.float64)
+    dni, dhi = decompose(ghi, sun[:, 2], extraterrestrial)
+    normals = panel_normals(configs)
+    cos_incidence = np.clip(normals @ sun.T, 0, None)  # (config x hour), the only operation that grows with both axes
+    tilt_cos = normals[:, 2:3]
+    return cos_incidence * dni + (1 + tilt_cos) / 2 * dhi + (1 - tilt_cos) / 2 * ALBEDO * ghi
+
+def pv_capacity_factor(poa, temperature):
+    """Output as a share of rated power: irradiance relative to STC, derated with the cell temperature (NOCT model)."""
+    cell_temperature = np.asarray(temperature, dtype=np.float64) + (NOCT - 20) / 800 * poa
+    return np.clip(poa / STC_IRRADIANCE * (1 + TEMPERATURE_COEFFICIENT * (cell_temperature - 25)), 0, None)
+
+def sweep(df: pd.DataFrame, configs, latitude=LATITUDE, longitude=LONGITUDE, utc_offset=UTC_OFFSET):
+    """Hourly capacity factor of every panel configuration for the hours of df (needs shortwave_radiation and temperature_2m): (config x hour)."""
+    sun, extraterrestrial = geometry_for(df.index, latitude, longitude, utc_offset)
+    poa = poa_irradiance(df["shortwave_radiation"].to_numpy(), sun, extraterrestrial, configs)
+    return pv_capacity_factor(poa, df["temperature_2m"].to_numpy())
+
+
+# 4) Column family of the app: pv_cf (capacity factor of DEFAULT_PANEL), with the same smoothing levels as the other potentials
+def add_pv_cf(df: pd.DataFrame, latitude=LATITUDE, longitude=LONGITUDE, utc_offset=UTC_OFFSET) -> pd.DataFrame:
+    df["pv_cf"] = sweep(df, [PANELS[DEFAULT_PANEL]], latitude, longitude, utc_offset)[0]
+    df["pv_cf_weekly_avg"] = df["pv_cf"].rolling(window=WEEKLY_MA_WINDOW, min_periods=1).mean()
+    df["pv_cf_month_avg"] = transform(df, ["pv_cf"], "month", "mean")["pv_cf"]
+    return df
@@ -0,0 +1,190 @@
+# Headless query API: the summary statistics, correlation matrices, smoothed series and seasonal shares shown by the two pages, served as JSON or Arrow for other teams.
+# It runs as a separate local service next to the Streamlit app, and goes through the same app_utils helpers as the pages, so both always agree.
+# Filtering and aggregation run on the query engine of app_utils (WEATHER_QUERY_ENGINE=pandas|duckdb|polars, see query_engines.py; --engine overrides it).
+# The option only concerns this API: the pages always compute on their loaded frame.
+#
+# Usage:
+#   python query_api.py --port 8600
+#
+# Endpoints (all GET; the period is period=year, period=month&month=<1-12> or period=season&season=<Winter|Spring|Summer|Autumn>; smooth=hourly|weekly|monthly):
+#   /stats?period=month&month=1&smooth=weekly                    -> summary statistics of every weather variable
+#   /corr?kind=weather|renewable&period=season&season=Winter     -> correlation matrix of the weather variables or of the renewable potentials
+#   /series?vars=Temperature,Humidity&smooth=monthly&normalise=1 -> (smoothed) hourly series; renewable potentials can be requested too, e.g. vars=Solar Potential
+#   /seasonal-share?smooth=hourly                                -> seasonal share of the annual renewable potentials
+# Add format=arrow (or send "Accept: application/vnd.apache.arrow.stream") to get an Arrow IPC stream instead of JSON.
+# Responses are cached per query (and per version of the data file); requests are served concurrently, one thread each.
+
+# Load libraries
+import argparse
+import json
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+import app_utils
+from app_utils import (
+    load_data,
+    get_query_engine,
+    dataset_fingerprint,
+    build_smoothed_var_names,
+    build_renewable_cols,
+    VARS_MAP,
+    RENEW_MAP,
+    MONTHS,
+    SEASONS,
+)
+
+# URL-friendly values of the sidebar options
+PERIODS   = {"year": "Full Year", "month": "One Month", "season": "One Season"}
+SMOOTHING = {"hourly": "Hourly", "weekly": "Weekly MA", "monthly": "Monthly MA"}
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+CACHE_SIZE = 1024 # cached responses
+ENDPOINTS  = ["/stats", "/corr", "/series", "/seasonal-share"]
+
+
+class QueryError(ValueError):
+    """Invalid query parameters (answered with a 400 error)."""
+
+
+# 1) Parameters -> arguments of the app_utils helpers
+
+def _period(params):
+    duration = PERIODS.get(params.get("period", "year"))
+    if duration is None:
+        raise QueryError(f"period must be one of {list(PERIODS)}")
+    month = season = None
+    if duration == "One Month":
+        try:
+            month = int(params.get("month", ""))
+        except ValueError:
+            month = None
+        if month not in MONTHS:
+            raise QueryError("month must be a number between 1 and 12")
+    elif duration == "One Season":
+        season = params.get("season", "").capitalize()
+        if season not in SEASONS:
+            raise QueryError(f"season must be one of {SEASONS}")
+    return duration, month, season
+
+def _smooth(params):
+    smooth = SMOOTHING.get(params.get("smooth", "hourly"))
+    if smooth is None:
+        raise QueryError(f"smooth must be one of {list(SMOOTHING)}")
+    return smooth
+
+# Column names of the requested variables (weather variables and renewable potentials, by their friendly names)
+def _series_cols(params, smooth):
+    names = [v.strip() for v in params.get("vars", "Temperature").split(",") if v.strip()]
+    unknown = [v for v in names if v not in VARS_MAP and v not in RENEW_MAP]
+    if unknown:
+        raise QueryError(f"unknown variables {unknown}; choose from {list(VARS_MAP) + list(RENEW_MAP)}")
+    weather = [v for v in names if v in VARS_MAP]
+    renewable = [v for v in names if v in RENEW_MAP]
+    cols = build_smoothed_var_names(weather, smooth) + build_renewable_cols(renewable, smooth)
+    return cols, dict(zip(cols, weather + renewable))
+
+
+# 2) Computations: the same operations as the pages, run by the query engine
+
+def _compute(endpoint, params) -> pd.DataFrame:
+    engine = get_query_engine(app_utils.QUERY_ENGINE)
+    smooth = _smooth(params)
+
+    if endpoint == "/stats":
+        stats = engine.summary_stats(build_smoothed_var_names(list(VARS_MAP), smooth), *_period(params))
+        stats.index = list(VARS_MAP)
+        return stats
+
+    if endpoint == "/corr":
+        kind = params.get("kind", "weather")
+        if kind not in ("weather", "renewable"):
+            raise QueryError("kind must be 'weather' or 'renewable'")
+        names = list(VARS_MAP) if kind == "weather" else list(RENEW_MAP)
+        cols = build_smoothed_var_names(names, smooth) if kind == "weather" else build_renewable_cols(names, smooth)
+        corr = engine.correlation(cols, *_period(params))
+        corr.index = corr.columns = names
+        return corr
+
+    if endpoint == "/series":
+        cols, labels = _series_cols(params, smooth)
+        series = engine.select(cols, *_period(params))
+        if params.get("normalise") in ("1", "true", "yes"):
+            series = (series - series.min()) / (series.max() - series.min())
+        return series.rename(columns=labels).rename_axis("time")
+
+    if endpoint == "/seasonal-share":
+        share = engine.seasonal_share(build_renewable_cols(list(RENEW_MAP), smooth))
+        share.columns = list(RENEW_MAP)
+        return share.rename_axis("season")
+
+    raise QueryError(f"unknown endpoint {endpoint}")
+
+
+# 3) Serialisation and response cache
+
+def _to_arrow(df: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def _to_json(df: pd.DataFrame) -> bytes:
+    return df.to_json(orient="split", date_format="iso", double_precision=6).encode()
+
+# Key = endpoint, sorted query parameters, output format and data version: identical queries are computed and serialised once.
+@lru_cache(maxsize=CACHE_SIZE)
+def cached_response(endpoint, params: tuple, fmt, fingerprint):
+    df = _compute(endpoint, dict(params))
+    return (ARROW_MIME, _to_arrow(df)) if fmt == "arrow" else ("application/json", _to_json(df))
+
+def query(path_and_query, accept=""):
+    """(status, content type, body) of one request; also usable without the HTTP server."""
+    url = urlsplit(path_and_query)
+    params = dict(parse_qsl(url.query))
+    fmt = params.pop("format", "arrow" if ARROW_MIME in accept else "json")
+    endpoint = url.path.rstrip("/")
+    if endpoint not in ENDPOINTS:
+        return 404, "application/json", json.dumps({"error": f"unknown endpoint {url.path}", "endpoints": ENDPOINTS}).encode()
+    try:
+        return (200, *cached_response(endpoint, tuple(sorted(params.items())), fmt, dataset_fingerprint()))
+    except QueryError as e:
+        return 400, "application/json", json.dumps({"error": str(e)}).encode()
+
+
+# 4) HTTP server
+
+class QueryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status, content_type, body = query(self.path, self.headers.get("Accept", ""))
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): # one line per request would dominate the output under load
+        pass
+
+def make_server(host="127.0.0.1", port=8600) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the dashboard's computations as a JSON/Arrow HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--engine", choices=app_utils.QUERY_ENGINES, default=app_utils.QUERY_ENGINE, help="query engine (default: WEATHER_QUERY_ENGINE, or pandas)")
+    args = parser.parse_args()
+
+    app_utils.QUERY_ENGINE = args.engine
+    load_data() # load (or attach to) the data before accepting requests
+    get_query_engine(args.engine)
+    server = make_server(args.host, args.port)
+    print(f"Query API listening on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,209 @@
+# Query engines: the filtering and aggregation behind the summary statistics, correlations, series and seasonal shares (period filter, column projection,
+# statistics, correlation matrix, seasonal sums), run by one of three interchangeable back ends:
+#   - pandas:  eager, on the frame loaded by app_utils.load_data, through the pages' own helpers (the reference, and the default)
+#   - duckdb:  SQL on the parquet file, multi-threaded; only the requested columns are read, and row groups outside the period are skipped
+#   - polars:  lazy scans of the parquet file, with the same projection and filter pushdown, multi-threaded
+# Every engine returns pandas objects laid out as the app_utils helpers (compute_summary_stats, DataFrame.corr, compute_seasonal_share),
+# so callers do not depend on the engine. The pandas engine calls those helpers themselves (given by app_utils, which imports this module), so the
+# query API computes exactly what the pages show, and the parity benchmark checks the other engines against them. DuckDB and Polars are optional packages, imported only when their engine is created.
+# The DuckDB and Polars engines see the columns of the data file only, not the columns that app_utils.load_data adds when loading (model columns
+# pv_cf, hydro_runoff, wind_cf, period codes): asking them for one raises a ValueError naming it.
+# Scope: the engines serve the headless query API (query_api.py). The pages compute on the frame they have loaded, through the app_utils helpers,
+# whatever WEATHER_QUERY_ENGINE says.
+
+# Load libraries
+from abc import ABC, abstractmethod
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+QUERY_ENGINES = ["pandas", "duckdb", "polars"]
+STATS = {"Min": "min", "Max": "max", "Mean": "mean", "Median": "median", "Standard Deviation": "std"} # compute_summary_stats columns -> statistic
+SEASONS = ["Winter", "Spring", "Summer", "Autumn"] # as app_utils.SEASONS
+
+
+class QueryEngine(ABC):
+    """Common interface. Periods are given as in app_utils.filter_by_period: (duration, month, season), the month or season being None when unused."""
+    name = None
+
+    @abstractmethod
+    def select(self, cols, duration="Full Year", month=None, season=None) -> pd.DataFrame:
+        """The columns over the period, indexed by time."""
+
+    @abstractmethod
+    def summary_stats(self, cols, duration="Full Year", month=None, season=None) -> pd.DataFrame:
+        """Min, Max, Mean, Median and Standard Deviation (ddof=1) of each column over the period (one row per column)."""
+
+    @abstractmethod
+    def correlation(self, cols, duration="Full Year", month=None, season=None) -> pd.DataFrame:
+        """Pearson correlation matrix of the columns over the period (NaN for a constant column, as pandas)."""
+
+    @abstractmethod
+    def seasonal_share(self, cols) -> pd.DataFrame:
+        """Share of each column's total in each season of the season column, Winter -> Autumn (0 for a season without data)."""
+
+
+# Shared by the DuckDB and Polars engines: tables and matrices from one row of aggregates
+def _stats_table(values: dict, cols) -> pd.DataFrame:
+    """values: (column, statistic) -> value."""
+    return pd.DataFrame([[values[c, stat] for stat in STATS.values()] for c in cols], index=list(cols), columns=list(STATS), dtype=np.float64)
+
+def _corr_matrix(pairs: dict, std: dict, cols) -> pd.DataFrame:
+    """pairs: (column, column) -> correlation, std: column -> standard deviation; constant columns get NaN, as in pandas."""
+    corr = pd.DataFrame(np.eye(len(cols)), index=list(cols), columns=list(cols))
+    for (a, b), value in pairs.items():
+        corr.loc[a, b] = corr.loc[b, a] = value
+    constant = [c for c in cols if not std[c] > 0]
+    corr.loc[constant, :] = corr.loc[:, constant] = np.nan
+    return corr
+
+def _file_columns(path) -> set:
+    return set(pq.read_schema(path).names)
+
+def _check_columns(available: set, cols, path):
+    missing = [c for c in cols if c not in available]
+    if missing:
+        raise ValueError(f"columns not in {path}: {missing} (added when the app loads the data: use the pandas engine)")
+
+def _season_share(sums: pd.DataFrame, cols) -> pd.DataFrame:
+    """sums: one row of column sums per season (season column)."""
+    sums = sums.set_index("season")[list(cols)].astype(np.float64)
+    sums.index = sums.index.astype(str)
+    sums = sums.reindex(pd.Index(SEASONS, name="season"), fill_value=0.0)
+    return sums.div(sums.sum(), axis=1)
+
+
+# 1) pandas: the loaded frame, through the app_utils helpers
+class PandasEngine(QueryEngine):
+    name = "pandas"
+
+    def __init__(self, load_frame, filter_by_period, compute_summary_stats, compute_seasonal_share):
+        self.load_frame = load_frame # called on every query (e.g. app_utils.load_data, itself cached), so a new version of the data is picked up
+        self.filter_by_period = filter_by_period
+        self.compute_summary_stats = compute_summary_stats
+        self.compute_seasonal_share = compute_seasonal_share
+
+    def select(self, cols, duration="Full Year", month=None, season=None):
+        return self.filter_by_period(self.load_frame(), duration, month, season)[list(cols)]
+
+    def summary_stats(self, cols, duration="Full Year", month=None, season=None):
+        return self.compute_summary_stats(self.filter_by_period(self.load_frame(), duration, month, season), list(cols))
+
+    def correlation(self, cols, duration="Full Year", month=None, season=None):
+        return self.select(cols, duration, month, season).corr() # as the Weather Explorer's correlation section
+
+    def seasonal_share(self, cols):
+        return self.compute_seasonal_share(self.load_frame(), list(cols))
+
+
+# 2) DuckDB: SQL on the parquet file
+def _quote(name) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+class DuckDBEngine(QueryEngine):
+    name = "duckdb"
+
+    def __init__(self, path, threads=None):
+        import duckdb
+
+        self.path, self.columns = path, _file_columns(path)
+        self.source = "read_parquet('" + str(path).replace("'", "''") + "')"
+        self.connection = duckdb.connect() # in-memory database, the file is queried in place
+        if threads:
+            self.connection.execute(f"SET threads = {int(threads)}")
+
+    # One cursor per query: a DuckDB connection must not be used by several threads at once (the API serves one thread per request)
+    def _query(self, sql, params=()) -> pd.DataFrame:
+        return self.connection.cursor().execute(sql, list(params)).df()
+
+    @staticmethod
+    def _where(duration, month, season):
+        if duration == "One Month":
+            return "WHERE month = ?", [month]
+        if duration == "One Season":
+            return "WHERE CAST(season AS VARCHAR) = ?", [season]
+        return "", []
+
+    def select(self, cols, duration="Full Year", month=None, season=None):
+        _check_columns(self.columns, cols, self.path)
+        where, params = self._where(duration, month, season)
+        df = self._query(f"SELECT time, {', '.join(map(_quote, cols))} FROM {self.source} {where} ORDER BY time", params)
+        return df.set_index("time")
+
+    def summary_stats(self, cols, duration="Full Year", month=None, season=None):
+        _check_columns(self.columns, cols, self.path)
+        functions = {"min": "min", "max": "max", "mean": "avg", "median": "median", "std": "stddev_samp"}
+        aggregates = [(c, stat, f"{sql}(CAST({_quote(c)} AS DOUBLE))") for c in cols for stat, sql in functions.items()]
+        where, params = self._where(duration, month, season)
+        row = self._query(f"SELECT {', '.join(expr for _, _, expr in aggregates)} FROM {self.source} {where}", params).iloc[0].to_numpy()
+        return _stats_table({(c, stat): value for (c, stat, _), value in zip(aggregates, row)}, cols)
+
+    def correlation(self, cols, duration="Full Year", month=None, season=None):
+        _check_columns(self.columns, cols, self.path)
+        pairs = list(combinations(cols, 2))
+        exprs = [f"corr({_quote(a)}, {_quote(b)})" for a, b in pairs] + [f"stddev_samp({_quote(c)})" for c in cols]
+        where, params = self._where(duration, month, season)
+        row = self._query(f"SELECT {', '.join(exprs)} FROM {self.source} {where}", params).iloc[0].to_numpy(dtype=np.float64)
+        return _corr_matrix(dict(zip(pairs, row)), dict(zip(cols, row[len(pairs):])), cols)
+
+    def seasonal_share(self, cols):
+        _check_columns(self.columns, cols, self.path)
+        sums = ", ".join(f"sum({_quote(c)}) AS {_quote(c)}" for c in cols)
+        return _season_share(self._query(f"SELECT CAST(season AS VARCHAR) AS season, {sums} FROM {self.source} GROUP BY 1"), cols)
+
+
+# 3) Polars: lazy scans of the parquet file
+class PolarsEngine(QueryEngine):
+    name = "polars"
+
+    def __init__(self, path):
+        import polars as pl
+
+        self.pl = pl
+        self.path, self.columns = str(path), _file_columns(path)
+
+    def _scan(self, cols, duration="Full Year", month=None, season=None):
+        _check_columns(self.columns, cols, self.path)
+        pl = self.pl
+        scan = pl.scan_parquet(self.path)
+        if duration == "One Month":
+            return scan.filter(pl.col("month") == month)
+        if duration == "One Season":
+            return scan.filter(pl.col("season").cast(pl.String) == season)
+        return scan
+
+    def select(self, cols, duration="Full Year", month=None, season=None):
+        df = self._scan(cols, duration, month, season).select(["time", *cols]).sort("time").collect().to_pandas()
+        return df.set_index("time")
+
+    def summary_stats(self, cols, duration="Full Year", month=None, season=None):
+        pl = self.pl
+        exprs = [getattr(pl.col(c).cast(pl.Float64), stat)().alias(f"{i}.{stat}") for i, c in enumerate(cols) for stat in STATS.values()]
+        row = self._scan(cols, duration, month, season).select(exprs).collect().row(0, named=True)
+        return _stats_table({(c, stat): row[f"{i}.{stat}"] for i, c in enumerate(cols) for stat in STATS.values()}, cols)
+
+    def correlation(self, cols, duration="Full Year", month=None, season=None):
+        pl = self.pl
+        pairs = list(combinations(cols, 2))
+        exprs = [pl.corr(a, b).alias(f"corr.{k}") for k, (a, b) in enumerate(pairs)] + [pl.col(c).std().alias(f"std.{i}") for i, c in enumerate(cols)]
+        row = self._scan(cols, duration, month, season).select(exprs).collect().row(0, named=True)
+        return _corr_matrix({pair: row[f"corr.{k}"] for k, pair in enumerate(pairs)}, {c: row[f"std.{i}"] for i, c in enumerate(cols)}, cols)
+
+    def seasonal_share(self, cols):
+        pl = self.pl
+        sums = self._scan(cols).group_by(pl.col("season").cast(pl.String)).agg([pl.col(c).sum() for c in cols]).collect()
+        return _season_share(sums.to_pandas(), cols)
+
+
+def make_engine(name, path, load_frame, helpers, threads=None) -> QueryEngine:
+    """Engine by name: pandas on load_frame() with the helpers (app_utils.ENGINE_HELPERS), DuckDB or Polars on the parquet file at path
+    (threads: DuckDB threads, all cores by default)."""
+    if name == "pandas":
+        return PandasEngine(load_frame, **helpers)
+    if name == "duckdb":
+        return DuckDBEngine(path, threads)
+    if name == "polars":
+        return PolarsEngine(path)
+    raise ValueError(f"unknown query engine: {name} (choose from {QUERY_ENGINES})")
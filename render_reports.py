@@ -0,0 +1,148 @@
+# Batch report renderer: renders every section of both pages (summary statistics, correlation heatmaps, time series, histograms, seasonal share) as static HTML
+# for every time range (full year, each month, each season) x smoothing level x site, instead of clicking through every combination by hand.
+#
+# Usage:
+#   python render_reports.py reports                                          -> Sion (the app's data file)
+#   python render_reports.py reports --dataset weather_sites --workers 8      -> every site of a multi-site data set (see synthetic_weather.py)
+#   python render_reports.py reports --dataset weather_sites --sites sion site_001 --png
+# Output: reports/index.html, linking to reports/<site>/<smoothing>/<period>.html (and PNG images of each figure with --png, which needs the kaleido package).
+#
+# Work is spread over a process pool, one task per site: the task loads the site once, computes the aggregates shared by several reports (period slices,
+# seasonal shares) once, and renders every smoothing level and period from them.
+
+# Load libraries
+import argparse
+import calendar
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from app_utils import (
+    load_local_data,
+    load_site_data,
+    read_sites,
+    filter_by_period,
+    build_smoothed_var_names,
+    build_renewable_cols,
+    make_label_map,
+    compute_summary_stats,
+    prepare_plot_data,
+    compute_seasonal_share,
+    VARS_MAP,
+    RENEW_MAP,
+    SMOOTH_SUFFIX,
+    MONTHS,
+    SEASONS,
+)
+from app_figures import corr_heatmap, line_chart, histogram, seasonal_share_bar
+
+# Every time range selectable in the pages: (duration, month, season)
+PERIOD_CHOICES = [("Full Year", None, None)] + [("One Month", m, None) for m in MONTHS] + [("One Season", None, s) for s in SEASONS]
+PLOTLY_JS = "https://cdn.plot.ly/plotly-2.35.2.min.js"
+
+
+def period_label(duration, month, season):
+    return calendar.month_name[month] if duration == "One Month" else season if duration == "One Season" else "Full Year"
+
+def _slug(text):
+    return text.lower().replace(" ", "_")
+
+
+# 1) Per-site data and shared aggregates, computed once per site (pool task)
+
+def site_aggregates(site, dataset_dir):
+    df = load_site_data(site, Path(dataset_dir)) if dataset_dir else load_local_data()
+    periods = {period_label(*choice): filter_by_period(df, *choice) for choice in PERIOD_CHOICES}
+    seasonal_shares = {}
+    for smooth in SMOOTH_SUFFIX:
+        share = compute_seasonal_share(df, build_renewable_cols(list(RENEW_MAP), smooth))
+        share.columns = list(RENEW_MAP)
+        seasonal_shares[smooth] = share
+    return periods, seasonal_shares
+
+
+# 2) One report: every section of both pages, for one site, smoothing level and period
+
+def report_figures(df_period, smooth, period, seasonal_share):
+    """(title, figure or HTML table) of every section, in the order of the pages."""
+    all_vars = list(VARS_MAP)
+    weather_cols = build_smoothed_var_names(all_vars, smooth)
+    renew_cols = build_renewable_cols(list(RENEW_MAP), smooth)
+    renew_labels = dict(zip(renew_cols, RENEW_MAP))
+
+    stats = compute_summary_stats(df_period, weather_cols)
+    stats.index = all_vars
+    sections = [
+        (f"{smooth} Summary Statistics ({period})", stats.style.format("{:.2f}").to_html()),
+        (f"{smooth} Correlation Matrix ({period})", corr_heatmap(df_period[weather_cols].corr(), aspect="auto")),
+        (f"{smooth} Normalised Weather Trends ({period})", line_chart(prepare_plot_data(df_period, weather_cols, make_label_map(all_vars, smooth), True), "Normalised")),
+    ]
+    sections += [
+        (f"{smooth} Distribution of {var} ({period})", histogram(df_period, col, var))
+        for var, col in zip(all_vars, weather_cols)
+    ]
+    sections += [
+        (f"{smooth} Correlation of Renewable Potentials ({period})", corr_heatmap(df_period[renew_cols].corr().rename(index=renew_labels, columns=renew_labels))),
+        (f"{smooth} Normalised Renewable Potentials ({period})", line_chart(prepare_plot_data(df_period, renew_cols, renew_labels, True), "Normalised")),
+        ("Seasonal Share of Total Annual Renewable Potential", seasonal_share_bar(seasonal_share)),
+    ]
+    return sections
+
+def write_report(path, title, sections, png=False):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    body = []
+    for i, (heading, content) in enumerate(sections):
+        if not isinstance(content, str):
+            if png:
+                content.write_image(path.with_suffix("") / f"{i:02d}_{_slug(heading)}.png")
+            content = content.to_html(full_html=False, include_plotlyjs=False)
+        body.append(f"<h2>{html.escape(heading)}</h2>\n{content}")
+    path.write_text(
+        f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+        f"<script src='{PLOTLY_JS}'></script></head>\n<body><h1>{html.escape(title)}</h1>\n" + "\n<hr>\n".join(body) + "\n</body></html>",
+        encoding="utf-8",
+    )
+
+# One pool task: every smoothing level and period of one site
+def render_site(site, dataset_dir, out_dir, png=False):
+    periods, seasonal_shares = site_aggregates(site, dataset_dir)
+    paths = []
+    for smooth in SMOOTH_SUFFIX:
+        for period, df_period in periods.items():
+            path = Path(out_dir) / site / _slug(smooth) / f"{_slug(period)}.html"
+            if png:
+                (path.with_suffix("")).mkdir(parents=True, exist_ok=True)
+            write_report(path, f"{site} – {smooth} – {period}", report_figures(df_period, smooth, period, seasonal_shares[smooth]), png)
+            paths.append(path)
+    return paths
+
+
+# 3) Whole report set
+
+def render_all(out_dir, sites=None, dataset_dir=None, workers=None, png=False):
+    """Render every combination for every site and write an index page; returns the paths of the reports."""
+    out_dir = Path(out_dir)
+    if sites is None:
+        sites = list(read_sites(dataset_dir)["site"]) if dataset_dir else ["sion"]
+    # One task per site, so that a site is loaded and aggregated by a single process (consecutive tasks go to whichever worker is free)
+    with ProcessPoolExecutor(max_workers=workers or min(len(sites), os.cpu_count())) as pool:
+        futures = [pool.submit(render_site, site, dataset_dir, out_dir, png) for site in sites]
+        paths = [path for future in futures for path in future.result()]
+
+    links = "\n".join(f"<li><a href='{p.relative_to(out_dir).as_posix()}'>{html.escape(p.relative_to(out_dir).as_posix())}</a></li>" for p in paths)
+    (out_dir / "index.html").write_text(f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>Weather reports</title></head>\n<body><h1>Weather reports</h1>\n<ul>\n{links}\n</ul></body></html>", encoding="utf-8")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render static HTML reports of both pages for every period, smoothing level and site.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--dataset", help="multi-site data set (default: the app's Sion data file)")
+    parser.add_argument("--sites", nargs="+", help="only these sites (default: every site of the data set)")
+    parser.add_argument("--workers", type=int, help="number of processes (default: one per CPU, at most one per site)")
+    parser.add_argument("--png", action="store_true", help="also save each figure as PNG (requires kaleido)")
+    args = parser.parse_args()
+
+    paths = render_all(args.out_dir, args.sites, args.dataset, args.workers, args.png)
+    print(f"Rendered {len(paths)} reports in {args.out_dir}")
@@ -0,0 +1,182 @@
+# Multi-site renewable potential engine: the solar, wind and hydro potentials of every site are held in one (site x hour x source) NumPy array,
+# so that normalisation, correlations and seasonal shares are computed for all selected sites at once with batched array operations (no loop over sites).
+# Sites come from the app's Sion data file ("Sion (observed)") and, when available, from the multi-site data set in app_utils.SITES_DIR.
+# The canton aggregate weighs the sites equally, or by the area of a region closest to each of them (regions file, see spatial_index.py).
+
+# Load libraries
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app_metrics import tracked_cache
+from app_utils import (
+    load_data,
+    load_site_data,
+    frame_fingerprint,
+    read_sites,
+    filter_by_period,
+    build_renewable_cols,
+    RENEW_MAP,
+    SEASONS,
+    SITES_DIR,
+    DEFAULT_SCHEME,
+)
+from pv_model import LATITUDE, LONGITUDE
+from seasons import season_codes
+from spatial_index import SiteIndex, read_regions, area_weights, REGIONS_PATH
+
+OBSERVED_SITE = "Sion (observed)"
+MAX_PLOT_POINTS = 2000     # time series of the capacity what-if are averaged down to about this many points
+DURATION_CURVE_POINTS = 500
+EQUAL_WEIGHTS = "Equal weights" # canton aggregate without a regions file, or when chosen
+
+
+# 1) Building the (site x hour x source) array
+
+def available_sites(dataset_dir=SITES_DIR) -> list:
+    """Observed Sion first, then the sites of the multi-site data set if there is one."""
+    if os.path.exists(os.path.join(dataset_dir, "_sites.json")):
+        return [OBSERVED_SITE] + list(read_sites(dataset_dir)["site"])
+    return [OBSERVED_SITE]
+
+def stack_potentials(frames, cols):
+    """Stack the given columns of several sites' frames into one contiguous (site x hour x source) array, on the hours all sites have in common.
+    Returns the array and a calendar frame (season and position of each hour) used to select periods."""
+    time = frames[0].index
+    for df in frames[1:]:
+        time = time.intersection(df.index)
+    values = np.stack([df.loc[time, cols].to_numpy(dtype=np.float64) for df in frames])
+    calendar = pd.DataFrame({"season": frames[0].loc[time, "season"], "pos": np.arange(len(time))}, index=time)
+    return values, calendar
+
+# Array of every available site for one smoothing level and choice of models (tuple of (source, model) pairs, see app_utils.RENEW_MODELS),
+# built once per version of the data (read-only, shared by all sessions). Keyed by the fingerprint of the observed frame it is built from (the page's,
+# see app_utils.frame_fingerprint), as the explorer's results, so that data swapped in by the shared-memory publisher is picked up on the next rerun.
+def load_potential_cube(smooth, sites: tuple, models: tuple = (), observed=None):
+    observed = load_data() if observed is None else observed
+    return _potential_cube(smooth, sites, models, frame_fingerprint(observed), observed)
+
+@tracked_cache(st.cache_resource(max_entries=16))
+def _potential_cube(smooth, sites: tuple, models: tuple, fingerprint, _observed):
+    frames = [_observed if site == OBSERVED_SITE else load_site_data(site) for site in sites]
+    return stack_potentials(frames, build_renewable_cols(list(RENEW_MAP), smooth, dict(models)))
+
+# Hours of the selected period, as positions on the hour axis (same rules as filter_by_period)
+def period_positions(calendar, duration, month=None, season=None, scheme=DEFAULT_SCHEME):
+    return filter_by_period(calendar, duration, month, season, scheme)["pos"].to_numpy()
+
+# Season of every hour of the calendar under the chosen definition (see seasons.py), for seasonal_shares
+def calendar_seasons(calendar, scheme=DEFAULT_SCHEME):
+    if scheme == DEFAULT_SCHEME:
+        return calendar["season"].to_numpy()
+    return np.array(SEASONS)[season_codes(calendar.index, scheme)[0]]
+
+
+# 2) Batched computations; `values` is always a (site x hour x source) array
+
+def normalise(values):
+    """Min-max scaling of each site's and source's series to [0, 1]."""
+    lo, hi = values.min(axis=1, keepdims=True), values.max(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (values - lo) / (hi - lo)
+
+def correlations(values):
+    """Pearson correlation matrix between sources, for every site at once: (site x source x source)."""
+    centred = values - values.mean(axis=1, keepdims=True)
+    cov = np.einsum("shk,shl->skl", centred, centred)
+    std = np.sqrt(np.einsum("skk->sk", cov))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return cov / (std[:, :, None] * std[:, None, :])
+
+def seasonal_shares(values, seasons):
+    """Share of each source's total falling in each season (Winter -> Autumn), for every site at once: (site x season x source)."""
+    one_hot = (np.asarray(seasons)[None, :] == np.array(SEASONS)[:, None]).astype(values.dtype) # (season x hour)
+    sums = np.einsum("qh,shk->sqk", one_hot, values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / sums.sum(axis=1, keepdims=True)
+
+def regional_aggregate(values, weights=None):
+    """Weighted mean over sites (equal weights by default): one (hour x source) series for the whole region."""
+    weights = np.full(values.shape[0], 1 / values.shape[0]) if weights is None else np.asarray(weights) / np.sum(weights)
+    return np.tensordot(weights, values, axes=1)
+
+
+# 3) Tables for the page, with friendly names
+
+def pairwise_table(corr, sites):
+    """One row per site, one column per pair of sources (e.g. Solar Potential / Wind Potential)."""
+    names = list(RENEW_MAP)
+    pairs = [(i, j) for i in range(len(names)) for j in range(i + 1, len(names))]
+    return pd.DataFrame(
+        {f"{names[i].split()[0]} / {names[j].split()[0]}": corr[:, i, j] for i, j in pairs},
+        index=pd.Index(sites, name="Site"),
+    )
+
+def share_table(shares, sites, season):
+    """Share of each source's annual total falling in one season, one row per site."""
+    return pd.DataFrame(shares[:, SEASONS.index(season), :], index=pd.Index(sites, name="Site"), columns=list(RENEW_MAP))
+
+
+# 4) Capacity what-if: combined generation of installed capacities, re-evaluated on every slider move
+
+# Min-max normalised potentials of one period as a contiguous, read-only (hour x source) matrix, built once per period, settings and version of the data.
+# `key` identifies the period (sites, smoothing, models, time range) and `source` is the whole frame the period was taken from, whose fingerprint
+# identifies the version of the data; neither frame is hashed.
+def normalised_basis(df_period, key, source):
+    return _normalised_basis(df_period, key, frame_fingerprint(source))
+
+@tracked_cache(st.cache_resource(max_entries=32))
+def _normalised_basis(_df_period, key, fingerprint):
+    values = _df_period.to_numpy(dtype=np.float64)
+    lo, hi = values.min(axis=0), values.max(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        basis = np.ascontiguousarray(np.nan_to_num((values - lo) / (hi - lo)))
+    basis.setflags(write=False)
+    return basis, _df_period.index
+
+def combined_generation(basis, capacities):
+    """Generation of the installed capacities (one per source), hour by hour: a single matrix-vector product."""
+    return basis @ np.asarray(capacities, dtype=np.float64)
+
+def downsample(time, series, max_points=MAX_PLOT_POINTS):
+    """Block means of consecutive hours, so that a long series is drawn with at most about max_points points."""
+    block = -(-len(series) // max_points)
+    if block <= 1:
+        return time, series
+    starts = np.arange(0, len(series), block)
+    return time[starts], np.add.reduceat(series, starts) / np.diff(np.append(starts, len(series)))
+
+def duration_curve(series, points=DURATION_CURVE_POINTS):
+    """Generation sorted from the highest to the lowest hour, sampled at evenly spaced shares of the hours (0 to 100 %)."""
+    ordered = np.sort(series)[::-1]
+    idx = np.linspace(0, len(ordered) - 1, min(points, len(ordered))).round().astype(np.intp)
+    return idx / max(len(ordered) - 1, 1), ordered[idx]
+
+
+# 5) Spatial index of the sites and area weights of the regions (spatial_index.py)
+
+def site_table(sites, dataset_dir=SITES_DIR) -> pd.DataFrame:
+    """Coordinates of the given sites, in that order; observed Sion at the coordinates of the notebook."""
+    table = pd.DataFrame([{"site": OBSERVED_SITE, "latitude": LATITUDE, "longitude": LONGITUDE}])
+    if any(site != OBSERVED_SITE for site in sites):
+        table = pd.concat([table, read_sites(dataset_dir)], ignore_index=True)
+    return table.set_index("site").loc[list(sites)].reset_index()
+
+@tracked_cache(st.cache_resource(max_entries=16))
+def load_site_index(sites: tuple):
+    return SiteIndex(site_table(sites))
+
+# Version of the regions file (modification time), None without one: part of the cache keys below, so that an edited file is read again
+def regions_version(path=REGIONS_PATH):
+    return str(os.stat(path).st_mtime_ns) if os.path.exists(path) else None
+
+@tracked_cache(st.cache_resource(max_entries=2))
+def load_regions(version):
+    return read_regions(REGIONS_PATH) if version is not None else {}
+
+# Sparse (region x site) area weights of the selected sites (each region shared between the selected sites closest to its points) and the region names
+@tracked_cache(st.cache_resource(max_entries=16))
+def load_region_weights(sites: tuple, version):
+    return area_weights(load_site_index(sites), load_regions(version))
@@ -0,0 +1,49 @@
+# Season labeller for any range of timestamps: each hour gets a season (Winter, Spring, Summer, Autumn) under one of several definitions,
+# plus the season-year it belongs to, so that seasons can be compared across years rather than pooled (winter 2024 runs into 2025 and is not mixed
+# with the January-March of 2024, which belongs to winter 2023).
+# Everything is integer day-of-year arithmetic on a leap-year calendar, one vectorised pass over the index (no per-year cut dates, no loops).
+
+# Load libraries
+import numpy as np
+import pandas as pd
+
+SEASON_NAMES = ["Winter", "Spring", "Summer", "Autumn"] # code 0 to 3, same order as app_utils.SEASONS and period_aggregation.SEASON_CODES
+
+# First day of Spring, Summer, Autumn and Winter, as day of year on a leap-year calendar (1 March = 60, 1 December = 335)
+SEASON_SCHEMES = {
+    "Notebook (20th of Mar, Jun, Sep, Dec)":   np.array([79, 171, 263, 354]), # cut points of the data sourcing notebook, the app's default
+    "Meteorological (1st of Mar, Jun, Sep, Dec)": np.array([60, 152, 244, 335]), # whole months, as in climate statistics
+    "Astronomical (equinoxes and solstices)":  np.array([79, 172, 265, 355]), # usual dates: 20 March, 21 June, 22 September, 21 December
+}
+DEFAULT_SCHEME = "Notebook (20th of Mar, Jun, Sep, Dec)"
+
+# Position of the day among the cut points (0 = before the first, 4 = after the last) -> season code; 0 and 4 are both Winter
+_CODE_BY_POSITION = np.array([0, 1, 2, 3, 0], dtype=np.int8)
+
+
+def leap_day_of_year(time: pd.DatetimeIndex) -> np.ndarray:
+    """Day of year on a leap-year calendar, 0 to 365 (29 February is day 59 in every year, so a date always gets the same number)."""
+    doy = time.dayofyear.to_numpy() - 1
+    return doy + ((~time.is_leap_year) & (time.month > 2))
+
+def season_codes(time: pd.DatetimeIndex, scheme=DEFAULT_SCHEME):
+    """Season code (SEASON_NAMES) and season-year of every timestamp. The season-year is the year in which the season starts,
+    so the January-March part of a winter belongs to the previous year."""
+    position = np.searchsorted(SEASON_SCHEMES[scheme], leap_day_of_year(time), side="right")
+    return _CODE_BY_POSITION[position], time.year.to_numpy() - (position == 0)
+
+def season_labels(time: pd.DatetimeIndex, scheme=DEFAULT_SCHEME) -> pd.Categorical:
+    """Season names, as the season column of the enriched data (ordered Spring -> Winter)."""
+    codes, _ = season_codes(time, scheme)
+    return pd.Categorical(np.array(SEASON_NAMES)[codes], categories=["Spring", "Summer", "Autumn", "Winter"], ordered=True)
+
+def season_year_codes(time: pd.DatetimeIndex, scheme=DEFAULT_SCHEME) -> np.ndarray:
+    """One integer per season and season-year, increasing in time: season_year * 4 + 0 (Spring) to 3 (Winter)."""
+    codes, season_year = season_codes(time, scheme)
+    return (season_year * 4 + (codes + 3) % 4).astype(np.int32)
+
+def season_year_names(codes: np.ndarray) -> list:
+    """Readable labels of season_year_codes, e.g. "Winter 2024/25" for the winter starting in December 2024."""
+    names = np.array(SEASON_NAMES)[(np.asarray(codes) % 4 + 1) % 4]
+    years = np.asarray(codes) // 4
+    return [f"{name} {year}/{(year + 1) % 100:02d}" if name == "Winter" else f"{name} {year}" for name, year in zip(names, years)]
@@ -0,0 +1,118 @@
+# Spatial index of the sites (grid points) of a multi-site data set:
+#   - nearest-site lookup for any coordinates: a KD-tree (scipy.spatial.cKDTree) on the sites' positions as 3-D points on the unit sphere, where the
+#     straight-line distance grows with the great-circle distance, so the nearest points are the same and no projection is needed
+#   - area weights of the sites in regions given as GeoJSON polygons (canton, districts): each region is sampled on a regular grid of about
+#     SAMPLE_SPACING_KM, every sample goes to its nearest site (i.e. the site's Voronoi cell), and a site's weight is the area of its cell inside the region.
+#     The weights form a sparse (region x site) matrix, normalised per region, so the series of every region are one sparse product with the
+#     (site x hour) array (regional_series), and one row of it gives the weights of renewable_engine.regional_aggregate.
+
+# Load libraries
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+SAMPLE_SPACING_KM = 1.0 # sample grid of the regions; a district of 100 km² gets about 100 samples
+
+# Regions of the deployment (e.g. Valais and its districts), as a GeoJSON FeatureCollection of Polygon / MultiPolygon features with a "name" property.
+# No file is shipped: without one the canton aggregate keeps equal site weights. The location can be overridden per deployment.
+REGIONS_PATH = Path(os.environ.get("WEATHER_REGIONS_FILE", Path(__file__).resolve().parent / "regions.geojson"))
+
+
+# 1) Nearest-site lookup
+def unit_vectors(latitude, longitude) -> np.ndarray:
+    """Positions on the unit sphere, (point x 3)."""
+    lat, lon = np.radians(np.asarray(latitude, dtype=np.float64)), np.radians(np.asarray(longitude, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1)) # great-circle distance
+
+class SiteIndex:
+    """KD-tree of a table of sites (site, latitude, longitude columns, as app_utils.read_sites)."""
+
+    def __init__(self, sites: pd.DataFrame):
+        self.sites = sites.reset_index(drop=True)
+        self.tree = cKDTree(unit_vectors(self.sites["latitude"], self.sites["longitude"]))
+
+    def query(self, latitude, longitude, k=1):
+        """Positions (in the table) of the k nearest sites of each point, and their distances in km; arrays of any shape, vectorised."""
+        chord, position = self.tree.query(unit_vectors(latitude, longitude), k=k)
+        return position, chord_to_km(chord)
+
+    def nearest(self, latitude, longitude, k=1) -> pd.DataFrame:
+        """The k sites nearest to one point, closest first, with their distance in km."""
+        position, distance = self.query(latitude, longitude, k=min(k, len(self.sites)))
+        nearest = self.sites.iloc[np.atleast_1d(position)].copy()
+        nearest["distance_km"] = np.atleast_1d(distance)
+        return nearest.reset_index(drop=True)
+
+
+# 2) Regions
+def read_regions(path=REGIONS_PATH) -> dict:
+    """Region name -> list of polygons, each a list of rings ((vertex x 2) arrays of longitude, latitude; the first ring is the outline, the others holes)."""
+    with open(path) as f:
+        features = json.load(f)["features"]
+    regions = {}
+    for i, feature in enumerate(features):
+        geometry = feature["geometry"]
+        polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        name = (feature.get("properties") or {}).get("name", f"Region {i + 1}")
+        regions.setdefault(name, []).extend([[np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon] for polygon in polygons])
+    return regions
+
+def inside_polygon(lon, lat, rings) -> np.ndarray:
+    """Points inside a polygon with holes (even-odd rule over all its rings), vectorised over the points."""
+    inside = np.zeros(len(lon), dtype=bool)
+    for ring in rings:
+        x0, y0 = ring[:, 0], ring[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1) # edges to the next vertex (a closing edge of zero length is harmless)
+        for xa, ya, xb, yb in zip(x0, y0, x1, y1):
+            crosses = (ya > lat) != (yb > lat)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                inside ^= crosses & (lon < xa + (lat - ya) * (xb - xa) / (yb - ya))
+    return inside
+
+def sample_region(polygons, spacing_km=SAMPLE_SPACING_KM):
+    """Samples of a region on a regular latitude/longitude grid: longitudes, latitudes and the area (km²) each stands for.
+    A region smaller than one sample is represented by the mean of its outline's vertices."""
+    lons, lats, areas = [], [], []
+    for rings in polygons:
+        lon_min, lat_min = rings[0].min(axis=0)
+        lon_max, lat_max = rings[0].max(axis=0)
+        step_lat = np.degrees(spacing_km / EARTH_RADIUS_KM)
+        step_lon = step_lat / max(np.cos(np.radians((lat_min + lat_max) / 2)), 1e-6)
+        lon, lat = np.meshgrid(np.arange(lon_min + step_lon / 2, lon_max, step_lon), np.arange(lat_min + step_lat / 2, lat_max, step_lat))
+        lon, lat = lon.ravel(), lat.ravel()
+        keep = inside_polygon(lon, lat, rings)
+        if not keep.any():
+            (lon, lat), keep = rings[0].mean(axis=0, keepdims=True).T, np.array([True])
+        lons.append(lon[keep])
+        lats.append(lat[keep])
+        areas.append(EARTH_RADIUS_KM ** 2 * np.radians(step_lat) * np.radians(step_lon) * np.cos(np.radians(lat[keep])))
+    return np.concatenate(lons), np.concatenate(lats), np.concatenate(areas)
+
+
+# 3) Area weights and regional series
+def area_weights(index: SiteIndex, regions: dict, spacing_km=SAMPLE_SPACING_KM):
+    """Sparse (region x site) matrix of the share of each region's area closest to each site (rows sum to 1), and the region names."""
+    rows, cols, areas = [], [], []
+    for row, polygons in enumerate(regions.values()):
+        lon, lat, area = sample_region(polygons, spacing_km)
+        position, _ = index.query(lat, lon)
+        rows.append(np.full(len(position), row))
+        cols.append(position)
+        areas.append(area)
+    weights = sparse.csr_matrix((np.concatenate(areas), (np.concatenate(rows), np.concatenate(cols))), shape=(len(regions), len(index.sites)))
+    weights.sum_duplicates()
+    totals = np.asarray(weights.sum(axis=1)).ravel()
+    return sparse.diags(1 / totals) @ weights, list(regions)
+
+def regional_series(weights, values) -> np.ndarray:
+    """Area-weighted means of a (site x hour [x source]) array for every region at once: (region x hour [x source]), one sparse matrix product."""
+    return (weights @ values.reshape(values.shape[0], -1)).reshape((weights.shape[0],) + values.shape[1:])
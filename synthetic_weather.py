@@ -0,0 +1,183 @@
+# Synthetic weather data generator, so that scaling work, benchmarks and load tests can run offline on more than the 8,784 hours of Sion data.
+#
+# It produces N years x M sites of hourly data in the raw schema fetched by the data sourcing notebook (HOURLY_VARS, "time" index), or directly in the enriched schema of the app.
+# The series are not meant to be realistic forecasts, but to behave like the real data where it matters for performance and for the app's charts:
+#   - seasonal and diurnal cycles of temperature, humidity and radiation, with a temperature lapse rate for high-altitude sites
+#   - persistent (autocorrelated) cloud cover, radiation reduced by clouds, humidity increasing with clouds and rain
+#   - intermittent precipitation (about 1 hour in 6), falling as snow below ~1.5 °C, with precipitation = rain + snowfall / 0.7 as in Open-Meteo
+#   - values always within app_utils.BOUNDS
+#
+# Usage:
+#   python synthetic_weather.py weather_sites --sites 100 --years 10 --workers 8           -> partitioned raw data set: weather_sites/site=<id>/year=<yyyy>/part-0.parquet
+#   python synthetic_weather.py weather_sites --sites 100 --years 10 --enriched            -> same layout, enriched schema
+# A _sites.json file (ignored by parquet readers, like any file starting with "_") describing every site (id, latitude, longitude, elevation) is written next to the partitions.
+
+# Load libraries
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy.signal import lfilter
+
+from app_utils import BOUNDS
+from enrichment import HOURLY_VARS, enrich
+
+# Sion, as in the notebook, is always the first site; the other sites are drawn in a box around the canton of Valais
+SION = {"site": "sion", "latitude": 46.2331, "longitude": 7.3606, "elevation": 482.0}
+VALAIS_BOX = {"latitude": (45.90, 46.55), "longitude": (6.80, 8.40), "elevation": (400.0, 2800.0)}
+UTC_OFFSET = 1 # hours; Europe/Zurich standard time, only used to place solar noon
+
+# 1) Sites
+def make_sites(n_sites: int, seed: int = 0) -> pd.DataFrame:
+    """Sion plus n_sites - 1 random sites in the Valais box (same sites for the same seed)."""
+    rng = np.random.default_rng([seed, 0])
+    others = pd.DataFrame({
+        "site": [f"site_{i:03d}" for i in range(1, n_sites)],
+        **{col: rng.uniform(lo, hi, n_sites - 1).round(4) for col, (lo, hi) in VALAIS_BOX.items()},
+    })
+    return pd.concat([pd.DataFrame([SION]), others], ignore_index=True).head(n_sites)
+
+
+# 2) Building blocks, all vectorised over a (site x hour) array
+
+# AR(1) processes with unit variance, one per row: persistent noise such as weather systems lasting several days. lfilter runs the recursion x[t] = phi * x[t-1] + e[t] in C.
+def _ar1(rng, shape, phi):
+    noise = rng.standard_normal(shape) * np.sqrt(1 - phi ** 2)
+    return lfilter([1.0], [1.0, -phi], noise, axis=-1)
+
+# Cosine of the solar zenith angle, from the day of year, the hour of the day and the site position (simple declination / hour angle formulas)
+def _cos_zenith(time: pd.DatetimeIndex, latitude, longitude):
+    doy = time.dayofyear.to_numpy()
+    solar_hour = time.hour.to_numpy() - 0.5 - UTC_OFFSET + longitude[:, None] / 15 # middle of the preceding hour, in local solar time
+    declination = np.radians(23.45) * np.sin(2 * np.pi * (284 + doy) / 365)
+    hour_angle = np.radians(15 * (solar_hour - 12))
+    lat = np.radians(latitude)[:, None]
+    return np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+
+
+def generate_arrays(sites: pd.DataFrame, time: pd.DatetimeIndex, seed: int = 0) -> dict:
+    """Hourly arrays (site x hour) of every raw variable, for the given sites and timestamps."""
+    n_sites, n_hours = len(sites), len(time)
+    latitude, longitude = sites["latitude"].to_numpy(float), sites["longitude"].to_numpy(float)
+    elevation = sites["elevation"].to_numpy(float)[:, None]
+    # One random stream per site, so a site's data does not depend on which other sites are generated with it
+    rngs = [np.random.default_rng([seed, 1, int(i)]) for i in sites.index]
+    def noise(phi):
+        return np.vstack([_ar1(rng, n_hours, phi) for rng in rngs])
+
+    doy = time.dayofyear.to_numpy()
+    hour = time.hour.to_numpy()
+    season_cycle = -np.cos(2 * np.pi * (doy - 20) / 365.25) # -1 in mid-January, +1 in mid-July
+    diurnal_cycle = np.cos(2 * np.pi * (hour - 15) / 24)    # +1 mid-afternoon, -1 early morning
+
+    # Cloud cover: persistent latent process, a bit cloudier in winter; saturates at 0 and 100 % as the real data does
+    cloud_latent = noise(0.97) - 0.15 * season_cycle
+    cloudcover = np.clip(55 + 75 * cloud_latent, 0, 100).round()
+
+    # Radiation: clear-sky irradiance (Haurwitz model), reduced by clouds (Kasten-Czeplak)
+    cos_zenith = np.clip(_cos_zenith(time, latitude, longitude), 0, None)
+    with np.errstate(divide="ignore", over="ignore"):
+        clear_sky = np.where(cos_zenith > 0, 1098 * cos_zenith * np.exp(-0.057 / cos_zenith), 0.0)
+    shortwave_radiation = (clear_sky * (1 - 0.75 * (cloudcover / 100) ** 3.4)).round()
+
+    # Precipitation: intermittent, only when the cloud process is high; heavier with more clouds
+    wet = (cloud_latent + 0.6 * noise(0.8)) > 1.15
+    intensity = np.vstack([rng.gamma(0.7, 0.5, n_hours) for rng in rngs]) * (1 + np.clip(cloud_latent, 0, None))
+    precipitation = np.where(wet, intensity, 0.0)
+
+    # Temperature: annual mean decreasing with altitude (6.5 °C/km), seasonal cycle, diurnal cycle damped by clouds, synoptic anomalies, and cooling when it rains
+    temperature = (
+        11.0 - 0.0065 * (elevation - 482)
+        + 10.5 * season_cycle
+        + 4.5 * diurnal_cycle * (1 - 0.6 * cloudcover / 100)
+        + 3.0 * noise(0.995)
+        - 1.5 * wet
+    )
+    temperature = np.clip(temperature, *BOUNDS["temperature_2m"]).round(1)
+
+    # Rain or snow depending on temperature (mixed between 0 and 3 °C); snowfall in cm, 1 mm of water = 0.7 cm of snow
+    snow_fraction = np.clip((1.5 - temperature) / 3, 0, 1)
+    rain = np.clip(precipitation * (1 - snow_fraction), *BOUNDS["rain"]).round(1)
+    snowfall = np.clip(precipitation * snow_fraction * 0.7, *BOUNDS["snowfall"]).round(2)
+    precipitation = (rain + snowfall / 0.7).round(1)
+
+    # Humidity: highest at dawn, higher with clouds and rain, lower when warmer than usual for the season
+    humidity = 72 - 14 * diurnal_cycle + 18 * (cloudcover / 100 - 0.6) + 12 * wet + 6 * noise(0.98)
+    relative_humidity = np.clip(humidity, 15, 100).round()
+
+    # Wind: log-normal and persistent, windier at altitude and with passing weather systems, slightly windier in the afternoon
+    windspeed = np.exp(np.log(3.7) + 0.4 * noise(0.97) + 0.15 * cloud_latent + 0.25 * (elevation - 482) / 1000) * (1 + 0.08 * diurnal_cycle)
+    windspeed = np.clip(windspeed, *BOUNDS["windspeed_10m"]).round(1)
+
+    return {
+        "temperature_2m": temperature,
+        "relative_humidity_2m": relative_humidity.astype(np.int64),
+        "rain": rain,
+        "snowfall": snowfall,
+        "precipitation": precipitation,
+        "cloudcover": cloudcover.astype(np.int64),
+        "shortwave_radiation": shortwave_radiation,
+        "windspeed_10m": windspeed,
+    }
+
+
+# 3) Data frames in the schema of the app
+
+def hourly_index(start="2024-03-20", n_years=1) -> pd.DatetimeIndex:
+    start = pd.Timestamp(start)
+    return pd.date_range(start, start + pd.DateOffset(years=n_years), freq="h", inclusive="left", name="time")
+
+
+def generate_weather(sites: pd.DataFrame, start="2024-03-20", n_years=1, seed=0, enriched=False) -> dict:
+    """One data frame per site id, in the raw schema of the notebook (or the enriched schema of the app if enriched=True)."""
+    time = hourly_index(start, n_years)
+    arrays = generate_arrays(sites, time, seed)
+    frames = {}
+    for i, site in enumerate(sites["site"]):
+        df = pd.DataFrame({col: arrays[col][i] for col in HOURLY_VARS}, index=time)
+        frames[site] = enrich(df) if enriched else df
+    return frames
+
+
+# 4) Partitioned data sets on disk (site=<id>/year=<yyyy>/part-0.parquet), generated in parallel by chunks of sites
+
+def _write_chunk(sites, out_dir, start, n_years, seed, enriched):
+    for site, df in generate_weather(sites, start, n_years, seed, enriched).items():
+        for year, df_year in df.groupby(df.index.year):
+            folder = Path(out_dir) / f"site={site}" / f"year={year}"
+            folder.mkdir(parents=True, exist_ok=True)
+            pq.write_table(pa.Table.from_pandas(df_year, preserve_index=True), folder / "part-0.parquet")
+    return len(sites)
+
+
+def write_dataset(out_dir, n_sites, n_years, start="2024-03-20", seed=0, enriched=False, workers=None, sites_per_chunk=10) -> pd.DataFrame:
+    """Generate and write the whole data set; returns the table of sites (also saved as _sites.json)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    sites = make_sites(n_sites, seed)
+    sites.to_json(out_dir / "_sites.json", orient="records", indent=2)
+
+    chunks = [sites.iloc[i:i + sites_per_chunk] for i in range(0, n_sites, sites_per_chunk)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        list(pool.map(_write_chunk, chunks, *[[arg] * len(chunks) for arg in (out_dir, start, n_years, seed, enriched)]))
+    return sites
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a partitioned synthetic hourly weather data set (site x year).")
+    parser.add_argument("out_dir")
+    parser.add_argument("--sites", type=int, default=10)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--start", default="2024-03-20")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--enriched", action="store_true", help="write the enriched schema of the app instead of the raw API schema")
+    parser.add_argument("--workers", type=int, help="number of processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    sites = write_dataset(args.out_dir, args.sites, args.years, args.start, args.seed, args.enriched, args.workers)
+    print(f"Wrote {len(sites)} sites x {args.years} years of hourly data to {args.out_dir}")
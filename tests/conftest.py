@@ -0,0 +1,31 @@
+# Shared fixtures of the test suite: the shipped one-year Sion file (the notebook's enriched data) and a small random frame with gaps.
+
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Importing app_utils outside of `streamlit run` logs a "missing ScriptRunContext" warning for every cached call
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+from app_utils import load_local_data
+
+
+@pytest.fixture(scope="session")
+def sion_df():
+    return load_local_data()
+
+
+# Three weeks of four columns on very different scales, the last one constant, with scattered missing values and a few longer gaps
+@pytest.fixture(scope="session")
+def gappy_df():
+    rng = np.random.default_rng(0)
+    n = 500
+    values = rng.normal(size=(n, 4)) * [1, 10, 100, 1] + [0, 50, 1000, 3]
+    values[:, 3] = 3.0
+    df = pd.DataFrame(values, index=pd.date_range("2024-01-01", periods=n, freq="h"), columns=list("abcd"))
+    df = df.mask(rng.random(df.shape) < 0.1)
+    df.iloc[100:160, 0] = np.nan
+    df.iloc[300:303, :] = np.nan
+    return df
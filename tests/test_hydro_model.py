@@ -0,0 +1,57 @@
+# hydro_model against the hour-by-hour recursions it replaces (snow store and linear reservoir), on the data file and on several sites at once.
+
+import numpy as np
+
+from hydro_model import snowmelt, linear_reservoir, runoff, add_hydro_runoff, DEGREE_DAY_FACTOR, T_MELT, RESERVOIR_HOURS, SNOW_CM_PER_MM
+
+
+def snowmelt_loop(temperature, snowfall, ddf=DEGREE_DAY_FACTOR, t_melt=T_MELT):
+    store, melt, stores = 0.0, [], []
+    for t, s in zip(temperature, snowfall):
+        available = store + s / SNOW_CM_PER_MM
+        m = min(available, ddf * max(t - t_melt, 0))
+        store = available - m
+        melt.append(m)
+        stores.append(store)
+    return np.array(melt), np.array(stores)
+
+def reservoir_loop(inflow, residence_hours=RESERVOIR_HOURS):
+    c = np.exp(-1 / residence_hours)
+    q, out = np.mean(inflow), []
+    for x in inflow:
+        q = c * q + (1 - c) * x
+        out.append(q)
+    return np.array(out)
+
+
+def test_snowmelt(sion_df):
+    temperature, snowfall = sion_df["temperature_2m"].to_numpy(), sion_df["snowfall"].to_numpy()
+    melt, store = snowmelt(temperature, snowfall)
+    expected_melt, expected_store = snowmelt_loop(temperature, snowfall)
+    np.testing.assert_allclose(store, expected_store, atol=1e-9)
+    np.testing.assert_allclose(melt, expected_melt, atol=1e-9)
+    assert store.max() > 0 # the test year has snow to melt
+
+def test_linear_reservoir(sion_df):
+    rain = sion_df["rain"].to_numpy()
+    np.testing.assert_allclose(linear_reservoir(rain), reservoir_loop(rain), rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(linear_reservoir(rain, 24), reservoir_loop(rain, 24), rtol=1e-9, atol=1e-12)
+
+# Several sites in one (site x hour) call give the same series as one call per site, along either axis
+def test_sites_at_once():
+    rng = np.random.default_rng(0)
+    temperature = rng.normal(2, 6, (3, 2000))
+    rain = rng.exponential(0.2, (3, 2000)) * (rng.random((3, 2000)) < 0.2)
+    snowfall = rng.exponential(0.5, (3, 2000)) * (temperature < 0)
+    batched = runoff(temperature, rain, snowfall)
+    for site in range(3):
+        np.testing.assert_allclose(batched[site], runoff(temperature[site], rain[site], snowfall[site]), rtol=1e-12)
+        melt, _ = snowmelt_loop(temperature[site], snowfall[site])
+        np.testing.assert_allclose(batched[site], reservoir_loop(rain[site] + melt), rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(runoff(temperature.T, rain.T, snowfall.T, axis=0), batched.T, rtol=1e-12)
+
+def test_hydro_runoff_columns(sion_df):
+    df = add_hydro_runoff(sion_df[["temperature_2m", "rain", "snowfall"]].copy())
+    np.testing.assert_allclose(df["hydro_runoff"], sion_df["hydro_runoff"], rtol=1e-12)
+    expected_month = df["hydro_runoff"].groupby(df.index.to_period("M")).transform("mean")
+    np.testing.assert_allclose(df["hydro_runoff_month_avg"], expected_month, rtol=1e-10)
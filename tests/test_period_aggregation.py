@@ -0,0 +1,60 @@
+# period_aggregation against pandas groupby on the same periods (calendar keys built from the index and the season column), for every resolution
+# and statistic, on time-sorted and shuffled rows.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from period_aggregation import aggregate, transform, period_code, RESOLUTIONS, STATS, SEASON_CODES
+
+COLS = ["temperature_2m", "rain", "snowfall", "windspeed_10m"]
+
+
+def groupby_keys(df, resolution):
+    index = df.index
+    if resolution == "day":
+        return index.floor("D").rename("day")
+    if resolution == "week":
+        return index.to_period("W-SUN").start_time.rename("week") # weeks starting on Monday
+    if resolution == "month":
+        return index.to_period("M").start_time.rename("month")
+    if resolution == "season":
+        return pd.CategoricalIndex(df["season"].astype(str), categories=SEASON_CODES, name="season")
+    if resolution == "season_year":
+        winter_tail = (df["season"].astype(str) == "Winter").to_numpy() & (index.month <= 6)
+        year = index.year - winter_tail
+        return pd.Index([f"{s} {y}/{(y + 1) % 100:02d}" if s == "Winter" else f"{s} {y}" for s, y in zip(df["season"].astype(str), year)], name="season_year")
+    return index.year.rename("year")
+
+
+@pytest.mark.parametrize("resolution", RESOLUTIONS)
+def test_aggregate_matches_groupby(sion_df, resolution):
+    df = sion_df[COLS + ["season"]]
+    result = aggregate(df, COLS, resolution)
+    grouped = df[COLS].groupby(groupby_keys(df, resolution), observed=True)
+    for stat in STATS:
+        expected = grouped.agg(stat).astype(np.float64)
+        expected = expected.loc[[str(k) if resolution == "season_year" else k for k in result[stat].index]] # same periods, in the order of the codes
+        assert len(expected) == len(result[stat]) == grouped.ngroups
+        np.testing.assert_allclose(result[stat].to_numpy(), expected.to_numpy(), rtol=1e-10, atol=1e-9)
+
+
+@pytest.mark.parametrize("resolution", ["day", "month", "season"])
+def test_shuffled_rows(sion_df, resolution):
+    df = sion_df[COLS + ["season"]]
+    shuffled = df.sample(frac=1, random_state=0)
+    for stat in STATS:
+        np.testing.assert_allclose(aggregate(shuffled, COLS, resolution)[stat], aggregate(df, COLS, resolution)[stat], rtol=1e-10)
+
+
+@pytest.mark.parametrize("resolution", ["week", "season"])
+def test_transform_matches_groupby(sion_df, resolution):
+    df = sion_df[COLS + ["season"]]
+    expected = df[COLS].groupby(groupby_keys(df, resolution).to_numpy(), observed=True).transform("mean")
+    np.testing.assert_allclose(transform(df, COLS, resolution), expected, rtol=1e-10)
+
+
+# The codes stored when the data is loaded are the ones computed on the fly
+@pytest.mark.parametrize("resolution", RESOLUTIONS)
+def test_stored_codes(sion_df, resolution):
+    np.testing.assert_array_equal(sion_df[f"period_{resolution}"], period_code(sion_df[["season"]], resolution))
@@ -0,0 +1,66 @@
+# portfolio against brute force: the simplex grid against every combination of shares, the Gram-matrix residual variance and the unmet hours against
+# direct evaluation of each mix, the LP against the grid; and the cases with one or no producing source.
+
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio import (
+    simplex_grid, scaled_potentials, gram_matrices, residual_variance, unmet_hours, min_unmet_energy, demand_profile, optimise, OBJECTIVES,
+)
+
+COLS = ["solar_potential", "wind_potential", "hydro_potential"]
+LABELS = {"solar_potential": "Solar", "wind_potential": "Wind", "hydro_potential": "Hydro"}
+
+
+@pytest.mark.parametrize("n_sources, step", [(1, 0.05), (2, 0.05), (3, 0.1), (3, 0.05), (4, 0.25)])
+def test_simplex_grid(n_sources, step):
+    n = round(1 / step)
+    expected = sorted(c for c in product(range(n + 1), repeat=n_sources) if sum(c) == n)
+    grid = simplex_grid(n_sources, step)
+    assert sorted(map(tuple, np.rint(grid * n).astype(int))) == expected
+    np.testing.assert_allclose(grid.sum(axis=1), 1)
+
+def test_simplex_grid_single_source():
+    np.testing.assert_array_equal(simplex_grid(1), np.ones((1, 1)))
+
+def test_objectives_against_direct_evaluation(sion_df):
+    df = sion_df.loc["2024-06", COLS]
+    X = scaled_potentials(df, COLS).to_numpy()
+    demand = demand_profile(df.index)
+    W = simplex_grid(3, 0.1)
+    production = X @ W.T
+    np.testing.assert_allclose(residual_variance(W, gram_matrices(X, demand)), (demand[:, None] - production).var(axis=0), rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(unmet_hours(W, X, demand), [(production[:, m] < demand).sum() for m in range(len(W))])
+
+# The LP optimum is at least as good as every mix of the grid, and its shares are a mix
+def test_min_unmet_energy(sion_df):
+    df = sion_df.loc["2024-06", COLS]
+    X = scaled_potentials(df, COLS).to_numpy()
+    demand = demand_profile(df.index)
+    w, shortfall = min_unmet_energy(X, demand)
+    assert w.min() >= -1e-9 and abs(w.sum() - 1) < 1e-9
+    np.testing.assert_allclose(np.clip(demand - X @ w, 0, None).sum(), shortfall, rtol=1e-6)
+    assert shortfall <= np.clip(demand[:, None] - X @ simplex_grid(3).T, 0, None).sum(axis=0).min() + 1e-6
+
+@pytest.mark.parametrize("objective", OBJECTIVES[:2])
+def test_optimise_grid_search(sion_df, objective):
+    df = sion_df.loc["2024-06", COLS]
+    table = optimise(df, COLS, LABELS, objective=objective)
+    scores = table["Residual std"] if objective == "Residual variance" else table["Share of unmet hours"]
+    assert list(table.columns[:3]) == ["Solar", "Wind", "Hydro"]
+    assert scores["Optimal mix"] <= scores.min() + 1e-12 # no better than the single-source and equal mixes
+
+# Sources that never produce over the period are dropped; with none left there is nothing to mix
+def test_optimise_one_or_no_producer(sion_df):
+    df = sion_df.loc["2024-06", COLS].copy()
+    df["wind_potential"] = df["hydro_potential"] = 0.0
+    for objective in OBJECTIVES:
+        table = optimise(df, COLS, LABELS, objective=objective)
+        assert list(table.columns[:1]) == ["Solar"] and "Wind" not in table.columns
+        np.testing.assert_allclose(table.loc["Optimal mix", "Solar"], 1)
+    df["solar_potential"] = 0.0
+    assert all(optimise(df, COLS, LABELS, objective=objective) is None for objective in OBJECTIVES)
+    assert optimise(pd.DataFrame(columns=COLS, index=pd.DatetimeIndex([]), dtype=float), COLS, LABELS) is None
@@ -0,0 +1,70 @@
+# prefix_stats against pandas: IntervalStats against app_utils.compute_summary_stats and DataFrame.corr on random intervals, with and without
+# missing values, and on empty intervals; rolling_corr against rolling().corr().
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app_utils import compute_summary_stats, build_smoothed_var_names, VARS_MAP
+from prefix_stats import IntervalStats, rolling_corr
+
+INTERVALS = [(0, 500), (10, 50), (90, 170), (120, 150), (299, 304), (300, 303), (5, 7), (5, 6), (250, 499)]
+
+
+def assert_close(result, expected):
+    result, expected = np.asarray(result, dtype=np.float64), np.asarray(expected, dtype=np.float64)
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(expected)) # same missing statistics as pandas
+    np.testing.assert_allclose(result[~np.isnan(expected)], expected[~np.isnan(expected)], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("a, b", INTERVALS)
+def test_interval_stats_with_gaps(gappy_df, a, b):
+    stats = IntervalStats(gappy_df, gappy_df.columns)
+    period = gappy_df.iloc[a:b]
+    assert_close(stats.summary(a, b), compute_summary_stats(period, list(gappy_df.columns)))
+    assert_close(stats.corr(a, b), period.corr())
+    assert_close(stats.cov(a, b), period.cov())
+    assert_close(stats.count(a, b), period.count())
+
+
+def test_interval_stats_random_ranges(sion_df):
+    cols = build_smoothed_var_names(list(VARS_MAP), "Weekly MA")
+    stats = IntervalStats(sion_df, cols)
+    rng = np.random.default_rng(1)
+    for a, b in np.sort(rng.integers(0, len(sion_df), size=(20, 2)), axis=1):
+        if b - a < 2:
+            continue
+        period = sion_df.iloc[a:b]
+        assert_close(stats.summary(a, b), compute_summary_stats(period, cols))
+        assert_close(stats.corr(a, b), period[cols].corr())
+
+
+def test_interval_rows(sion_df):
+    stats = IntervalStats(sion_df, ["temperature_2m"])
+    a, b = stats.rows("2024-05-01", "2024-06-01")
+    assert (b - a) == 31 * 24 and sion_df.index[a] == pd.Timestamp("2024-05-01")
+
+
+# A range inside one hour, or outside the data, has no rows: every statistic is NaN
+@pytest.mark.parametrize("start, end", [("2024-05-01 10:10", "2024-05-01 10:40"), ("2030-01-01", "2030-02-01")])
+def test_empty_interval(sion_df, start, end):
+    stats = IntervalStats(sion_df, ["temperature_2m", "relative_humidity_2m"])
+    a, b = stats.rows(start, end)
+    assert a == b
+    assert stats.summary(a, b).isna().all().all()
+    assert np.isnan(stats.corr(a, b)).all()
+    assert np.isnan(stats.min(a, b)).all() and np.isnan(stats.max(a, b)).all()
+
+
+# Rolling correlations against pandas' rolling().corr(), pair by pair, on the windows where both series vary (the others are NaN)
+@pytest.mark.parametrize("window", [24, 168])
+def test_rolling_corr(sion_df, window):
+    cols = ["solar_potential", "wind_potential", "hydro_potential", "snowfall"]
+    df = sion_df[cols].iloc[:2000]
+    result = rolling_corr(df, window)
+    varies = df.rolling(window).std() > 1e-3 * df.std()
+    for a, b in [("solar_potential", "wind_potential"), ("wind_potential", "hydro_potential"), ("solar_potential", "snowfall")]:
+        both = (varies[a] & varies[b]).to_numpy()
+        expected = df[a].rolling(window).corr(df[b]).to_numpy()
+        np.testing.assert_allclose(result[f"{a} / {b}"].to_numpy()[both], expected[both], atol=1e-6)
+        assert result[f"{a} / {b}"].iloc[:window - 1].isna().all()
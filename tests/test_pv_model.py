@@ -0,0 +1,82 @@
+# pv_model against scalar textbook formulas, hour by hour: solar zenith and azimuth, incidence angle on a tilted plane, Erbs decomposition and
+# isotropic transposition; and the pv_cf column of the data file against a sweep of its panel.
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from pv_model import (
+    geometry_for, solar_geometry, decompose, poa_irradiance, sweep, PANELS, DEFAULT_PANEL, LATITUDE, LONGITUDE, DATA_FILE_UTC_OFFSET,
+    ALBEDO, MIN_COS_ZENITH,
+)
+
+HOURS = pd.date_range("2023-12-30", "2024-01-02 23:00", freq="h").append(pd.date_range("2024-06-20", "2024-06-21 23:00", freq="h"))
+
+
+def sun_angles(time, latitude, longitude, utc_offset):
+    """Zenith and azimuth (clockwise from north), radians, at the middle of the hour ending at `time`."""
+    b = 2 * math.pi * (time.dayofyear - 1) / 365
+    declination = (0.006918 - 0.399912 * math.cos(b) + 0.070257 * math.sin(b) - 0.006758 * math.cos(2 * b)
+                   + 0.000907 * math.sin(2 * b) - 0.002697 * math.cos(3 * b) + 0.00148 * math.sin(3 * b))
+    equation_of_time = 229.18 * (0.000075 + 0.001868 * math.cos(b) - 0.032077 * math.sin(b) - 0.014615 * math.cos(2 * b) - 0.040849 * math.sin(2 * b))
+    hour_angle = math.radians(15 * (time.hour - 0.5 - utc_offset + longitude / 15 + equation_of_time / 60 - 12))
+    lat = math.radians(latitude)
+    cos_zenith = math.sin(lat) * math.sin(declination) + math.cos(lat) * math.cos(declination) * math.cos(hour_angle)
+    zenith = math.acos(cos_zenith)
+    azimuth = math.atan2(-math.cos(declination) * math.sin(hour_angle),
+                         (math.sin(declination) - cos_zenith * math.sin(lat)) / math.cos(lat)) % (2 * math.pi)
+    return zenith, azimuth
+
+def erbs(ghi, cos_zenith, extraterrestrial):
+    if cos_zenith <= MIN_COS_ZENITH:
+        return 0.0, ghi
+    kt = min(max(ghi / (extraterrestrial * cos_zenith), 0), 1)
+    if kt <= 0.22:
+        kd = 1 - 0.09 * kt
+    elif kt <= 0.8:
+        kd = 0.9511 - 0.1604 * kt + 4.388 * kt**2 - 16.638 * kt**3 + 12.336 * kt**4
+    else:
+        kd = 0.165
+    return (ghi - kd * ghi) / cos_zenith, kd * ghi
+
+
+def test_sun_vectors():
+    sun, _ = geometry_for(HOURS, LATITUDE, LONGITUDE)
+    for k, time in enumerate(HOURS):
+        zenith, azimuth = sun_angles(time, LATITUDE, LONGITUDE, 1)
+        np.testing.assert_allclose(sun[k], [math.sin(zenith) * math.sin(azimuth), math.sin(zenith) * math.cos(azimuth), math.cos(zenith)], atol=1e-12)
+
+# Hours spanning a new year are taken from the tables of both years
+def test_geometry_across_years():
+    sun, extraterrestrial = geometry_for(HOURS, LATITUDE, LONGITUDE)
+    for year in (2023, 2024):
+        table = solar_geometry(LATITUDE, LONGITUDE, year, 1.0)
+        rows = HOURS.year == year
+        hours = ((HOURS[rows] - pd.Timestamp(f"{year}-01-01")) // pd.Timedelta(hours=1)).to_numpy()
+        np.testing.assert_array_equal(sun[rows], table["sun"][hours])
+        np.testing.assert_array_equal(extraterrestrial[rows], table["extraterrestrial"][hours])
+
+def test_decompose_and_transposition():
+    rng = np.random.default_rng(2)
+    sun, extraterrestrial = geometry_for(HOURS, LATITUDE, LONGITUDE)
+    ghi = np.clip(sun[:, 2], 0, None) * rng.uniform(0, 1100, len(HOURS))
+    configs = list(PANELS.values())
+    dni, dhi = decompose(ghi, sun[:, 2], extraterrestrial)
+    poa = poa_irradiance(ghi, sun, extraterrestrial, configs)
+    for k, time in enumerate(HOURS):
+        zenith, azimuth = sun_angles(time, LATITUDE, LONGITUDE, 1)
+        expected_dni, expected_dhi = erbs(ghi[k], math.cos(zenith), extraterrestrial[k])
+        np.testing.assert_allclose([dni[k], dhi[k]], [expected_dni, expected_dhi], rtol=1e-9, atol=1e-9)
+        for c, (tilt, panel_azimuth) in enumerate(configs):
+            tilt, panel_azimuth = math.radians(tilt), math.radians(panel_azimuth)
+            cos_incidence = math.cos(zenith) * math.cos(tilt) + math.sin(zenith) * math.sin(tilt) * math.cos(azimuth - panel_azimuth)
+            expected = (max(cos_incidence, 0) * expected_dni + (1 + math.cos(tilt)) / 2 * expected_dhi
+                        + (1 - math.cos(tilt)) / 2 * ALBEDO * ghi[k])
+            np.testing.assert_allclose(poa[c, k], expected, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(poa[list(PANELS).index("Flat (0°)")], ghi, rtol=1e-9, atol=1e-9) # flat panels receive the horizontal irradiance
+
+def test_pv_cf_column(sion_df):
+    result = sweep(sion_df, [PANELS[DEFAULT_PANEL]], utc_offset=DATA_FILE_UTC_OFFSET)[0]
+    np.testing.assert_allclose(result, sion_df["pv_cf"], rtol=1e-12)
+    assert result.max() > 0.5 and (result[sion_df["shortwave_radiation"].to_numpy() == 0] == 0).all()
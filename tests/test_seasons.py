@@ -0,0 +1,57 @@
+# seasons.py against its references: the notebook's season column of the data file, the months of the meteorological seasons,
+# and per-year cut dates over several years (leap and common).
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from seasons import season_labels, season_codes, season_year_codes, season_year_names, leap_day_of_year, SEASON_NAMES
+
+HOURS = pd.date_range("2019-01-01", "2026-12-31 23:00", freq="h")
+
+
+# Same labels as the notebook, except on the last day of the file (20 March 2025): the notebook closes its last bin at the end of the data,
+# which folds that day into Winter, where the 20 March cut starts Spring again
+def test_notebook_season_column(sion_df):
+    labels = np.asarray(season_labels(sion_df.index))
+    notebook = sion_df["season"].astype(str).to_numpy()
+    last_day = sion_df.index >= "2025-03-20"
+    np.testing.assert_array_equal(labels[~last_day], notebook[~last_day])
+    assert (notebook[last_day] == "Winter").all() and (labels[last_day] == "Spring").all()
+    assert list(season_labels(sion_df.index[:1]).categories) == list(sion_df["season"].cat.categories)
+
+
+def test_meteorological_months():
+    codes, _ = season_codes(HOURS, "Meteorological (1st of Mar, Jun, Sep, Dec)")
+    np.testing.assert_array_equal(codes, (HOURS.month.to_numpy() % 12) // 3)
+
+
+# Reference: the season of each hour from explicit cut dates, year by year (Winter before the first cut belongs to the previous season-year)
+@pytest.mark.parametrize("scheme, days", [
+    ("Notebook (20th of Mar, Jun, Sep, Dec)", ["03-20", "06-20", "09-20", "12-20"]),
+    ("Astronomical (equinoxes and solstices)", ["03-20", "06-21", "09-22", "12-21"]),
+])
+def test_cut_dates(scheme, days):
+    names, years = [], []
+    for year in sorted(set(HOURS.year)):
+        hours = HOURS[HOURS.year == year]
+        cuts = pd.DatetimeIndex([f"{year}-{day}" for day in days])
+        position = np.searchsorted(cuts, hours, side="right")
+        names += [SEASON_NAMES[p % 4] for p in position]
+        years += list(year - (position == 0))
+    codes, season_year = season_codes(HOURS, scheme)
+    assert list(np.array(SEASON_NAMES)[codes]) == names
+    np.testing.assert_array_equal(season_year, years)
+
+
+def test_leap_day_of_year():
+    days = pd.DatetimeIndex(["2023-02-28", "2023-03-01", "2024-02-29", "2024-03-01", "2023-12-31", "2024-12-31"])
+    np.testing.assert_array_equal(leap_day_of_year(days), [58, 60, 59, 60, 365, 365])
+
+
+def test_season_year_codes():
+    codes = season_year_codes(HOURS)
+    assert (np.diff(codes) >= 0).all() # increasing in time
+    assert len(np.unique(codes)) == (np.diff(codes) > 0).sum() + 1 # each season-year is one contiguous block
+    stamps = pd.DatetimeIndex(["2024-01-15", "2024-04-01", "2024-12-25", "2025-02-01"])
+    assert season_year_names(season_year_codes(stamps)) == ["Winter 2023/24", "Spring 2024", "Winter 2024/25", "Winter 2024/25"]
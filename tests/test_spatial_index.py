@@ -0,0 +1,89 @@
+# spatial_index against brute force and closed forms: the KD-tree against haversine distances to every site, the point-in-polygon test against
+# rectangles with holes, sampled areas against the area of a latitude/longitude box on the sphere, and the area weights and regional series.
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from spatial_index import SiteIndex, inside_polygon, sample_region, area_weights, regional_series, read_regions, EARTH_RADIUS_KM
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def box(lon0, lat0, lon1, lat1):
+    return np.array([[lon0, lat0], [lon1, lat0], [lon1, lat1], [lon0, lat1], [lon0, lat0]])
+
+@pytest.fixture
+def sites():
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({"site": [f"site_{i:03d}" for i in range(60)], "latitude": rng.uniform(45.9, 46.6, 60), "longitude": rng.uniform(6.8, 8.4, 60)})
+
+
+@pytest.mark.parametrize("k", [1, 3])
+def test_query_matches_brute_force(sites, k):
+    rng = np.random.default_rng(4)
+    lat, lon = rng.uniform(45.5, 47, 200), rng.uniform(6.5, 8.8, 200)
+    position, distance = SiteIndex(sites).query(lat, lon, k=k)
+    all_distances = haversine_km(lat[:, None], lon[:, None], sites["latitude"].to_numpy()[None, :], sites["longitude"].to_numpy()[None, :])
+    expected = np.sort(all_distances, axis=1)[:, :k]
+    np.testing.assert_allclose(np.reshape(distance, expected.shape), expected, rtol=1e-9, atol=1e-6)
+    np.testing.assert_array_equal(np.reshape(position, expected.shape)[:, 0], all_distances.argmin(axis=1))
+
+def test_nearest(sites):
+    index = SiteIndex(sites)
+    nearest = index.nearest(sites["latitude"][7], sites["longitude"][7], k=2)
+    assert nearest["site"][0] == "site_007" and nearest["distance_km"][0] < 1e-6
+    assert len(index.nearest(46.2, 7.3, k=100)) == len(sites) # k is capped at the number of sites
+
+def test_inside_polygon_with_hole():
+    rings = [box(0, 0, 10, 10), box(4, 4, 6, 6)]
+    rng = np.random.default_rng(5)
+    lon, lat = rng.uniform(-2, 12, 5000), rng.uniform(-2, 12, 5000)
+    in_outline = (lon > 0) & (lon < 10) & (lat > 0) & (lat < 10)
+    in_hole = (lon > 4) & (lon < 6) & (lat > 4) & (lat < 6)
+    np.testing.assert_array_equal(inside_polygon(lon, lat, rings), in_outline & ~in_hole)
+    triangle = [np.array([[0.0, 0.0], [4.0, 0.0], [0.0, 4.0]])]
+    np.testing.assert_array_equal(inside_polygon(lon, lat, triangle), (lon > 0) & (lat > 0) & (lon + lat < 4))
+
+def test_sampled_area():
+    lon0, lat0, lon1, lat1 = 7.0, 46.0, 7.5, 46.3
+    _, _, area = sample_region([[box(lon0, lat0, lon1, lat1)]], spacing_km=0.5)
+    expected = EARTH_RADIUS_KM ** 2 * np.radians(lon1 - lon0) * (np.sin(np.radians(lat1)) - np.sin(np.radians(lat0)))
+    assert area.sum() == pytest.approx(expected, rel=0.02)
+    lon, lat, area = sample_region([[box(7.0, 46.0, 7.001, 46.001)]]) # smaller than one sample: one point at the middle of the outline
+    assert len(area) == 1 and lon[0] == pytest.approx(7.0004) and lat[0] == pytest.approx(46.0004)
+
+# Two sites on either side of a box split it in halves; a region far from both goes to the closer one; rows sum to 1
+def test_area_weights():
+    index = SiteIndex(pd.DataFrame({"site": ["west", "east"], "latitude": [46.0, 46.0], "longitude": [7.0, 8.0]}))
+    regions = {"middle": [[box(7.2, 45.9, 7.8, 46.1)]], "far east": [[box(9.0, 46.0, 9.2, 46.2)]], "west half": [[box(7.2, 45.9, 7.45, 46.1)]]}
+    weights, names = area_weights(index, regions, spacing_km=0.5)
+    assert names == list(regions)
+    dense = weights.toarray()
+    np.testing.assert_allclose(dense.sum(axis=1), 1)
+    np.testing.assert_allclose(dense[0], [0.5, 0.5], atol=0.02)
+    np.testing.assert_allclose(dense[1:], [[0, 1], [1, 0]])
+
+def test_regional_series():
+    rng = np.random.default_rng(6)
+    weights = np.array([[0.2, 0.8, 0.0], [0.0, 0.0, 1.0]])
+    values = rng.random((3, 50, 2))
+    np.testing.assert_allclose(regional_series(sparse.csr_matrix(weights), values), np.einsum("rs,shk->rhk", weights, values))
+
+def test_read_regions(tmp_path):
+    features = [
+        {"type": "Feature", "properties": {"name": "A"}, "geometry": {"type": "Polygon", "coordinates": [box(0, 0, 1, 1).tolist()]}},
+        {"type": "Feature", "properties": {"name": "A"}, "geometry": {"type": "MultiPolygon", "coordinates": [[box(2, 2, 3, 3).tolist()], [box(4, 4, 5, 5).tolist()]]}},
+        {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [box(0, 0, 1, 1).tolist(), box(0.2, 0.2, 0.4, 0.4).tolist()]}},
+    ]
+    path = tmp_path / "regions.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    regions = read_regions(path)
+    assert list(regions) == ["A", "Region 3"]
+    assert len(regions["A"]) == 3 and len(regions["Region 3"][0]) == 2 # a polygon per part, its rings (outline and hole)
@@ -0,0 +1,45 @@
+# wind_model against a direct evaluation: hub-height speed by the power or log law, then np.interp on the power curve of each turbine, hour by hour.
+
+import numpy as np
+import pytest
+
+from wind_model import capacity_factors, power_curve, add_wind_cf, TURBINES, DEFAULT_TURBINE, SPEED_GRID, KMH_PER_MS, SHEAR_EXPONENT, ROUGHNESS_LENGTH
+
+
+def reference(windspeed_10m, turbine, law):
+    hub = turbine["hub_height"]
+    factor = (hub / 10) ** SHEAR_EXPONENT if law == "power" else np.log(hub / ROUGHNESS_LENGTH) / np.log(10 / ROUGHNESS_LENGTH)
+    curve = power_curve(turbine["cut_in"], turbine["rated"], turbine["cut_out"])
+    return np.interp(np.asarray(windspeed_10m) / KMH_PER_MS * factor, SPEED_GRID, curve) # 0 beyond the grid, as the last point
+
+
+@pytest.mark.parametrize("law", ["power", "log"])
+def test_capacity_factors(sion_df, law):
+    speed = sion_df["windspeed_10m"].to_numpy()
+    result = capacity_factors(speed, law=law)
+    assert result.shape == (len(TURBINES), len(speed))
+    for k, turbine in enumerate(TURBINES.values()):
+        np.testing.assert_allclose(result[k], reference(speed, turbine, law), atol=1e-12)
+        assert 0 <= result[k].min() and result[k].max() <= 1
+
+# Site x hour input: one batched call equals one call per site; storms beyond the grid and negative speeds give 0
+def test_sites_and_extremes():
+    rng = np.random.default_rng(1)
+    speed = rng.gamma(2, 8, (4, 1000))
+    speed[0, :3] = [200.0, 0.0, -1.0]
+    result = capacity_factors(speed)
+    assert result.shape == (len(TURBINES), 4, 1000)
+    for site in range(4):
+        np.testing.assert_array_equal(result[:, site], capacity_factors(speed[site]))
+    assert (result[:, 0, :3] == 0).all()
+
+def test_power_curve():
+    curve = power_curve(3.0, 12.0, 25.0)
+    at = lambda v: curve[int(round(v / (SPEED_GRID[1] - SPEED_GRID[0])))]
+    assert at(2.9) == 0 and at(3.0) == 0 and at(12.0) == 1 and at(24.9) == 1 and at(25.0) == 0
+    np.testing.assert_allclose(at(8.0), (8**3 - 27) / (12**3 - 27))
+
+def test_wind_cf_column(sion_df):
+    df = add_wind_cf(sion_df[["windspeed_10m"]].copy())
+    np.testing.assert_allclose(df["wind_cf"], reference(sion_df["windspeed_10m"], TURBINES[DEFAULT_TURBINE], "power"), atol=1e-12)
+    np.testing.assert_allclose(df["wind_cf"], sion_df["wind_cf"], rtol=1e-12)
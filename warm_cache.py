@@ -0,0 +1,157 @@
+# Cache warm-up: after a deploy or a restart, the first visitors would otherwise pay for every cold computation (loading and validating the data file,
+# then each section of the Weather Explorer). The warm-up loads the data (which also builds the Arrow cache, see app_utils.load_local_data) and computes
+# the explorer's sections for the most common widget states: the page defaults, for every month, every season and the full year at each smoothing level.
+# Results are persisted on disk, one file per dataset fingerprint and version of the code, so a restart with the same data and code only reads them back
+# into the shared result cache of explorer_sections. A new data file has a new fingerprint, and a deploy changing the computations (explorer_sections
+# or the modules it computes with) a new code version: either means a new warm-up, and the files of older versions are deleted.
+#
+# Usage:
+#   python warm_cache.py            -> deploy step, before `streamlit run Home.py`: computes and persists the results (or checks that they are current)
+#   python warm_cache.py --clear    -> same, discarding the persisted results first
+# The Weather Explorer also starts the warm-up in a background thread once per server process (start_warm_up), unless WEATHER_WARM_UP=0.
+# Persisted results go to WEATHER_WARM_CACHE_DIR (.warm_cache next to the app by default).
+
+# Load libraries
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import app_figures
+import app_utils
+import explorer_sections
+import period_aggregation
+import prefix_stats
+import seasons
+from app_metrics import timed
+from app_utils import load_local_data, frame_fingerprint, build_smoothed_var_names, SMOOTH_SUFFIX, MONTHS, SEASONS, APP_DIR
+from explorer_sections import section_result, restore_results, reserve_results, DEFAULT_PLOT_VARS, DEFAULT_HIST_VAR, SECTIONS
+
+WARM_CACHE_DIR = Path(os.environ.get("WEATHER_WARM_CACHE_DIR", APP_DIR / ".warm_cache"))
+WARM_UP = os.environ.get("WEATHER_WARM_UP", "1") != "0"
+PERIODS = [("One Month", m, None) for m in MONTHS] + [("One Season", None, s) for s in SEASONS] + [("Full Year", None, None)]
+
+logger = logging.getLogger("weather_app.warmup")
+
+
+# 1) Widget states to prepare: (section, *args) as submitted by the Weather Explorer
+def common_states() -> list:
+    """Summary table, correlation, time series (default variables, not normalised) and histogram (default variable, no filter) of every period and smoothing."""
+    states = []
+    for smooth in SMOOTH_SUFFIX:
+        hist_col = build_smoothed_var_names([DEFAULT_HIST_VAR], smooth)[0]
+        for period in PERIODS:
+            states += [
+                ("stats", *period, smooth),
+                ("corr", *period, smooth),
+                ("plot", *period, smooth, tuple(DEFAULT_PLOT_VARS), False),
+                ("hist", *period, hist_col, None),
+            ]
+    return states
+
+
+# 2) Persisted results: {(section, *args): result}, pickled with the fingerprint of the data and the version of the code they were computed with
+
+# Modules whose code the section results depend on: any change to them (a deploy) invalidates the persisted results
+CODE_MODULES = [explorer_sections, app_utils, prefix_stats, app_figures, period_aggregation, seasons]
+
+def code_version() -> str:
+    """Short hash of the source of CODE_MODULES."""
+    digest = hashlib.sha256()
+    for module in CODE_MODULES:
+        digest.update(Path(module.__file__).read_bytes())
+    return digest.hexdigest()[:12]
+
+def cache_file(fingerprint, code=None) -> Path:
+    return WARM_CACHE_DIR / f"sections-{fingerprint}-{code or code_version()}.pkl"
+
+def read_persisted(fingerprint, code=None) -> dict:
+    """Persisted results of this version of the data and of the code, or {} if there are none (or the file is unreadable, or was written for
+    another set of sections)."""
+    code = code or code_version()
+    try:
+        with open(cache_file(fingerprint, code), "rb") as f:
+            persisted = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return {}
+    if (persisted.get("fingerprint"), persisted.get("code"), persisted.get("sections")) != (fingerprint, code, sorted(SECTIONS)):
+        return {}
+    return persisted["results"]
+
+# Written to a temporary file first and then renamed, like the Arrow cache; the files of other versions are removed
+def write_persisted(entries: dict, fingerprint, code=None) -> None:
+    code = code or code_version()
+    path = cache_file(fingerprint, code)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        WARM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"fingerprint": fingerprint, "code": code, "sections": sorted(SECTIONS), "results": entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        for old in WARM_CACHE_DIR.glob("sections-*.pkl"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    except OSError:
+        # e.g. read-only deployment: the results stay in memory only
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# 3) Warm-up
+def warm_up(df):
+    """Restore the persisted results of df into the shared result cache, compute the missing common states, persist them. Returns (restored, computed) counts.
+    Results are persisted under the fingerprint of df itself (app_utils.frame_fingerprint), not of the file on disk, which may be newer."""
+    fingerprint = frame_fingerprint(df)
+    states = common_states()
+    reserve_results(len(states))
+    wanted = set(states)
+    persisted = {state: result for state, result in read_persisted(fingerprint).items() if state in wanted}
+    with timed("warmup.restore"):
+        restore_results(df, persisted)
+    computed = {}
+    with timed("warmup.compute"):
+        for state in states:
+            if state not in persisted:
+                computed[state] = section_result(df, *state)
+    if computed:
+        write_persisted({**persisted, **computed}, fingerprint)
+    return len(persisted), len(computed)
+
+_started = False
+_started_lock = threading.Lock()
+
+def _warm_up_logged(df):
+    try:
+        start = time.perf_counter()
+        restored, computed = warm_up(df)
+        logger.info("warm-up: %d results restored, %d computed in %.1f s", restored, computed, time.perf_counter() - start)
+    except Exception as exc:
+        logger.warning("warm-up failed: %r", exc)
+
+def start_warm_up(df):
+    """Warm-up in a background thread, once per server process (nothing if WEATHER_WARM_UP=0). Sessions asking for a state that is being computed
+    wait for that computation instead of starting their own (see explorer_sections.section_result)."""
+    global _started
+    with _started_lock:
+        if _started or not WARM_UP:
+            return
+        _started = True
+    threading.Thread(target=_warm_up_logged, args=(df,), name="warm-up", daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the data and prepare the Weather Explorer's most common sections, persisted for the next server starts.")
+    parser.add_argument("--clear", action="store_true", help="discard the persisted results first")
+    args = parser.parse_args()
+
+    if args.clear:
+        shutil.rmtree(WARM_CACHE_DIR, ignore_errors=True)
+    df = load_local_data() # already loaded by the import of app_utils: parquet decoding and validation on the first run, Arrow cache afterwards
+    start = time.perf_counter()
+    restored, computed = warm_up(df)
+    print(f"{restored} results restored and {computed} computed in {time.perf_counter() - start:.1f} s ({cache_file(frame_fingerprint(df))})")